@@ -55,6 +55,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'biblioteca.context_processors.notificaciones_no_leidas',
+                'biblioteca.context_processors.membresias',
             ],
         },
     },
@@ -75,6 +76,22 @@ DATABASES = {
     }
 }
 
+# Caché. Las invalidaciones de biblioteca (versiones de biblioteca/cache.py,
+# contadores de notificaciones, membresías) se hacen en 'default', así que con
+# varios procesos tiene que ser compartida: con REDIS_URL se usa Redis
+# (paquete redis); sin ella, LocMem, que solo sirve con un proceso
+# (desarrollo). Con LocMem, manage.py check --deploy avisa (biblioteca.W001).
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'libreria-digital',
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -107,5 +124,14 @@ LOGOUT_REDIRECT_URL = ''
 # Email backend para desarrollo
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Visitas repetidas al mismo libro dentro de esta ventana (segundos) no se
+# registran en el historial (biblioteca/visitas.py)
+BIBLIOTECA_VENTANA_VISITAS = 30 * 60
+
+# Retención del historial (biblioteca/compactacion.py): días que se conservan
+# visita por visita y filas por usuario como máximo
+BIBLIOTECA_HISTORIAL_DIAS = 90
+BIBLIOTECA_HISTORIAL_MAXIMO = 500
+
 # Clave secreta para registro de administradores
 ADMIN_KEY = "MiClaveSuperSecreta123"
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import notificaciones
 from .models import Libro, Categoria, ValoracionReseña, Notificacion, Seguimiento
 
 
@@ -30,7 +31,11 @@ class NotificacionAdmin(admin.ModelAdmin):
     mensaje_corto.short_description = "Mensaje"
     
     def marcar_como_leidas(self, request, queryset):
+        # update() no envía post_save: se recalculan los contadores de los afectados
+        usuario_ids = set(queryset.filter(leida=False).values_list('usuario_id', flat=True))
         queryset.update(leida=True)
+        for usuario_id in usuario_ids:
+            notificaciones.invalidar(usuario_id)
     marcar_como_leidas.short_description = "Marcar seleccionadas como leídas"
 
 
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class BibliotecaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'biblioteca'
+
+    def ready(self):
+        # Registrar los receivers que mantienen los datos desnormalizados
+        from . import signals  # noqa: F401
+        from .busqueda import asegurar_indice_sqlite
+
+        post_migrate.connect(asegurar_indice_sqlite, sender=self)
@@ -0,0 +1,164 @@
+"""
+Índice en memoria para el autocompletado de la búsqueda (títulos y autores).
+
+Es un arreglo ordenado de claves normalizadas (biblioteca.texto.normalizar),
+una por cada palabra de inicio posible, de modo que "sol" encuentra
+"Cien años de soledad". Una consulta es un bisect más un recorrido acotado;
+nunca va a la base de datos por tecla. Los prefijos que abarcan más de
+MAX_CANDIDATOS entradas (los de una o dos letras) se ordenan una vez sobre
+todas sus coincidencias y se recuerdan hasta que cambie alguno de sus libros.
+
+El índice se construye en el primer uso y se actualiza desde los signals de
+Libro y Reseña. Como cada proceso tiene su propio índice, se compara cada
+INTERVALO_VERIFICACION segundos la versión 'autocompletar' de la caché
+compartida y se reconstruye si otro proceso modificó el catálogo.
+"""
+import bisect
+import heapq
+import threading
+import time
+
+from . import cache as cache_versionada
+from .models import Libro
+from .texto import normalizar
+
+
+INTERVALO_VERIFICACION = 30
+
+# Prefijos con más entradas que esto se ordenan una vez y se recuerdan (ver _mejores)
+MAX_CANDIDATOS = 2000
+
+# Libros que se recuerdan por prefijo amplio (el máximo que pide la vista)
+TOP_RECORDADOS = 20
+
+# Fin del rango de un prefijo en el arreglo ordenado
+_FIN = '\U0010ffff'
+
+
+def _claves(texto):
+    """Una clave por cada palabra: 'cien anos de soledad', 'anos de soledad', ..."""
+    palabras = normalizar(texto).split()
+    return {' '.join(palabras[i:]) for i in range(len(palabras))}
+
+
+class IndicePrefijos:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entradas = []      # [(clave, libro_id)] ordenado
+        self._libros = {}        # libro_id -> {'titulo', 'autor', 'total_reseñas'}
+        self._mejores = {}       # prefijo amplio -> ids de sus mejores libros, en orden
+        self._version = None
+        self._verificado = 0.0
+
+    # -------------------------------
+    # Construcción y mantenimiento
+    # -------------------------------
+    def construir(self):
+        version = cache_versionada.version('autocompletar')
+        libros = {}
+        entradas = []
+        filas = Libro.objects.values_list('id', 'titulo', 'autor', 'total_reseñas').iterator(chunk_size=2000)
+        for libro_id, titulo, autor, total in filas:
+            libros[libro_id] = {'titulo': titulo, 'autor': autor, 'total_reseñas': total}
+            entradas.extend((clave, libro_id) for clave in _claves(titulo) | _claves(autor))
+        entradas.sort()
+        with self._lock:
+            self._entradas = entradas
+            self._libros = libros
+            self._mejores = {}
+            self._version = version
+            self._verificado = time.monotonic()
+
+    def _asegurar_vigente(self):
+        ahora = time.monotonic()
+        if self._version is not None and ahora - self._verificado < INTERVALO_VERIFICACION:
+            return
+        with self._lock:
+            if self._version is not None and cache_versionada.version('autocompletar') == self._version:
+                self._verificado = ahora
+                return
+            self.construir()
+
+    def _olvidar_mejores(self, datos):
+        """Descarta los rankings recordados de los prefijos de un libro que cambió"""
+        if not self._mejores or datos is None:
+            return
+        claves = _claves(datos['titulo']) | _claves(datos['autor'])
+        for prefijo in [p for p in self._mejores if any(clave.startswith(p) for clave in claves)]:
+            del self._mejores[prefijo]
+
+    def _quitar_entradas(self, libro_id):
+        datos = self._libros.pop(libro_id, None)
+        if datos is None:
+            return
+        self._olvidar_mejores(datos)
+        for clave in _claves(datos['titulo']) | _claves(datos['autor']):
+            posicion = bisect.bisect_left(self._entradas, (clave, libro_id))
+            if posicion < len(self._entradas) and self._entradas[posicion] == (clave, libro_id):
+                del self._entradas[posicion]
+
+    def actualizar(self, libro):
+        """Inserta o reemplaza un libro (post_save de Libro)"""
+        with self._lock:
+            if self._version is None:
+                return
+            self._quitar_entradas(libro.id)
+            self._libros[libro.id] = {
+                'titulo': libro.titulo,
+                'autor': libro.autor,
+                'total_reseñas': libro.total_reseñas,
+            }
+            self._olvidar_mejores(self._libros[libro.id])
+            for clave in _claves(libro.titulo) | _claves(libro.autor):
+                bisect.insort(self._entradas, (clave, libro.id))
+            self._version = cache_versionada.version('autocompletar')
+
+    def eliminar(self, libro_id):
+        """Quita un libro (post_delete de Libro)"""
+        with self._lock:
+            if self._version is None:
+                return
+            self._quitar_entradas(libro_id)
+            self._version = cache_versionada.version('autocompletar')
+
+    def ajustar_reseñas(self, libro_id, delta):
+        """Actualiza el total de reseñas usado para el ranking"""
+        with self._lock:
+            datos = self._libros.get(libro_id)
+            if datos is not None:
+                datos['total_reseñas'] = max(datos['total_reseñas'] + delta, 0)
+                self._olvidar_mejores(datos)
+
+    # -------------------------------
+    # Consulta
+    # -------------------------------
+    def buscar(self, prefijo, limite=8):
+        """Top-`limite` libros cuyo título o autor tiene una palabra que empieza por `prefijo`"""
+        prefijo = normalizar(prefijo)
+        if not prefijo:
+            return []
+        self._asegurar_vigente()
+
+        with self._lock:
+            inicio = bisect.bisect_left(self._entradas, (prefijo,))
+            fin = bisect.bisect_left(self._entradas, (prefijo + _FIN,), inicio)
+            if fin - inicio <= MAX_CANDIDATOS or limite > TOP_RECORDADOS:
+                mejores = self._ordenar(inicio, fin, limite)
+            else:
+                # Prefijo amplio: se ordenan todas sus coincidencias una vez, no las primeras alfabéticamente
+                mejores = self._mejores.get(prefijo)
+                if mejores is None:
+                    mejores = self._mejores[prefijo] = self._ordenar(inicio, fin, TOP_RECORDADOS)
+            return [dict(self._libros[libro_id], id=libro_id) for libro_id in mejores[:limite]]
+
+    def _ordenar(self, inicio, fin, limite):
+        """Los `limite` libros con más reseñas entre las entradas [inicio, fin)"""
+        candidatos = {libro_id for _, libro_id in self._entradas[inicio:fin]}
+        return heapq.nlargest(
+            limite, candidatos,
+            key=lambda libro_id: (self._libros[libro_id]['total_reseñas'], -libro_id),
+        )
+
+
+indice = IndicePrefijos()
@@ -0,0 +1,206 @@
+"""
+Búsqueda de texto completo sobre el catálogo de libros (titulo, autor, descripcion).
+
+- MySQL: índice FULLTEXT y MATCH ... AGAINST en modo booleano.
+- SQLite: tabla virtual FTS5 sincronizada con triggers (para pruebas locales).
+- Otros motores: icontains como respaldo, sin ranking.
+- Si no hay coincidencias, buscar_libros_aproximado usa el índice de trigramas.
+
+Todas las variantes devuelven el queryset anotado con `relevancia`
+(mayor es mejor), de modo que los filtros y ordenamientos existentes
+se pueden seguir encadenando.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.expressions import RawSQL
+
+from .models import Libro
+from .texto import normalizar
+from .trigramas import indice as indice_trigramas
+
+
+TABLA_FTS = 'biblioteca_libro_fts'
+INDICE_FULLTEXT = 'biblioteca_libro_fulltext'
+
+# Máximo de términos que se envían al motor por búsqueda
+MAX_TERMINOS = 8
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Triggers que mantienen la tabla FTS5 sincronizada con biblioteca_libro
+TRIGGERS_FTS = {
+    'biblioteca_libro_fts_ai': """
+        CREATE TRIGGER IF NOT EXISTS biblioteca_libro_fts_ai AFTER INSERT ON biblioteca_libro BEGIN
+            INSERT INTO biblioteca_libro_fts(rowid, titulo, autor, descripcion)
+            VALUES (new.id, new.titulo, new.autor, new.descripcion);
+        END
+    """,
+    'biblioteca_libro_fts_ad': """
+        CREATE TRIGGER IF NOT EXISTS biblioteca_libro_fts_ad AFTER DELETE ON biblioteca_libro BEGIN
+            INSERT INTO biblioteca_libro_fts(biblioteca_libro_fts, rowid, titulo, autor, descripcion)
+            VALUES ('delete', old.id, old.titulo, old.autor, old.descripcion);
+        END
+    """,
+    'biblioteca_libro_fts_au': """
+        CREATE TRIGGER IF NOT EXISTS biblioteca_libro_fts_au AFTER UPDATE ON biblioteca_libro BEGIN
+            INSERT INTO biblioteca_libro_fts(biblioteca_libro_fts, rowid, titulo, autor, descripcion)
+            VALUES ('delete', old.id, old.titulo, old.autor, old.descripcion);
+            INSERT INTO biblioteca_libro_fts(rowid, titulo, autor, descripcion)
+            VALUES (new.id, new.titulo, new.autor, new.descripcion);
+        END
+    """,
+}
+
+
+def tokenizar(query):
+    """Divide la búsqueda en términos alfanuméricos, descartando operadores del motor"""
+    return _TOKEN.findall(query.lower())[:MAX_TERMINOS]
+
+
+def generos_coincidentes(query):
+    """Géneros cuyo código o nombre contiene la búsqueda (reemplaza genero__icontains)"""
+    texto = query.strip().lower()
+    if not texto:
+        return []
+    return [
+        codigo for codigo, nombre in Libro._meta.get_field('genero').choices
+        if texto in codigo or texto in nombre.lower()
+    ]
+
+
+class BusquedaBasica:
+    """Respaldo para motores sin índice de texto completo (sin ranking)"""
+
+    def relevancia(self, terminos):
+        return Value(0.0, output_field=FloatField())
+
+    def condicion(self, terminos):
+        # clave_busqueda ya está sin tildes, así que "sabato" encuentra "Sábato"
+        condicion = Q()
+        for termino in terminos:
+            condicion &= (
+                Q(clave_busqueda__contains=normalizar(termino)) |
+                Q(descripcion__icontains=termino)
+            )
+        return condicion
+
+
+class BusquedaMySQL:
+    """MATCH ... AGAINST sobre el índice FULLTEXT (titulo, autor, descripcion)"""
+
+    def expresion(self, terminos):
+        # '+termino*': todos los términos son obligatorios y se aceptan prefijos
+        return ' '.join(f'+{termino}*' for termino in terminos)
+
+    def relevancia(self, terminos):
+        tabla = Libro._meta.db_table
+        return RawSQL(
+            f'MATCH({tabla}.titulo, {tabla}.autor, {tabla}.descripcion) '
+            'AGAINST (%s IN BOOLEAN MODE)',
+            [self.expresion(terminos)],
+            output_field=FloatField(),
+        )
+
+    def condicion(self, terminos):
+        return Q(relevancia__gt=0)
+
+
+class BusquedaSQLite:
+    """Tabla virtual FTS5 con contenido externo apuntando a biblioteca_libro"""
+
+    def expresion(self, terminos):
+        # '"termino"*': cada término entre comillas para neutralizar la sintaxis FTS5
+        return ' AND '.join(f'"{termino}"*' for termino in terminos)
+
+    def relevancia(self, terminos):
+        tabla = Libro._meta.db_table
+        # bm25() es menor cuanto más relevante; se invierte el signo.
+        # Pesos por columna: titulo > autor > descripcion
+        return Coalesce(
+            RawSQL(
+                f'SELECT -bm25({TABLA_FTS}, 10.0, 5.0, 1.0) FROM {TABLA_FTS} '
+                f'WHERE {TABLA_FTS} MATCH %s AND {TABLA_FTS}.rowid = {tabla}.id',
+                [self.expresion(terminos)],
+                output_field=FloatField(),
+            ),
+            Value(0.0, output_field=FloatField()),
+        )
+
+    def condicion(self, terminos):
+        return Q(id__in=RawSQL(
+            f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s',
+            [self.expresion(terminos)],
+        ))
+
+
+BACKENDS = {
+    'mysql': BusquedaMySQL,
+    'sqlite': BusquedaSQLite,
+}
+
+
+def asegurar_indice_sqlite(using='default', **kwargs):
+    """
+    Receiver de post_migrate: en SQLite, ALTER TABLE reconstruye biblioteca_libro
+    y se pierden los triggers FTS5. Se recrean y, si faltaban, se reindexa.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        tablas = connection.introspection.table_names(cursor)
+        if TABLA_FTS not in tablas or Libro._meta.db_table not in tablas:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f'{TABLA_FTS}_%'],
+        )
+        existentes = {fila[0] for fila in cursor.fetchall()}
+        if existentes == set(TRIGGERS_FTS):
+            return
+        for sentencia in TRIGGERS_FTS.values():
+            cursor.execute(sentencia)
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def get_backend(alias='default'):
+    """Backend de búsqueda según el motor de la conexión"""
+    return BACKENDS.get(connections[alias].vendor, BusquedaBasica)()
+
+
+def buscar_libros_aproximado(queryset, query, limite=200):
+    """
+    Búsqueda tolerante a erratas con el índice de trigramas (trigramas.py),
+    para cuando el índice de texto completo no encuentra nada. Anota la
+    similitud como `relevancia` para poder ordenar y paginar igual.
+    """
+    similares = indice_trigramas.buscar(query, limite)
+    if not similares:
+        return queryset.none().annotate(relevancia=Value(0.0, output_field=FloatField()))
+    return queryset.filter(id__in=[libro_id for libro_id, _ in similares]).annotate(
+        relevancia=Case(
+            *[When(id=libro_id, then=Value(similitud)) for libro_id, similitud in similares],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def buscar_libros_texto(queryset, query):
+    """
+    Filtra `queryset` (de Libro) por texto completo y lo anota con `relevancia`.
+    Si la búsqueda coincide con un género, también incluye los libros de ese género.
+    """
+    terminos = tokenizar(query)
+    if not terminos:
+        return queryset.annotate(relevancia=Value(0.0, output_field=FloatField()))
+
+    generos = generos_coincidentes(query)
+    backend = get_backend(queryset.db)
+    condicion = backend.condicion(terminos)
+    if generos:
+        condicion |= Q(genero__in=generos)
+    return queryset.annotate(relevancia=backend.relevancia(terminos)).filter(condicion)
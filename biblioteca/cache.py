@@ -0,0 +1,177 @@
+"""
+Utilidades de caché con invalidación por versión.
+
+Cada "espacio" (libros, reseñas, seguimientos, ...) tiene un contador de
+versión en la caché. Las claves derivadas incluyen las versiones de los
+espacios de los que dependen, así que invalidar es solo incrementar el
+contador: las entradas viejas dejan de leerse y expiran solas.
+
+cache_anonimo cachea la página completa para visitantes anónimos con el mismo
+esquema de versiones.
+
+Las versiones se incrementan al confirmar la transacción que hizo el cambio
+(transaction.on_commit): si se incrementaran antes, otra petición podría
+leer los datos viejos entre el incremento y el COMMIT y guardarlos con la
+versión nueva, que ya nada invalidaría.
+
+Todo esto (y los contadores de notificaciones.py, las membresías, la
+deduplicación de visitas.py y la versión de los índices en memoria) vive en
+la caché 'default'. Con varios procesos tiene que ser compartida: un
+incremento en la caché local de un proceso no invalida nada en los demás.
+verificar_cache_compartida lo revisa (manage.py check --deploy,
+biblioteca.W001).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import get_language
+
+
+PREFIJO = 'biblioteca'
+
+# Páginas anónimas: además de la versión, caducan solas para no servir
+# indefinidamente datos de modelos sin espacio propio (p. ej. usuarios)
+TIMEOUT_PAGINA = 5 * 60
+
+# Backends que viven en la memoria de cada proceso
+BACKENDS_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def verificar_cache_compartida():
+    """Motivo por el que la caché 'default' no sirve con varios procesos, o None si sirve"""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in BACKENDS_LOCALES:
+        return (
+            f"La caché 'default' ({backend}) vive en la memoria de cada proceso: con varios "
+            "procesos las invalidaciones de uno no llegan a los demás, que siguen sirviendo "
+            "páginas y contadores viejos. Configure REDIS_URL (o Memcached)."
+        )
+    return None
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_cache_compartida(app_configs, **kwargs):
+    # Solo con check --deploy: en desarrollo (un proceso) LocMem basta
+    motivo = verificar_cache_compartida()
+    return [checks.Warning(motivo, id='biblioteca.W001')] if motivo else []
+
+
+def _clave_version(espacio):
+    return f'{PREFIJO}:version:{espacio}'
+
+
+def _semilla():
+    """
+    Versión inicial de un espacio cuya clave falta. No puede ser un número
+    fijo: si la clave se pierde (expulsión, reinicio) las entradas guardadas
+    con las versiones 1, 2, ... volverían a leerse. El reloj en nanosegundos
+    siempre queda por delante de cualquier versión anterior.
+    """
+    return time.time_ns()
+
+
+def version(espacio):
+    """Versión actual de un espacio (se siembra con _semilla si falta)"""
+    clave = _clave_version(espacio)
+    valor = cache.get(clave)
+    if valor is None:
+        semilla = _semilla()
+        cache.add(clave, semilla, timeout=None)
+        valor = cache.get(clave, semilla)
+    return valor
+
+
+def versiones(*espacios):
+    """Versiones de varios espacios con una sola lectura a la caché"""
+    claves = {espacio: _clave_version(espacio) for espacio in espacios}
+    encontradas = cache.get_many(list(claves.values()))
+    return {
+        espacio: encontradas.get(clave) or version(espacio)
+        for espacio, clave in claves.items()
+    }
+
+
+def _incrementar(espacios):
+    for espacio in espacios:
+        clave = _clave_version(espacio)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # La clave no existía (caché recién iniciada o expulsada)
+            cache.set(clave, _semilla(), timeout=None)
+
+
+def invalidar(*espacios):
+    """Incrementa la versión de uno o más espacios al confirmar la transacción"""
+    transaction.on_commit(lambda: _incrementar(espacios))
+
+
+def clave_versionada(prefijo, espacios, *partes):
+    """Clave de caché que cambia cuando cambia la versión de cualquiera de los espacios"""
+    actuales = versiones(*espacios)
+    sufijo = '.'.join(f'{espacio}{actuales[espacio]}' for espacio in espacios)
+    resumen = hashlib.sha1('|'.join(str(parte) for parte in partes).encode()).hexdigest()
+    return f'{PREFIJO}:{prefijo}:{sufijo}:{resumen}'
+
+
+# -------------------------------
+# Páginas completas para anónimos
+# -------------------------------
+def es_anonimo(request):
+    """
+    Sin cookie de sesión la petición es anónima y no trae mensajes pendientes.
+    Se decide por las cookies para no cargar la sesión ni el usuario (sin BD).
+    """
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+def es_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # La página usó {% csrf_token %}: el token es por visitante
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def cache_anonimo(*espacios, timeout=TIMEOUT_PAGINA):
+    """
+    Decorador de vistas: sirve la respuesta completa desde la caché a los
+    visitantes anónimos. La clave depende de la URL, el idioma y las
+    versiones de `espacios`, así que una escritura en el catálogo invalida
+    todas las páginas de una vez.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not es_anonimo(request):
+                response = vista(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+                return response
+
+            clave = clave_versionada(
+                f'pagina:{vista.__name__}', espacios,
+                request.get_host(), request.get_full_path(), get_language(),
+            )
+            response = cache.get(clave)
+            if response is None:
+                response = vista(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+                if es_cacheable(request, response):
+                    cache.set(clave, response, timeout)
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,174 @@
+"""
+Retención y compactación de Historial.
+
+Historial crece una fila por visita. compactar() lo mantiene acotado en tres pasos:
+
+1. colapsar: de varias visitas seguidas de un usuario al mismo libro queda
+   solo la última.
+2. enrollar: las visitas más antiguas que DIAS_DETALLE pasan a HistorialDiario
+   (una fila por usuario, libro y día).
+3. recortar: ningún usuario conserva más de MAXIMO_POR_USUARIO filas.
+
+Ninguna visita se pierde: toda fila que se borra se suma antes a
+HistorialDiario, así que Historial + HistorialDiario cuentan todas las visitas
+(ver EstadisticasLibro.recalcular). Los borrados van en lotes de LOTE filas,
+cada uno en su propia transacción corta, para no bloquear la tabla.
+Lo ejecuta el comando compactar_historial (pensado para cron).
+"""
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .cache import PREFIJO
+from .models import Historial, HistorialDiario
+
+
+# Días de historial que se conservan visita por visita
+DIAS_DETALLE = getattr(settings, 'BIBLIOTECA_HISTORIAL_DIAS', 90)
+
+# Filas de Historial por usuario como máximo
+MAXIMO_POR_USUARIO = getattr(settings, 'BIBLIOTECA_HISTORIAL_MAXIMO', 500)
+
+# Filas por lote de lectura y de borrado
+LOTE = 1000
+
+CLAVE_BLOQUEO = f'{PREFIJO}:historial:compactando'
+
+
+def _dia(fecha):
+    return timezone.localdate(fecha) if timezone.is_aware(fecha) else fecha.date()
+
+
+def enrollar_y_borrar(filas):
+    """
+    Suma `filas` ([(id, usuario_id, libro_id, fecha)]) a HistorialDiario y las
+    borra de Historial, todo en una transacción. Devuelve cuántas se borraron.
+    """
+    if not filas:
+        return 0
+    conteos = Counter((usuario_id, libro_id, _dia(fecha)) for _, usuario_id, libro_id, fecha in filas)
+
+    with transaction.atomic():
+        existentes = {
+            (fila.usuario_id, fila.libro_id, fila.dia): fila
+            for fila in HistorialDiario.objects.select_for_update().filter(
+                usuario_id__in={usuario_id for usuario_id, _, _ in conteos},
+                libro_id__in={libro_id for _, libro_id, _ in conteos},
+                dia__in={dia for _, _, dia in conteos},
+            )
+        }
+        nuevas = []
+        actualizadas = []
+        for (usuario_id, libro_id, dia), visitas in conteos.items():
+            fila = existentes.get((usuario_id, libro_id, dia))
+            if fila is None:
+                nuevas.append(HistorialDiario(usuario_id=usuario_id, libro_id=libro_id, dia=dia, visitas=visitas))
+            else:
+                fila.visitas = F('visitas') + visitas
+                actualizadas.append(fila)
+        HistorialDiario.objects.bulk_create(nuevas)
+        if actualizadas:
+            HistorialDiario.objects.bulk_update(actualizadas, ['visitas'])
+        borradas, _ = Historial.objects.filter(id__in=[fila[0] for fila in filas]).delete()
+    return borradas
+
+
+def _usuarios_con_historial():
+    """Ids de los usuarios con filas en Historial, de a uno (cada uno es una búsqueda en el índice)"""
+    usuario_id = 0
+    while True:
+        usuario_id = (
+            Historial.objects.filter(usuario_id__gt=usuario_id).order_by('usuario_id')
+            .values_list('usuario_id', flat=True).first()
+        )
+        if usuario_id is None:
+            return
+        yield usuario_id
+
+
+def colapsar(lote=LOTE):
+    """
+    Deja solo la última de cada racha de visitas seguidas de un usuario al
+    mismo libro. Recorre cada usuario de la más reciente a la más antigua, en
+    el orden de historial_usuario_fecha_idx, así que cada lote es un tramo
+    del índice y no un ordenamiento de la tabla.
+    """
+    borradas = 0
+    pendientes = []
+    for usuario_id in _usuarios_con_historial():
+        anterior = None  # libro de la fila anterior (más reciente)
+        ultimo = None  # (fecha, id) de la última fila leída
+        while True:
+            filas = Historial.objects.filter(usuario_id=usuario_id).order_by('-fecha', '-id')
+            if ultimo is not None:
+                fecha, fila_id = ultimo
+                filas = filas.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=fila_id))
+            filas = list(filas.values_list('id', 'usuario_id', 'libro_id', 'fecha')[:lote])
+            if not filas:
+                break
+            for fila in filas:
+                # Repite el libro de la visita siguiente (más reciente): sobra
+                if fila[2] == anterior:
+                    pendientes.append(fila)
+                anterior = fila[2]
+            ultimo = (filas[-1][3], filas[-1][0])
+            if len(pendientes) >= lote:
+                borradas += enrollar_y_borrar(pendientes)
+                pendientes = []
+    return borradas + enrollar_y_borrar(pendientes)
+
+
+def enrollar(dias=DIAS_DETALLE, lote=LOTE):
+    """Pasa a HistorialDiario las visitas de hace más de `dias` días"""
+    corte = timezone.now() - datetime.timedelta(days=dias)
+    borradas = 0
+    while True:
+        filas = list(
+            Historial.objects.filter(fecha__lt=corte).order_by('fecha', 'id')
+            .values_list('id', 'usuario_id', 'libro_id', 'fecha')[:lote]
+        )
+        if not filas:
+            return borradas
+        borradas += enrollar_y_borrar(filas)
+
+
+def recortar(maximo=MAXIMO_POR_USUARIO, lote=LOTE):
+    """Pasa a HistorialDiario lo que exceda las `maximo` visitas más recientes de cada usuario"""
+    borradas = 0
+    usuarios = (
+        Historial.objects.order_by().values('usuario_id')
+        .annotate(total=Count('id')).filter(total__gt=maximo).values_list('usuario_id', flat=True)
+    )
+    for usuario_id in list(usuarios):
+        while True:
+            # Las más antiguas a partir de la posición `maximo` (historial_usuario_fecha_idx)
+            filas = list(
+                Historial.objects.filter(usuario_id=usuario_id).order_by('-fecha', '-id')
+                .values_list('id', 'usuario_id', 'libro_id', 'fecha')[maximo:maximo + lote]
+            )
+            if not filas:
+                break
+            borradas += enrollar_y_borrar(filas)
+    return borradas
+
+
+def compactar(dias=DIAS_DETALLE, maximo=MAXIMO_POR_USUARIO, lote=LOTE):
+    """
+    Ejecuta los tres pasos y devuelve las filas borradas por cada uno, o None
+    si ya hay una compactación en curso.
+    """
+    if not cache.add(CLAVE_BLOQUEO, True, 60 * 60):
+        return None
+    try:
+        return {
+            'colapsadas': colapsar(lote),
+            'enrolladas': enrollar(dias, lote),
+            'recortadas': recortar(maximo, lote),
+        }
+    finally:
+        cache.delete(CLAVE_BLOQUEO)
@@ -1,11 +1,24 @@
-from .models import Notificacion
+from django.utils.functional import SimpleLazyObject
+
+from . import membresias as membresias_usuario
+from . import notificaciones
 
 def notificaciones_no_leidas(request):
     """
     Context processor para mostrar el número de notificaciones no leídas
-    en toda la aplicación.
+    en toda la aplicación. Se lee solo si la plantilla lo usa (las páginas
+    cacheadas lo muestran desde el hueco 'acciones_usuario'), y sale del
+    contador en caché de biblioteca.notificaciones, no de un COUNT.
     """
     if request.user.is_authenticated:
-        count = Notificacion.objects.filter(usuario=request.user, leida=False).count()
+        count = SimpleLazyObject(lambda: notificaciones.no_leidas(request.user.id))
         return {'notificaciones_no_leidas': count}
     return {'notificaciones_no_leidas': 0}
+
+
+def membresias(request):
+    """
+    Favoritos, libros en listas y usuarios seguidos del usuario actual
+    (biblioteca.membresias). Los conjuntos se cargan solo si la plantilla los usa.
+    """
+    return {'membresias': membresias_usuario.para(request)}
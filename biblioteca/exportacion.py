@@ -0,0 +1,296 @@
+"""
+Exportación e importación en bloque de las listas, favoritos e historial de un usuario.
+
+Cada registro es una fila con las COLUMNAS de abajo, en JSONL (un objeto por
+línea) o CSV, según su `tipo`:
+
+- lista: una lista (clave de origen en `lista`, `nombre`, `descripcion`).
+- libro_lista: un libro de la lista `lista`, en el orden de la lista.
+- favorito: un libro favorito.
+- historial / historial_diario: visitas (historial_diario trae `visitas` por día).
+
+exportar() es un generador que la vista envía con StreamingHttpResponse. Lee
+por tramos de LOTE filas con PaginadorCursor (keyset) en lugar de
+.iterator(): el driver de MySQL guarda todo el resultado en memoria y un
+cursor abierto mientras el cliente descarga tendría la consulta viva todo ese
+tiempo. Cada tramo es una consulta corta e independiente.
+
+importar() lee el archivo línea a línea y procesa LOTE filas por vez: los
+libros del lote se resuelven con una consulta (por id, comprobando título y
+autor, o por título y autor si el id no coincide, p. ej. al venir de otra
+instalación) y se escriben con bulk_create. Las listas se reutilizan por
+nombre y los libros se agregan al final con agregar_libros, así que importar
+dos veces el mismo archivo no duplica nada. El historial solo se exporta:
+importarlo sumaría visitas que no ocurrieron.
+
+En ambos sentidos la memoria depende de LOTE y no del tamaño de los datos.
+"""
+import csv
+import json
+
+from django import forms
+from django.db import transaction
+from django.db.models import F, Q
+
+from . import membresias, tendencias
+from .listas import agregar_libros
+from .models import EstadisticasLibro, Favorito, Historial, HistorialDiario, Libro, LibroEnLista, Lista
+from .paginacion import PaginadorCursor
+from .texto import normalizar
+
+
+COLUMNAS = ('tipo', 'lista', 'nombre', 'descripcion', 'libro_id', 'titulo', 'autor', 'fecha', 'visitas')
+
+# formato -> (content type, extensión)
+FORMATOS = {
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+# Filas por tramo de lectura al exportar y por lote de escritura al importar
+LOTE = 500
+
+# Tamaño máximo del archivo a importar
+MAX_BYTES_IMPORTACION = 20 * 1024 * 1024
+
+
+# -------------------------------
+# Exportación
+# -------------------------------
+def _por_tramos(queryset, orden, lote=LOTE):
+    """Páginas keyset sucesivas de `queryset` (listas de a lo sumo `lote` objetos)"""
+    paginador = PaginadorCursor(queryset, orden, lote)
+    cursor = None
+    while True:
+        pagina = paginador.get_page(cursor)
+        if pagina.object_list:
+            yield pagina.object_list
+        if not pagina.has_next():
+            return
+        cursor = pagina.cursor_siguiente
+
+
+def _fecha(valor):
+    return valor.isoformat() if valor else ''
+
+
+def _libro(libro):
+    return {'libro_id': libro.id, 'titulo': libro.titulo, 'autor': libro.autor}
+
+
+def _tramos_de_filas(usuario):
+    """Tramos de filas (dicts con algunas de COLUMNAS) con todos los datos de `usuario`"""
+    libro_campos = ('libro__id', 'libro__titulo', 'libro__autor')
+
+    listas = Lista.objects.filter(usuario=usuario).only('id', 'nombre', 'descripcion', 'fecha_creacion')
+    for tramo in _por_tramos(listas, ['id']):
+        yield [
+            {'tipo': 'lista', 'lista': lista.id, 'nombre': lista.nombre,
+             'descripcion': lista.descripcion or '', 'fecha': _fecha(lista.fecha_creacion)}
+            for lista in tramo
+        ]
+
+    # Todas las listas de una vez, agrupadas por lista y en su orden (lista_libro_posicion_idx)
+    entradas = (
+        LibroEnLista.objects.filter(lista__usuario=usuario).select_related('libro')
+        .only('id', 'lista_id', 'posicion', 'fecha_agregado', *libro_campos)
+    )
+    for tramo in _por_tramos(entradas, ['lista_id', 'posicion', 'id']):
+        yield [
+            {'tipo': 'libro_lista', 'lista': entrada.lista_id, **_libro(entrada.libro),
+             'fecha': _fecha(entrada.fecha_agregado)}
+            for entrada in tramo
+        ]
+
+    favoritos = Favorito.objects.filter(usuario=usuario).select_related('libro').only('id', 'fecha_agregado', *libro_campos)
+    for tramo in _por_tramos(favoritos, ['id']):
+        yield [
+            {'tipo': 'favorito', **_libro(favorito.libro), 'fecha': _fecha(favorito.fecha_agregado)}
+            for favorito in tramo
+        ]
+
+    # historial_usuario_fecha_idx
+    historial = Historial.objects.filter(usuario=usuario).select_related('libro').only('id', 'fecha', *libro_campos)
+    for tramo in _por_tramos(historial, ['fecha', 'id']):
+        yield [{'tipo': 'historial', **_libro(visita.libro), 'fecha': _fecha(visita.fecha)} for visita in tramo]
+
+    # Visitas ya compactadas (compactacion.py)
+    diario = HistorialDiario.objects.filter(usuario=usuario).select_related('libro').only('id', 'dia', 'visitas', *libro_campos)
+    for tramo in _por_tramos(diario, ['dia', 'id']):
+        yield [
+            {'tipo': 'historial_diario', **_libro(fila.libro), 'fecha': _fecha(fila.dia), 'visitas': fila.visitas}
+            for fila in tramo
+        ]
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de escribirla"""
+
+    def write(self, valor):
+        return valor
+
+
+def exportar(usuario, formato='jsonl'):
+    """Genera el contenido del archivo de exportación de `usuario` en trozos de texto (uno por tramo)"""
+    if formato == 'csv':
+        escritor = csv.DictWriter(_Eco(), fieldnames=COLUMNAS)
+        yield escritor.writeheader()
+        for tramo in _tramos_de_filas(usuario):
+            yield ''.join(escritor.writerow(fila) for fila in tramo)
+    else:
+        for tramo in _tramos_de_filas(usuario):
+            yield ''.join(json.dumps(fila, ensure_ascii=False) + '\n' for fila in tramo)
+
+
+# -------------------------------
+# Importación
+# -------------------------------
+def formato_de(nombre_archivo):
+    """'csv' o 'jsonl' según la extensión del archivo; None si no es ninguno"""
+    extension = nombre_archivo.rsplit('.', 1)[-1].lower() if '.' in nombre_archivo else ''
+    if extension == 'csv':
+        return 'csv'
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return None
+
+
+def _leer_filas(archivo, formato):
+    """Filas del archivo subido como dicts (None por cada línea ilegible), sin cargarlo entero"""
+    try:
+        lineas = (linea.decode('utf-8-sig') for linea in archivo)
+        if formato == 'csv':
+            yield from csv.DictReader(lineas)
+            return
+        for linea in lineas:
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = None
+            yield fila if isinstance(fila, dict) else None
+    except (UnicodeDecodeError, csv.Error):
+        raise forms.ValidationError("El archivo no es un CSV o JSONL válido en UTF-8.")
+
+
+def _entero(valor):
+    valor = str(valor if valor is not None else '').strip()
+    return int(valor) if valor.isdigit() else None
+
+
+def _clave(titulo, autor):
+    return normalizar(f'{titulo} {autor}') if titulo else None
+
+
+def _resolver_libros(filas):
+    """
+    Id del libro de cada fila del lote (None si no se encuentra), con una sola
+    consulta: el id vale si título y autor coinciden (o si la fila no los
+    trae); si no, se busca por título y autor.
+    """
+    ids = {_entero(fila.get('libro_id')) for fila in filas} - {None}
+    titulos = {str(fila.get('titulo') or '').strip() for fila in filas} - {''}
+    if not ids and not titulos:
+        return [None] * len(filas)
+
+    por_id, por_clave = {}, {}
+    for libro_id, clave in (
+        Libro.objects.filter(Q(id__in=ids) | Q(titulo__in=titulos)).order_by('id')
+        .values_list('id', 'clave_busqueda')
+    ):
+        por_id[libro_id] = clave
+        por_clave.setdefault(clave, libro_id)
+
+    resueltos = []
+    for fila in filas:
+        libro_id = _entero(fila.get('libro_id'))
+        clave = _clave(str(fila.get('titulo') or '').strip(), str(fila.get('autor') or '').strip())
+        if libro_id in por_id and (clave is None or por_id[libro_id] == clave):
+            resueltos.append(libro_id)
+        else:
+            resueltos.append(por_clave.get(clave))
+    return resueltos
+
+
+def _lista_para(usuario, fila):
+    """(lista de `usuario` con el nombre de la fila, si se creó); (None, False) si la fila no trae nombre"""
+    nombre = str(fila.get('nombre') or '').strip()[:Lista._meta.get_field('nombre').max_length]
+    if not nombre:
+        return None, False
+    lista = Lista.objects.filter(usuario=usuario, nombre=nombre).order_by('id').first()
+    if lista is not None:
+        return lista, False
+    descripcion = str(fila.get('descripcion') or '') or None
+    return Lista.objects.create(usuario=usuario, nombre=nombre, descripcion=descripcion), True
+
+
+def _escribir_lote(usuario, lote, resumen):
+    """Resuelve los libros de `lote` ([(fila, lista o None)]) y escribe favoritos y libros de listas"""
+    libro_ids = _resolver_libros([fila for fila, _ in lote])
+    resumen['omitidas'] += libro_ids.count(None)
+
+    favoritos, por_lista = [], {}
+    for (fila, lista), libro_id in zip(lote, libro_ids):
+        if libro_id is None:
+            continue
+        if lista is None:
+            favoritos.append(libro_id)
+        else:
+            por_lista.setdefault(lista.pk, (lista, []))[1].append(libro_id)
+
+    with transaction.atomic():
+        if favoritos:
+            existentes = set(
+                Favorito.objects.filter(usuario=usuario, libro_id__in=favoritos).values_list('libro_id', flat=True)
+            )
+            nuevos = [libro_id for libro_id in dict.fromkeys(favoritos) if libro_id not in existentes]
+            # bulk_create no envía post_save: lo que hace favorito_guardado (signals.py) va aquí
+            Favorito.objects.bulk_create(
+                [Favorito(usuario=usuario, libro_id=libro_id) for libro_id in nuevos], ignore_conflicts=True,
+            )
+            if nuevos:
+                EstadisticasLibro.objects.filter(libro_id__in=nuevos).update(total_favoritos=F('total_favoritos') + 1)
+                tendencias.registrar_varios(nuevos, favoritos=1)
+                membresias.invalidar('favoritos', usuario.id)
+            resumen['favoritos'] += len(nuevos)
+
+        for lista, ids in por_lista.values():
+            resumen['libros_lista'] += len(agregar_libros(lista, ids))
+
+
+def importar(usuario, archivo, formato):
+    """
+    Importa listas y favoritos de un archivo exportado (ver arriba) a la
+    cuenta de `usuario`. Devuelve {'listas' (creadas), 'libros_lista',
+    'favoritos', 'omitidas'}: cuenta solo lo que se agregó, y las filas que no
+    se entienden o cuyo libro no existe se omiten. Cada lote se confirma por
+    separado. Lanza ValidationError si el archivo no se puede leer.
+    """
+    resumen = {'listas': 0, 'libros_lista': 0, 'favoritos': 0, 'omitidas': 0}
+    listas = {}  # clave de origen -> Lista
+    lote = []
+
+    for fila in _leer_filas(archivo, formato):
+        tipo = fila.get('tipo') if fila else None
+        if tipo == 'lista':
+            lista, creada = _lista_para(usuario, fila)
+            if lista is None:
+                resumen['omitidas'] += 1
+                continue
+            resumen['listas'] += creada
+            listas[str(fila.get('lista') or '')] = lista
+        elif tipo == 'libro_lista' and str(fila.get('lista') or '') in listas:
+            lote.append((fila, listas[str(fila['lista'])]))
+        elif tipo == 'favorito':
+            lote.append((fila, None))
+        elif tipo not in ('historial', 'historial_diario'):
+            resumen['omitidas'] += 1
+
+        if len(lote) >= LOTE:
+            _escribir_lote(usuario, lote, resumen)
+            lote = []
+
+    if lote:
+        _escribir_lote(usuario, lote, resumen)
+    return resumen
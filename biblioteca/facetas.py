@@ -0,0 +1,74 @@
+"""
+Facetas de búsqueda (género y valoración mínima) para buscar_libros.
+
+Una sola consulta agrupada por (genero, floor(promedio)) sobre los resultados
+de la búsqueda de texto, antes de aplicar los filtros de faceta. Con esas
+filas se calculan en Python los conteos de ambas facetas, cada uno aplicando
+solo el filtro de la otra. Las filas se guardan en la caché versionada, así
+que el catálogo sin filtrar no vuelve a la base de datos hasta que cambia.
+"""
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import Floor
+
+from .cache import clave_versionada
+from .models import Libro
+
+
+TIMEOUT_FACETAS = 60 * 60
+
+VALORACIONES = [5, 4, 3, 2, 1]
+
+
+def _filas_agrupadas(queryset):
+    """[(genero, estrellas, total)] con estrellas = floor(promedio)"""
+    if queryset.query.is_empty():
+        return []
+    agrupado = (
+        queryset.order_by()
+        .values('genero')
+        .annotate(estrellas=Floor('promedio'), total=Count('id'))
+        .values_list('genero', 'estrellas', 'total')
+    )
+    sql, params = agrupado.query.sql_with_params()
+    clave = clave_versionada('facetas', ['libros'], queryset.db, sql, params)
+    filas = cache.get(clave)
+    if filas is None:
+        filas = [(genero, int(estrellas or 0), total) for genero, estrellas, total in agrupado]
+        cache.set(clave, filas, TIMEOUT_FACETAS)
+    return filas
+
+
+def calcular_facetas(queryset, genero='', valoracion_min=None):
+    """
+    Conteos por género y por valoración mínima para `queryset` (sin los
+    filtros de faceta aplicados). Devuelve {'total', 'generos', 'valoraciones'},
+    donde 'total' es el número de resultados sin filtros de faceta.
+    """
+    filas = _filas_agrupadas(queryset)
+
+    por_genero = {}
+    por_estrellas = {}
+    for codigo, estrellas, total in filas:
+        if valoracion_min is None or estrellas >= valoracion_min:
+            por_genero[codigo] = por_genero.get(codigo, 0) + total
+        if not genero or codigo == genero:
+            por_estrellas[estrellas] = por_estrellas.get(estrellas, 0) + total
+
+    generos = [
+        {'codigo': codigo, 'nombre': nombre, 'total': por_genero.get(codigo, 0)}
+        for codigo, nombre in Libro._meta.get_field('genero').choices
+    ]
+    valoraciones = [
+        {
+            'minimo': minimo,
+            'estrellas': '⭐' * minimo,
+            'total': sum(n for estrellas, n in por_estrellas.items() if estrellas >= minimo),
+        }
+        for minimo in VALORACIONES
+    ]
+    return {
+        'total': sum(total for _, _, total in filas),
+        'generos': generos,
+        'valoraciones': valoraciones,
+    }
@@ -1,4 +1,6 @@
 from django import forms
+from .exportacion import MAX_BYTES_IMPORTACION, formato_de
+from .listas import leer_ids
 from .models import Libro, Reseña, Lista, Categoria, Comentario
 
 
@@ -82,9 +84,16 @@ class ReseñaForm(forms.ModelForm):
 
 
 class ListaForm(forms.ModelForm):
+    """
+    Los libros no van como campo del modelo: el selector (ver listas.py) envía
+    solo los ids a agregar y a quitar, que la vista aplica con aplicar_cambios.
+    """
+    agregar = forms.CharField(required=False, widget=forms.HiddenInput)
+    quitar = forms.CharField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Lista
-        fields = ['nombre', 'descripcion', 'libros']
+        fields = ['nombre', 'descripcion']
         widgets = {
             'nombre': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -95,18 +104,18 @@ class ListaForm(forms.ModelForm):
                 'rows': 4,
                 'placeholder': 'Describe el propósito de esta lista...'
             }),
-            'libros': forms.SelectMultiple(attrs={
-                'class': 'form-control',
-                'size': 10,
-                'multiple': 'multiple'
-            })
         }
         labels = {
             'nombre': 'Nombre de la lista',
             'descripcion': 'Descripción',
-            'libros': 'Selecciona libros'
         }
 
+    def clean_agregar(self):
+        return leer_ids(self.cleaned_data.get('agregar'))
+
+    def clean_quitar(self):
+        return leer_ids(self.cleaned_data.get('quitar'))
+
 
 class CategoriaForm(forms.ModelForm):
     class Meta:
@@ -131,3 +140,21 @@ class ComentarioForm(forms.ModelForm):
         labels = {
             'contenido': 'Comentario'
         }
+
+
+class ImportacionForm(forms.Form):
+    """Archivo exportado (CSV o JSONL) con listas y favoritos; ver exportacion.py"""
+    archivo = forms.FileField(
+        label='Archivo',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'}),
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if formato_de(archivo.name) is None:
+            raise forms.ValidationError("El archivo debe ser .csv o .jsonl.")
+        if archivo.size > MAX_BYTES_IMPORTACION:
+            raise forms.ValidationError(
+                f"El archivo supera el máximo de {MAX_BYTES_IMPORTACION // (1024 * 1024)} MB."
+            )
+        return archivo
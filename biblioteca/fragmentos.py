@@ -0,0 +1,206 @@
+"""
+Huecos por usuario dentro de páginas cacheadas ("hole punching").
+
+Las páginas se renderizan una vez por perfil (anónimo, usuario, admin) y se
+guardan con marcadores en lugar de las partes que dependen de la persona
+(badge de notificaciones, nombre de usuario, es_favorito, acciones sobre
+reseñas propias, token CSRF). Al responder, cada marcador se reemplaza por
+su fragmento, calculado con consultas pequeñas por usuario.
+
+En plantillas: {% load huecos %} y {% hueco 'nombre' arg1 arg2 %}. Los
+argumentos son enteros (ids). Fuera de una vista con cache_personalizado
+el fragmento se renderiza en el lugar, así que las plantillas funcionan igual
+con o sin caché.
+"""
+import re
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+from django.utils.translation import get_language
+
+from . import membresias, recientes
+from .cache import TIMEOUT_PAGINA, clave_versionada, es_anonimo, es_cacheable
+from .context_processors import notificaciones_no_leidas
+
+
+_MARCADOR = re.compile(r'<!--hueco:(\w+):([\d,]*)-->')
+
+# nombre -> función(request, *args) que devuelve el HTML del fragmento
+FRAGMENTOS = {}
+
+
+def fragmento(nombre):
+    def registrar(funcion):
+        FRAGMENTOS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def marcador(nombre, args):
+    return f'<!--hueco:{nombre}:{",".join(str(int(arg)) for arg in args)}-->'
+
+
+def renderizar(request, nombre, args):
+    return FRAGMENTOS[nombre](request, *(int(arg) for arg in args))
+
+
+def rellenar(request, contenido):
+    """Reemplaza los marcadores de `contenido` por los fragmentos del usuario actual"""
+    calculados = {}
+
+    def reemplazo(coincidencia):
+        clave = coincidencia.group(0)
+        if clave not in calculados:
+            args = coincidencia.group(2).split(',') if coincidencia.group(2) else []
+            calculados[clave] = renderizar(request, coincidencia.group(1), args)
+        return calculados[clave]
+
+    return _MARCADOR.sub(reemplazo, contenido)
+
+
+def perfil(request):
+    """Variante de la página compartida: todo lo que no sea un hueco depende solo de esto"""
+    usuario = request.user
+    if not usuario.is_authenticated:
+        return 'anonimo'
+    return f"{usuario.rol}:superusuario" if usuario.is_superuser else usuario.rol
+
+
+# -------------------------------
+# Fragmentos
+# -------------------------------
+@fragmento('acciones_usuario')
+def acciones_usuario(request):
+    # Badge de notificaciones y menú con el nombre de usuario (base.html)
+    return render_to_string('fragmentos/acciones_usuario.html', {
+        'user': request.user,
+        **notificaciones_no_leidas(request),
+    })
+
+
+@fragmento('mensajes')
+def mensajes(request):
+    return render_to_string('fragmentos/mensajes.html', {'messages': get_messages(request)})
+
+
+@fragmento('csrf')
+def csrf(request):
+    return format_html('<input type="hidden" name="csrfmiddlewaretoken" value="{}">', get_token(request))
+
+
+@fragmento('historial_reciente')
+def historial_reciente(request):
+    if not request.user.is_authenticated:
+        return ''
+    # Desde la lista de recientes en caché: sin consultar Historial
+    return render_to_string('fragmentos/historial_reciente.html', {'historial': recientes.hidratar(request.user.id, 5)})
+
+
+@fragmento('favorito')
+def favorito(request, libro_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string('fragmentos/favorito.html', {
+        'libro_id': libro_id,
+        'es_favorito': libro_id in membresias.para(request).favoritos,
+    })
+
+
+@fragmento('marcas_libro')
+def marcas_libro(request, libro_id):
+    # Acciones rápidas de las tarjetas del catálogo: un hueco por tarjeta, una carga por petición
+    if not request.user.is_authenticated:
+        return ''
+    pertenencias = membresias.para(request)
+    pertenencias.precargar('favoritos', 'en_listas')
+    return render_to_string('fragmentos/marcas_libro.html', {
+        'libro_id': libro_id,
+        'es_favorito': libro_id in pertenencias.favoritos,
+        'en_listas': libro_id in pertenencias.en_listas,
+    })
+
+
+@fragmento('valorar_reseña')
+def valorar_reseña(request, reseña_id, autor_id):
+    return render_to_string('fragmentos/valorar_reseña.html', {
+        'user': request.user, 'reseña_id': reseña_id, 'autor_id': autor_id,
+    })
+
+
+@fragmento('reportar_reseña')
+def reportar_reseña(request, reseña_id, autor_id):
+    return render_to_string('fragmentos/reportar_reseña.html', {
+        'user': request.user, 'reseña_id': reseña_id, 'autor_id': autor_id,
+    })
+
+
+@fragmento('editar_comentario')
+def editar_comentario(request, comentario_id, autor_id):
+    return render_to_string('fragmentos/editar_comentario.html', {
+        'user': request.user, 'comentario_id': comentario_id, 'autor_id': autor_id,
+    })
+
+
+@fragmento('editar_respuesta')
+def editar_respuesta(request, comentario_id, autor_id):
+    return render_to_string('fragmentos/editar_respuesta.html', {
+        'user': request.user, 'comentario_id': comentario_id, 'autor_id': autor_id,
+    })
+
+
+@fragmento('seguir')
+def seguir(request, usuario_id):
+    es_propio = request.user.id == usuario_id
+    return render_to_string('fragmentos/seguir.html', {
+        'usuario_id': usuario_id,
+        'es_propio': es_propio,
+        'esta_siguiendo': (
+            not es_propio and usuario_id in membresias.para(request).siguiendo
+        ),
+    })
+
+
+# -------------------------------
+# Caché de páginas con huecos
+# -------------------------------
+def cache_personalizado(*espacios, timeout=TIMEOUT_PAGINA, efecto=None):
+    """
+    Decorador de vistas para usuarios con sesión: la página se cachea una vez
+    por perfil con marcadores en los huecos, y se rellena en cada respuesta.
+    `efecto(request, *args, **kwargs)` se ejecuta en cada respuesta 200,
+    también cuando se sirve desde la caché (p. ej. registrar la visita).
+    Las peticiones sin sesión las atiende cache_anonimo.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if es_anonimo(request):
+                return vista(request, *args, **kwargs)
+            if request.method not in ('GET', 'HEAD'):
+                return vista(request, *args, **kwargs)
+
+            clave = clave_versionada(
+                f'huecos:{vista.__name__}', espacios,
+                request.get_host(), request.get_full_path(), get_language(), perfil(request),
+            )
+            response = cache.get(clave)
+            if response is None:
+                request.huecos_diferidos = True
+                try:
+                    response = vista(request, *args, **kwargs)
+                finally:
+                    request.huecos_diferidos = False
+                if es_cacheable(request, response):
+                    cache.set(clave, response, timeout)
+
+            if response.status_code == 200 and efecto is not None:
+                efecto(request, *args, **kwargs)
+            if not response.streaming:
+                response.content = rellenar(request, response.content.decode(response.charset))
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,91 @@
+"""
+Reseñas y comentarios de detalle_libro en consultas fijas y por tramos.
+
+Las reseñas llegan paginadas por cursor (10 por tramo) y para cada tramo se
+hacen siempre las mismas dos consultas: la página de reseñas con autor (que
+ya trae sus contadores desnormalizados) y los primeros comentarios de cada
+reseña en orden de hilo (ruta materializada). El árbol se arma en memoria;
+el resto del hilo se pide con "Cargar más comentarios" (cargar_mas_comentarios).
+"""
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comentario
+
+
+# Comentarios por reseña en el primer render y en cada "Cargar más"
+LIMITE_COMENTARIOS = 20
+
+
+def armar_arbol(comentarios):
+    """
+    Enlaza `comentarios` (en orden de hilo) por padre y devuelve los que no
+    tienen su padre en la lista, en orden. Cada comentario trae lista_respuestas.
+    """
+    por_id = {}
+    superiores = []
+    for comentario in comentarios:
+        comentario.lista_respuestas = []
+        por_id[comentario.id] = comentario
+        padre = por_id.get(comentario.padre_id)
+        if padre is None:
+            superiores.append(comentario)
+        else:
+            padre.lista_respuestas.append(comentario)
+    return superiores
+
+
+def cargar_reseñas(reseñas, limite=LIMITE_COMENTARIOS):
+    """
+    Completa una página de reseñas (con usuario ya cargado) para renderizar.
+    Cada reseña trae comentarios_raiz (los primeros `limite` del hilo),
+    ultima_ruta y hay_mas_comentarios; los totales salen de sus contadores.
+    """
+    ids = [reseña.id for reseña in reseñas]
+    if not ids:
+        return reseñas
+
+    # Los primeros `limite` comentarios de cada reseña en orden de hilo
+    primeros = (
+        Comentario.objects.filter(reseña_id__in=ids)
+        .annotate(posicion=Window(RowNumber(), partition_by=F('reseña_id'), order_by=F('ruta').asc()))
+        .filter(posicion__lte=limite)
+        .select_related('usuario')
+        .order_by('reseña_id', 'ruta')
+    )
+    por_reseña = {reseña_id: [] for reseña_id in ids}
+    for comentario in primeros:
+        por_reseña[comentario.reseña_id].append(comentario)
+
+    for reseña in reseñas:
+        comentarios = por_reseña[reseña.id]
+        # En orden de hilo el primer tramo empieza en una raíz: todos sus superiores lo son
+        reseña.comentarios_raiz = armar_arbol(comentarios)
+        reseña.ultima_ruta = comentarios[-1].ruta if comentarios else ''
+        reseña.hay_mas_comentarios = reseña.total_comentarios > len(comentarios)
+    return reseñas
+
+
+def cargar_mas_comentarios(reseña_id, despues, limite=LIMITE_COMENTARIOS):
+    """
+    Siguiente tramo del hilo de una reseña después de la ruta `despues`, con
+    un solo rango sobre comentario_ruta_idx. Devuelve (grupos, ultima_ruta,
+    hay_mas); cada grupo es {'padre', 'comentarios'} con comentarios
+    consecutivos que cuelgan del mismo padre (None para raíces).
+    """
+    comentarios = list(
+        Comentario.objects.filter(reseña_id=reseña_id, ruta__gt=despues)
+        .select_related('usuario')
+        .order_by('ruta')[:limite + 1]
+    )
+    hay_mas = len(comentarios) > limite
+    comentarios = comentarios[:limite]
+
+    grupos = []
+    for comentario in armar_arbol(comentarios):
+        if grupos and grupos[-1]['padre'] == comentario.padre_id:
+            grupos[-1]['comentarios'].append(comentario)
+        else:
+            grupos.append({'padre': comentario.padre_id, 'comentarios': [comentario]})
+    ultima_ruta = comentarios[-1].ruta if comentarios else despues
+    return grupos, ultima_ruta, hay_mas
@@ -0,0 +1,191 @@
+"""
+Edición de los libros de una Lista sin recorrer el catálogo.
+
+El formulario de la lista ya no lleva un <select> con todos los libros: el
+selector pide páginas de resultados a la vista selector_libros (búsqueda de
+texto o catálogo por id, con cursor) y marca cuáles ya están en la lista con
+una consulta sobre los ids de la página. Lo que se envía es solo la diferencia
+(agregar / quitar), que aplicar_cambios() aplica en una transacción.
+
+Los libros se agregan al final con agregar_libros() (y no con lista.libros.add, que
+no sabe qué posición darles) y se reordenan con mover(): cada operación
+escribe solo las filas que cambian, salvo la renumeración ocasional cuando
+dos posiciones vecinas quedan pegadas (ver LibroEnLista).
+
+Abrir y guardar una lista cuesta lo mismo con 200 libros que con 200.000.
+"""
+from django import forms
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+
+from .models import Libro, LibroEnLista, Lista
+
+
+# Libros que se pueden agregar o quitar en un mismo envío
+MAX_CAMBIOS = 500
+
+# Filas por lote al renumerar
+LOTE_RENUMERAR = 1000
+
+
+def leer_ids(valor):
+    """
+    Ids sin repetir, en el orden recibido, a partir de "1,2,3" (o de una lista
+    de valores). Lanza ValidationError si algún id no es un entero positivo o
+    son demasiados.
+    """
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    ids = {}
+    for parte in valor or ():
+        parte = str(parte).strip()
+        if not parte:
+            continue
+        if not parte.isdigit() or int(parte) == 0:
+            raise forms.ValidationError("La selección de libros no es válida.")
+        ids[int(parte)] = None
+    if len(ids) > MAX_CAMBIOS:
+        raise forms.ValidationError(f"Puedes agregar o quitar hasta {MAX_CAMBIOS} libros por vez.")
+    return list(ids)
+
+
+def ids_en_lista(lista, libro_ids):
+    """Cuáles de `libro_ids` están en `lista` (una consulta sobre la tabla intermedia)"""
+    if lista is None or not libro_ids:
+        return set()
+    return set(
+        LibroEnLista.objects.filter(lista_id=lista.pk, libro_id__in=libro_ids)
+        .values_list('libro_id', flat=True)
+    )
+
+
+def _bloquear(lista):
+    # Serializa las ediciones simultáneas de la misma lista
+    Lista.objects.select_for_update().only('pk').get(pk=lista.pk)
+
+
+def _ultima_posicion(lista_id):
+    # Última fila de lista_libro_posicion_idx
+    return (
+        LibroEnLista.objects.filter(lista_id=lista_id).order_by('-posicion')
+        .values_list('posicion', flat=True).first()
+    ) or 0
+
+
+def agregar_libros(lista, libro_ids):
+    """
+    Agrega al final de `lista`, en el orden dado, los libros que existen y
+    aún no están. Devuelve los ids agregados.
+
+    bulk_create no envía m2m_changed, así que se envía aquí igual que lo haría
+    lista.libros.add, para que los receivers (estadísticas, tendencias,
+    total_libros, membresías) vean el cambio.
+    """
+    libro_ids = list(dict.fromkeys(libro_ids))
+    if not libro_ids:
+        return []
+    with transaction.atomic():
+        _bloquear(lista)
+        presentes = ids_en_lista(lista, libro_ids)
+        existentes = set(Libro.objects.filter(id__in=libro_ids).values_list('id', flat=True))
+        nuevos = [libro_id for libro_id in libro_ids if libro_id in existentes and libro_id not in presentes]
+        if not nuevos:
+            return []
+
+        usando = router.db_for_write(LibroEnLista, instance=lista)
+        senal = dict(sender=LibroEnLista, instance=lista, reverse=False, model=Libro, pk_set=set(nuevos), using=usando)
+        m2m_changed.send(action='pre_add', **senal)
+        ultima = _ultima_posicion(lista.pk)
+        LibroEnLista.objects.using(usando).bulk_create([
+            LibroEnLista(lista_id=lista.pk, libro_id=libro_id, posicion=ultima + numero * LibroEnLista.HUECO)
+            for numero, libro_id in enumerate(nuevos, start=1)
+        ])
+        m2m_changed.send(action='post_add', **senal)
+    return nuevos
+
+
+def renumerar(lista, lote=LOTE_RENUMERAR):
+    """Vuelve a espaciar las posiciones de `lista` cada HUECO, sin cambiar el orden"""
+    ids = list(LibroEnLista.objects.filter(lista_id=lista.pk).order_by('posicion', 'id').values_list('id', flat=True))
+    for inicio in range(0, len(ids), lote):
+        LibroEnLista.objects.bulk_update(
+            [
+                LibroEnLista(id=entrada_id, posicion=(inicio + numero) * LibroEnLista.HUECO)
+                for numero, entrada_id in enumerate(ids[inicio:inicio + lote], start=1)
+            ],
+            ['posicion'],
+        )
+
+
+def _posicion_despues_de(entradas, libro_id, despues_de):
+    """Posición libre entre `despues_de` (o el principio) y el libro que le sigue; None si no hay hueco"""
+    otras = entradas.exclude(libro_id=libro_id).order_by('posicion', 'id').values_list('posicion', flat=True)
+    if despues_de is None:
+        anterior = None
+        siguiente = otras.first()
+    else:
+        anterior = otras.filter(libro_id=despues_de).first()
+        siguiente = otras.filter(posicion__gt=anterior).first()
+    if anterior is None and siguiente is None:
+        return LibroEnLista.HUECO
+    if anterior is None:
+        return siguiente - LibroEnLista.HUECO
+    if siguiente is None:
+        return anterior + LibroEnLista.HUECO
+    if siguiente - anterior >= 2:
+        return (anterior + siguiente) // 2
+    return None
+
+
+def mover(lista, libro_id, despues_de=None):
+    """
+    Pone `libro_id` justo después del libro `despues_de` (al principio si es
+    None). Devuelve False si alguno de los dos no está en la lista.
+    """
+    if despues_de == libro_id:
+        return False
+    with transaction.atomic():
+        _bloquear(lista)
+        entradas = LibroEnLista.objects.filter(lista_id=lista.pk)
+        ids = [libro_id] if despues_de is None else [libro_id, despues_de]
+        if len(ids_en_lista(lista, ids)) != len(ids):
+            return False
+        posicion = _posicion_despues_de(entradas, libro_id, despues_de)
+        if posicion is None:
+            renumerar(lista)
+            posicion = _posicion_despues_de(entradas, libro_id, despues_de)
+        entradas.filter(libro_id=libro_id).update(posicion=posicion)
+    return True
+
+
+def mover_al_final(lista, libro_id):
+    """Pone `libro_id` después del último libro de la lista. False si no está en ella"""
+    with transaction.atomic():
+        _bloquear(lista)
+        entradas = LibroEnLista.objects.filter(lista_id=lista.pk, libro_id=libro_id)
+        return bool(entradas.update(posicion=_ultima_posicion(lista.pk) + LibroEnLista.HUECO))
+
+
+def aplicar_cambios(lista, agregar=(), quitar=()):
+    """
+    Agrega (al final, en el orden dado) y quita libros de `lista` en una
+    transacción. Los ids que aparecen en ambas listas se ignoran, y los libros
+    inexistentes, ya presentes o ya ausentes no cuentan. Devuelve
+    {'agregados', 'quitados'}.
+
+    Las bajas van por lista.libros.remove, que envía m2m_changed a los
+    receivers igual que agregar_libros().
+    """
+    ambos = set(agregar) & set(quitar)
+    agregar = [libro_id for libro_id in agregar if libro_id not in ambos]
+    quitar = [libro_id for libro_id in quitar if libro_id not in ambos]
+    if not agregar and not quitar:
+        return {'agregados': 0, 'quitados': 0}
+
+    with transaction.atomic():
+        _bloquear(lista)
+        sobrantes = ids_en_lista(lista, quitar)
+        if sobrantes:
+            lista.libros.remove(*sobrantes)
+        nuevos = agregar_libros(lista, agregar)
+    return {'agregados': len(nuevos), 'quitados': len(sobrantes)}
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca import tendencias
+
+
+class Command(BaseCommand):
+    help = "Recalcula el ranking de libros en tendencia y lo guarda en la base de datos (biblioteca/tendencias.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=tendencias.TOP_K, help="Libros por ranking")
+
+    def handle(self, *args, **options):
+        ranking = tendencias.calcular(options['top'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(ranking['general'])} libro(s) en tendencia; {len(ranking['generos'])} género(s) con ranking."
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca import compactacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacta Historial: colapsa visitas seguidas al mismo libro, pasa las antiguas "
+        "a HistorialDiario y recorta el historial de cada usuario (biblioteca/compactacion.py)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=compactacion.DIAS_DETALLE,
+                            help="Días de historial que se conservan visita por visita")
+        parser.add_argument('--maximo', type=int, default=compactacion.MAXIMO_POR_USUARIO,
+                            help="Filas de historial por usuario como máximo")
+        parser.add_argument('--lote', type=int, default=compactacion.LOTE, help="Filas por lote de borrado")
+
+    def handle(self, *args, **options):
+        resultado = compactacion.compactar(options['dias'], options['maximo'], options['lote'])
+        if resultado is None:
+            self.stdout.write(self.style.WARNING("Ya hay una compactación en curso."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['colapsadas']} visita(s) colapsada(s), {resultado['enrolladas']} enrollada(s) "
+            f"por antigüedad y {resultado['recortadas']} recortada(s) por usuario."
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca import resultados
+
+
+class Command(BaseCommand):
+    help = "Muestra aciertos y fallos de la caché de resultados de buscar_libros y lista_libros"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help="Pone los contadores a cero después de mostrarlos")
+
+    def handle(self, *args, **options):
+        datos = resultados.estadisticas()
+        self.stdout.write(
+            f"Aciertos: {datos['aciertos']}  Fallos: {datos['fallos']}  "
+            f"Tasa de aciertos: {datos['ratio']:.1%}"
+        )
+        if options['reiniciar']:
+            resultados.reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados."))
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from biblioteca.models import Comentario, LibroEnLista, Lista, Reseña, ValoracionReseña
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores de valoraciones y comentarios de cada reseña, "
+        "el de respuestas de cada comentario y el de libros de cada lista"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Filas por lote de actualización")
+        parser.add_argument(
+            '--utilidad', action='store_true',
+            help="Recalcular también la utilidad de todas las reseñas (p. ej. tras cargas con bulk_create)",
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+
+        # Consultas agrupadas con los valores reales
+        valoraciones = {
+            fila['reseña_id']: (fila['suma'], fila['total'])
+            for fila in ValoracionReseña.objects.values('reseña_id').annotate(suma=Sum('puntuacion'), total=Count('id'))
+        }
+        comentarios = dict(
+            Comentario.objects.values('reseña_id').annotate(total=Count('id')).values_list('reseña_id', 'total')
+        )
+        respuestas = dict(
+            Comentario.objects.filter(padre__isnull=False)
+            .values('padre_id').annotate(total=Count('id')).values_list('padre_id', 'total')
+        )
+
+        reseñas_corregidas = 0
+        ids = list(Reseña.objects.order_by('id').values_list(
+            'id', 'suma_puntuacion', 'total_valoraciones', 'total_comentarios'
+        ))
+        for inicio in range(0, len(ids), lote):
+            con_desvio = [
+                reseña_id for reseña_id, suma, total, total_comentarios in ids[inicio:inicio + lote]
+                if valoraciones.get(reseña_id, (0, 0)) != (suma, total)
+                or comentarios.get(reseña_id, 0) != total_comentarios
+            ]
+            for reseña_id in con_desvio:
+                Reseña.recalcular_contadores(reseña_id)
+            reseñas_corregidas += len(con_desvio)
+
+        comentarios_corregidos = 0
+        total_revisados = 0
+        for comentario_id, total in Comentario.objects.order_by('id').values_list('id', 'total_respuestas').iterator(chunk_size=lote):
+            total_revisados += 1
+            if respuestas.get(comentario_id, 0) != total:
+                Comentario.recalcular_respuestas(comentario_id)
+                comentarios_corregidos += 1
+
+        libros_por_lista = dict(
+            LibroEnLista.objects.values('lista_id').annotate(total=Count('id')).values_list('lista_id', 'total')
+        )
+        listas_corregidas = 0
+        for lista_id, total in Lista.objects.order_by('id').values_list('id', 'total_libros').iterator(chunk_size=lote):
+            if libros_por_lista.get(lista_id, 0) != total:
+                Lista.objects.filter(pk=lista_id).update(total_libros=libros_por_lista.get(lista_id, 0))
+                listas_corregidas += 1
+
+        if options['utilidad']:
+            Reseña.recalcular_utilidad(lote=lote)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{reseñas_corregidas} reseña(s) corregida(s) de {len(ids)} revisadas; "
+            f"{comentarios_corregidos} comentario(s) corregido(s) de {total_revisados} revisados; "
+            f"{listas_corregidas} lista(s) corregida(s)."
+        ))
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from biblioteca.models import EstadisticasLibro, Favorito, Historial, HistorialDiario, Libro, Lista, Reseña
+
+
+CAMPOS = (
+    'estrellas_1', 'estrellas_2', 'estrellas_3', 'estrellas_4', 'estrellas_5',
+    'total_favoritos', 'total_listas', 'total_visitas',
+)
+
+
+def _por_libro(queryset):
+    return dict(queryset.values('libro_id').annotate(c=Count('id')).values_list('libro_id', 'c'))
+
+
+class Command(BaseCommand):
+    help = "Recalcula la fila de EstadisticasLibro de cada libro (y crea las que falten)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Libros por lote de revisión")
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+
+        # Consultas agrupadas con los valores reales
+        estrellas = {}
+        for libro_id, calificacion, cantidad in (
+            Reseña.objects.values('libro_id', 'calificacion').annotate(c=Count('id'))
+            .values_list('libro_id', 'calificacion', 'c')
+        ):
+            campo = EstadisticasLibro.campo_estrellas(calificacion)
+            fila = estrellas.setdefault(libro_id, {})
+            fila[campo] = fila.get(campo, 0) + cantidad
+        favoritos = _por_libro(Favorito.objects.all())
+        listas = _por_libro(Lista.libros.through.objects.all())
+        # Visitas: filas de Historial más las ya compactadas en HistorialDiario
+        visitas = Counter(_por_libro(Historial.objects.all()))
+        visitas.update(dict(
+            HistorialDiario.objects.values('libro_id').annotate(v=Sum('visitas')).values_list('libro_id', 'v')
+        ))
+
+        def reales(libro_id):
+            fila = estrellas.get(libro_id, {})
+            return tuple(fila.get(f'estrellas_{n}', 0) for n in range(1, 6)) + (
+                favoritos.get(libro_id, 0), listas.get(libro_id, 0), visitas.get(libro_id, 0),
+            )
+
+        corregidos = 0
+        ids = list(Libro.objects.order_by('id').values_list('id', flat=True))
+        for inicio in range(0, len(ids), lote):
+            tramo = ids[inicio:inicio + lote]
+            guardadas = {
+                fila[0]: fila[1:]
+                for fila in EstadisticasLibro.objects.filter(libro_id__in=tramo).values_list('libro_id', *CAMPOS)
+            }
+            con_desvio = [libro_id for libro_id in tramo if guardadas.get(libro_id) != reales(libro_id)]
+            for libro_id in con_desvio:
+                EstadisticasLibro.recalcular(libro_id)
+            corregidos += len(con_desvio)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{corregidos} libro(s) corregido(s) de {len(ids)} revisados."
+        ))
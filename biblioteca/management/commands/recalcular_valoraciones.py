@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from biblioteca.models import Libro, Reseña
+
+
+class Command(BaseCommand):
+    help = "Recalcula suma_calificaciones, total_reseñas y promedio de cada libro a partir de sus reseñas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Libros por lote de actualización")
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+
+        # Una sola consulta agrupada con los valores reales
+        reales = {
+            fila['libro_id']: (fila['suma'], fila['total'])
+            for fila in Reseña.objects.values('libro_id').annotate(suma=Sum('calificacion'), total=Count('id'))
+        }
+
+        corregidos = 0
+        ids = list(Libro.objects.order_by('id').values_list('id', 'suma_calificaciones', 'total_reseñas'))
+        for inicio in range(0, len(ids), lote):
+            con_desvio = [
+                libro_id for libro_id, suma, total in ids[inicio:inicio + lote]
+                if reales.get(libro_id, (0, 0)) != (suma, total)
+            ]
+            for libro_id in con_desvio:
+                Libro.recalcular_calificaciones(libro_id)
+            corregidos += len(con_desvio)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{corregidos} libro(s) corregido(s) de {len(ids)} revisados."
+        ))
@@ -0,0 +1,98 @@
+"""
+Pertenencias del usuario actual: libros favoritos, libros en alguna de sus
+listas y usuarios que sigue.
+
+Cada conjunto se carga como mucho una vez por petición (la instancia de
+Membresias queda en el request) y entre peticiones vive en la caché por
+usuario; los receivers de signals.py borran la clave del usuario afectado
+cuando cambian Favorito, Lista o Seguimiento. Preguntar es un `in` sobre un
+frozenset: sin consultas por fila.
+
+En plantillas sin caché se usa `membresias` (context processor). Las páginas
+de cache_personalizado se comparten entre usuarios, así que ahí la
+pertenencia va en huecos (fragmentos.py), que usan esta misma instancia.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import PREFIJO
+from .models import Favorito, Lista, Seguimiento
+
+
+TIMEOUT_MEMBRESIAS = 60 * 60
+
+# tipo -> consulta con los ids del conjunto de un usuario
+CONSULTAS = {
+    'favoritos': lambda usuario_id: Favorito.objects.filter(usuario_id=usuario_id).values_list('libro_id', flat=True),
+    'en_listas': lambda usuario_id: (
+        Lista.libros.through.objects.filter(lista__usuario_id=usuario_id).values_list('libro_id', flat=True)
+    ),
+    'siguiendo': lambda usuario_id: (
+        Seguimiento.objects.filter(seguidor_id=usuario_id).values_list('seguido_id', flat=True)
+    ),
+}
+
+
+def _clave(tipo, usuario_id):
+    return f'{PREFIJO}:membresias:{tipo}:{usuario_id}'
+
+
+def invalidar(tipo, *usuario_ids):
+    """Borra los conjuntos cacheados al confirmar la transacción (antes se podría releer el valor viejo)"""
+    claves = [_clave(tipo, usuario_id) for usuario_id in usuario_ids if usuario_id is not None]
+    if claves:
+        transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+class Membresias:
+    """Conjuntos de ids del usuario, cargados a demanda"""
+
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self._conjuntos = {}
+
+    def precargar(self, *tipos):
+        """Trae varios conjuntos con una sola lectura a la caché (y consulta solo los que falten)"""
+        tipos = [tipo for tipo in tipos or CONSULTAS if tipo not in self._conjuntos]
+        if not tipos:
+            return
+        if self.usuario_id is None:
+            self._conjuntos.update({tipo: frozenset() for tipo in tipos})
+            return
+        claves = {tipo: _clave(tipo, self.usuario_id) for tipo in tipos}
+        encontrados = cache.get_many(list(claves.values()))
+        faltantes = {}
+        for tipo, clave in claves.items():
+            if clave in encontrados:
+                self._conjuntos[tipo] = encontrados[clave]
+            else:
+                faltantes[clave] = self._conjuntos[tipo] = frozenset(CONSULTAS[tipo](self.usuario_id))
+        if faltantes:
+            cache.set_many(faltantes, TIMEOUT_MEMBRESIAS)
+
+    def _conjunto(self, tipo):
+        if tipo not in self._conjuntos:
+            self.precargar(tipo)
+        return self._conjuntos[tipo]
+
+    @property
+    def favoritos(self):
+        return self._conjunto('favoritos')
+
+    @property
+    def en_listas(self):
+        return self._conjunto('en_listas')
+
+    @property
+    def siguiendo(self):
+        return self._conjunto('siguiendo')
+
+
+def para(request):
+    """La instancia de la petición (una sola por request)"""
+    membresias = getattr(request, '_membresias', None)
+    if membresias is None:
+        usuario = request.user
+        membresias = Membresias(usuario.id if usuario.is_authenticated else None)
+        request._membresias = membresias
+    return membresias
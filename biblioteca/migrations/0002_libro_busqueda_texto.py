@@ -0,0 +1,71 @@
+# Índice de texto completo para la búsqueda de libros (titulo, autor, descripcion)
+
+from django.db import migrations
+
+
+SQLITE_CREAR = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS biblioteca_libro_fts USING fts5(
+        titulo, autor, descripcion,
+        content='biblioteca_libro', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_libro_fts_ai AFTER INSERT ON biblioteca_libro BEGIN
+        INSERT INTO biblioteca_libro_fts(rowid, titulo, autor, descripcion)
+        VALUES (new.id, new.titulo, new.autor, new.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_libro_fts_ad AFTER DELETE ON biblioteca_libro BEGIN
+        INSERT INTO biblioteca_libro_fts(biblioteca_libro_fts, rowid, titulo, autor, descripcion)
+        VALUES ('delete', old.id, old.titulo, old.autor, old.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_libro_fts_au AFTER UPDATE ON biblioteca_libro BEGIN
+        INSERT INTO biblioteca_libro_fts(biblioteca_libro_fts, rowid, titulo, autor, descripcion)
+        VALUES ('delete', old.id, old.titulo, old.autor, old.descripcion);
+        INSERT INTO biblioteca_libro_fts(rowid, titulo, autor, descripcion)
+        VALUES (new.id, new.titulo, new.autor, new.descripcion);
+    END
+    """,
+    "INSERT INTO biblioteca_libro_fts(biblioteca_libro_fts) VALUES ('rebuild')",
+]
+
+SQLITE_ELIMINAR = [
+    "DROP TRIGGER IF EXISTS biblioteca_libro_fts_ai",
+    "DROP TRIGGER IF EXISTS biblioteca_libro_fts_ad",
+    "DROP TRIGGER IF EXISTS biblioteca_libro_fts_au",
+    "DROP TABLE IF EXISTS biblioteca_libro_fts",
+]
+
+MYSQL_CREAR = [
+    "CREATE FULLTEXT INDEX biblioteca_libro_fulltext ON biblioteca_libro (titulo, autor, descripcion)",
+]
+
+MYSQL_ELIMINAR = [
+    "DROP INDEX biblioteca_libro_fulltext ON biblioteca_libro",
+]
+
+
+def ejecutar(sentencias_por_motor):
+    def operacion(apps, schema_editor):
+        for sentencia in sentencias_por_motor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sentencia)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            ejecutar({'sqlite': SQLITE_CREAR, 'mysql': MYSQL_CREAR}),
+            ejecutar({'sqlite': SQLITE_ELIMINAR, 'mysql': MYSQL_ELIMINAR}),
+        ),
+    ]
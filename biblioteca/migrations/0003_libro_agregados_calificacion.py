@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def calcular_agregados(apps, schema_editor):
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Reseña = apps.get_model('biblioteca', 'Reseña')
+
+    por_libro = Reseña.objects.filter(libro=OuterRef('pk')).order_by().values('libro')
+    Libro.objects.update(
+        suma_calificaciones=Coalesce(
+            Subquery(por_libro.annotate(s=Sum('calificacion')).values('s'), output_field=IntegerField()), 0
+        ),
+        total_reseñas=Coalesce(
+            Subquery(por_libro.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0
+        ),
+    )
+    for libro in Libro.objects.filter(total_reseñas__gt=0).only('id', 'suma_calificaciones', 'total_reseñas').iterator():
+        Libro.objects.filter(id=libro.id).update(promedio=libro.suma_calificaciones / libro.total_reseñas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0002_libro_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='promedio',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='suma_calificaciones',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='total_reseñas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['-promedio', '-total_reseñas'], name='libro_valoracion_idx'),
+        ),
+        migrations.RunPython(calcular_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0003_libro_agregados_calificacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['titulo', 'id'], name='libro_titulo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['autor', 'id'], name='libro_autor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='notif_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['-fecha', '-id'], name='resena_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+from biblioteca.texto import normalizar
+
+
+def calcular_claves(apps, schema_editor):
+    Libro = apps.get_model('biblioteca', 'Libro')
+    lote = []
+    for libro in Libro.objects.only('id', 'titulo', 'autor').iterator(chunk_size=2000):
+        libro.clave_busqueda = normalizar(f'{libro.titulo} {libro.autor}')
+        lote.append(libro)
+        if len(lote) >= 2000:
+            Libro.objects.bulk_update(lote, ['clave_busqueda'])
+            lote = []
+    if lote:
+        Libro.objects.bulk_update(lote, ['clave_busqueda'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0004_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='clave_busqueda',
+            field=models.CharField(blank=True, default='', editable=False, max_length=400),
+        ),
+        migrations.RunPython(calcular_claves, migrations.RunPython.noop),
+    ]
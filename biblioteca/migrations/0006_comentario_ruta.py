@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+from biblioteca import rutas
+
+
+def calcular_rutas(apps, schema_editor):
+    rutas.reconstruir(apps.get_model('biblioteca', 'Comentario'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0005_libro_clave_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comentario',
+            name='profundidad',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comentario',
+            name='ruta',
+            field=models.CharField(default='', editable=False, max_length=440),
+        ),
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['reseña', 'ruta'], name='comentario_ruta_idx'),
+        ),
+        migrations.RunPython(calcular_rutas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0006_comentario_ruta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['libro', '-fecha', '-id'], name='resena_libro_fecha_idx'),
+        ),
+    ]
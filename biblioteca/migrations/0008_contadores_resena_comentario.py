@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def calcular_contadores(apps, schema_editor):
+    Reseña = apps.get_model('biblioteca', 'Reseña')
+    Comentario = apps.get_model('biblioteca', 'Comentario')
+    ValoracionReseña = apps.get_model('biblioteca', 'ValoracionReseña')
+
+    valoraciones = ValoracionReseña.objects.filter(reseña=OuterRef('pk')).order_by().values('reseña')
+    comentarios = Comentario.objects.filter(reseña=OuterRef('pk')).order_by().values('reseña')
+    Reseña.objects.update(
+        suma_puntuacion=Coalesce(
+            Subquery(valoraciones.annotate(s=Sum('puntuacion')).values('s'), output_field=IntegerField()), 0
+        ),
+        total_valoraciones=Coalesce(
+            Subquery(valoraciones.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0
+        ),
+        total_comentarios=Coalesce(
+            Subquery(comentarios.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0
+        ),
+    )
+
+    respuestas = Comentario.objects.filter(padre=OuterRef('pk')).order_by().values('padre')
+    Comentario.objects.update(
+        total_respuestas=Coalesce(
+            Subquery(respuestas.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0007_indice_resenas_libro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comentario',
+            name='total_respuestas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reseña',
+            name='suma_puntuacion',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reseña',
+            name='total_comentarios',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reseña',
+            name='total_valoraciones',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+from biblioteca import utilidad
+
+
+def calcular_utilidad(apps, schema_editor):
+    Reseña = apps.get_model('biblioteca', 'Reseña')
+    pendientes = []
+    for reseña in Reseña.objects.only('id', 'suma_puntuacion', 'total_valoraciones', 'fecha').iterator(chunk_size=2000):
+        reseña.utilidad = utilidad.puntaje(reseña.suma_puntuacion, reseña.total_valoraciones, reseña.fecha)
+        pendientes.append(reseña)
+        if len(pendientes) >= 2000:
+            Reseña.objects.bulk_update(pendientes, ['utilidad'])
+            pendientes = []
+    if pendientes:
+        Reseña.objects.bulk_update(pendientes, ['utilidad'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0008_contadores_resena_comentario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reseña',
+            name='utilidad',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['libro', '-utilidad', '-id'], name='resena_libro_utilidad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['-utilidad', '-id'], name='resena_utilidad_idx'),
+        ),
+        migrations.RunPython(calcular_utilidad, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def calcular_estadisticas(apps, schema_editor):
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Reseña = apps.get_model('biblioteca', 'Reseña')
+    Favorito = apps.get_model('biblioteca', 'Favorito')
+    Historial = apps.get_model('biblioteca', 'Historial')
+    Lista = apps.get_model('biblioteca', 'Lista')
+    EstadisticasLibro = apps.get_model('biblioteca', 'EstadisticasLibro')
+
+    def por_libro(queryset):
+        return dict(queryset.values('libro_id').annotate(c=Count('id')).values_list('libro_id', 'c'))
+
+    estrellas = {}
+    for libro_id, calificacion, cantidad in (
+        Reseña.objects.values('libro_id', 'calificacion').annotate(c=Count('id'))
+        .values_list('libro_id', 'calificacion', 'c')
+    ):
+        campo = f'estrellas_{min(max(calificacion, 1), 5)}'
+        fila = estrellas.setdefault(libro_id, {})
+        fila[campo] = fila.get(campo, 0) + cantidad
+    favoritos = por_libro(Favorito.objects.all())
+    visitas = por_libro(Historial.objects.all())
+    listas = por_libro(Lista.libros.through.objects.all())
+
+    filas = [
+        EstadisticasLibro(
+            libro_id=libro_id,
+            total_favoritos=favoritos.get(libro_id, 0),
+            total_listas=listas.get(libro_id, 0),
+            total_visitas=visitas.get(libro_id, 0),
+            **estrellas.get(libro_id, {}),
+        )
+        for libro_id in Libro.objects.values_list('id', flat=True).iterator()
+    ]
+    EstadisticasLibro.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0009_resena_utilidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticasLibro',
+            fields=[
+                ('libro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadisticas', serialize=False, to='biblioteca.libro')),
+                ('estrellas_1', models.PositiveIntegerField(default=0)),
+                ('estrellas_2', models.PositiveIntegerField(default=0)),
+                ('estrellas_3', models.PositiveIntegerField(default=0)),
+                ('estrellas_4', models.PositiveIntegerField(default=0)),
+                ('estrellas_5', models.PositiveIntegerField(default=0)),
+                ('total_favoritos', models.PositiveIntegerField(default=0)),
+                ('total_listas', models.PositiveIntegerField(default=0)),
+                ('total_visitas', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(calcular_estadisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0010_estadisticas_libro'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historial',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0011_historial_fecha_visita'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('visitas', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='historial',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='historial_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historial',
+            index=models.Index(fields=['fecha', 'id'], name='historial_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='historialdiario',
+            name='libro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.libro'),
+        ),
+        migrations.AddField(
+            model_name='historialdiario',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_diario', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='historialdiario',
+            index=models.Index(fields=['usuario', '-dia'], name='historial_diario_usuario_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='historialdiario',
+            constraint=models.UniqueConstraint(fields=('usuario', 'libro', 'dia'), name='historial_diario_unico'),
+        ),
+    ]
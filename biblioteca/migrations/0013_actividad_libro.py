@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0012_historial_compactacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActividadLibro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bloque', models.DateTimeField()),
+                ('visitas', models.PositiveIntegerField(default=0)),
+                ('favoritos', models.PositiveIntegerField(default=0)),
+                ('reseñas', models.PositiveIntegerField(default=0)),
+                ('listas', models.PositiveIntegerField(default=0)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actividad', to='biblioteca.libro')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bloque'], name='actividad_bloque_idx')],
+                'constraints': [models.UniqueConstraint(fields=('libro', 'bloque'), name='actividad_libro_bloque_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+HUECO = 1 << 20
+LOTE = 1000
+
+
+def numerar_posiciones(apps, schema_editor):
+    """Posiciones con huecos en el orden en que se agregaron los libros (id de la fila)"""
+    Lista = apps.get_model('biblioteca', 'Lista')
+    LibroEnLista = apps.get_model('biblioteca', 'LibroEnLista')
+
+    for lista_id in Lista.objects.values_list('id', flat=True).iterator():
+        entradas = list(LibroEnLista.objects.filter(lista_id=lista_id).order_by('id').only('id'))
+        for numero, entrada in enumerate(entradas, start=1):
+            entrada.posicion = numero * HUECO
+        LibroEnLista.objects.bulk_update(entradas, ['posicion'], batch_size=LOTE)
+
+    Lista.objects.update(total_libros=Coalesce(Subquery(
+        LibroEnLista.objects.filter(lista_id=OuterRef('pk')).order_by()
+        .values('lista_id').annotate(c=Count('id')).values('c')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0013_actividad_libro'),
+    ]
+
+    operations = [
+        # La tabla biblioteca_lista_libros ya existe: solo cambia el estado de los modelos
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='LibroEnLista',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas_lista', to='biblioteca.libro')),
+                        ('lista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas', to='biblioteca.lista')),
+                    ],
+                    options={
+                        'db_table': 'biblioteca_lista_libros',
+                        'unique_together': {('lista', 'libro')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='lista',
+                    name='libros',
+                    field=models.ManyToManyField(related_name='listas', through='biblioteca.LibroEnLista', to='biblioteca.libro'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='libroenlista',
+            name='posicion',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='libroenlista',
+            name='fecha_agregado',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='lista',
+            name='total_libros',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(numerar_posiciones, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='libroenlista',
+            index=models.Index(fields=['lista', 'posicion', 'id'], name='lista_libro_posicion_idx'),
+        ),
+    ]
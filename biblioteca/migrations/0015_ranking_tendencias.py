@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0014_libro_en_lista'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingTendencias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('general', models.JSONField(default=list)),
+                ('generos', models.JSONField(default=dict)),
+                ('calculado', models.DateTimeField()),
+            ],
+        ),
+    ]
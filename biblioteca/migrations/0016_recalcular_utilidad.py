@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from biblioteca import utilidad
+
+
+def recalcular_utilidad(apps, schema_editor):
+    # utilidad.VIDA_MEDIA pasó de 30 días a un año: los puntajes guardados cambian de escala
+    Reseña = apps.get_model('biblioteca', 'Reseña')
+    pendientes = []
+    for reseña in Reseña.objects.only('id', 'suma_puntuacion', 'total_valoraciones', 'fecha').iterator(chunk_size=2000):
+        reseña.utilidad = utilidad.puntaje(reseña.suma_puntuacion, reseña.total_valoraciones, reseña.fecha)
+        pendientes.append(reseña)
+        if len(pendientes) >= 2000:
+            Reseña.objects.bulk_update(pendientes, ['utilidad'])
+            pendientes = []
+    if pendientes:
+        Reseña.objects.bulk_update(pendientes, ['utilidad'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0015_ranking_tendencias'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_utilidad, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 from usuarios.models import Usuario
 
+from . import rutas, utilidad
+from .texto import normalizar
+
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
@@ -29,20 +35,215 @@ class Libro(models.Model):
     fecha_publicacion = models.DateField(blank=True, null=True)
     portada = models.ImageField(upload_to="portadas/", blank=True, null=True)
 
+    # Título + autor normalizados (sin tildes, minúsculas); base del índice de trigramas
+    clave_busqueda = models.CharField(max_length=400, blank=True, default='', editable=False)
+
+    # Agregados de reseñas desnormalizados (ver Libro.aplicar_calificacion)
+    suma_calificaciones = models.PositiveIntegerField(default=0)
+    total_reseñas = models.PositiveIntegerField(default=0)
+    promedio = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-promedio', '-total_reseñas'], name='libro_valoracion_idx'),
+            # Claves de la paginación por cursor (ver paginacion.py)
+            models.Index(fields=['titulo', 'id'], name='libro_titulo_idx'),
+            models.Index(fields=['autor', 'id'], name='libro_autor_idx'),
+        ]
+
+    # Solo los modifican aplicar_calificacion / recalcular_calificaciones
+    CAMPOS_AGREGADOS = ('suma_calificaciones', 'total_reseñas', 'promedio')
+
     def __str__(self):
         return self.titulo
+
+    def save(self, *args, **kwargs):
+        self.clave_busqueda = normalizar(f'{self.titulo} {self.autor}')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'titulo', 'autor'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'clave_busqueda'}
+
+        # Al editar un libro (formularios, admin) no pisar los agregados con
+        # valores leídos antes de que llegara una reseña concurrente
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_AGREGADOS
+            ]
+        super().save(*args, **kwargs)
     
     def promedio_calificacion(self):
-        """Calcula el promedio de calificaciones de las reseñas del libro"""
-        reseñas = self.reseñas.all()
-        if reseñas.exists():
-            total = sum([r.calificacion for r in reseñas])
-            return round(total / reseñas.count(), 1)
-        return 0
-    
+        """Promedio de calificaciones de las reseñas del libro (columna desnormalizada)"""
+        return round(self.promedio, 1)
+
+    @classmethod
+    def aplicar_calificacion(cls, libro_id, delta_suma, delta_total):
+        """
+        Ajusta los agregados de un libro cuando se crea, edita o elimina una reseña.
+        Los contadores se actualizan con F() y el promedio se recalcula a partir de
+        ellos en la misma transacción, así que no hay carreras entre escritores.
+        """
+        with transaction.atomic():
+            cls.objects.filter(id=libro_id).update(
+                suma_calificaciones=F('suma_calificaciones') + delta_suma,
+                total_reseñas=F('total_reseñas') + delta_total,
+            )
+            cls.objects.filter(id=libro_id).update(promedio=cls.expresion_promedio())
+
+    @classmethod
+    def recalcular_calificaciones(cls, libro_id):
+        """Recalcula desde cero los agregados de un libro (reparación de desvíos)"""
+        with transaction.atomic():
+            datos = Reseña.objects.filter(libro_id=libro_id).aggregate(
+                suma=Coalesce(Sum('calificacion'), 0),
+                total=Count('id'),
+            )
+            cls.objects.filter(id=libro_id).update(
+                suma_calificaciones=datos['suma'],
+                total_reseñas=datos['total'],
+            )
+            cls.objects.filter(id=libro_id).update(promedio=cls.expresion_promedio())
+
+    @staticmethod
+    def expresion_promedio():
+        """promedio = suma / total (0 si no hay reseñas), evaluado en la base de datos"""
+        return Case(
+            When(total_reseñas=0, then=Value(0.0)),
+            default=Cast(F('suma_calificaciones'), FloatField()) / F('total_reseñas'),
+            output_field=FloatField(),
+        )
+
+
+class EstadisticasLibro(models.Model):
+    """
+    Proyección de las estadísticas de un libro para detalle_libro, buscar_libros
+    y recomendaciones: histograma de estrellas, favoritos, listas y visitas en
+    una sola fila. Los receivers de signals.py la mantienen con F(); total,
+    promedio y promedio bayesiano se derivan del histograma.
+    """
+    libro = models.OneToOneField(Libro, on_delete=models.CASCADE, primary_key=True, related_name='estadisticas')
+    estrellas_1 = models.PositiveIntegerField(default=0)
+    estrellas_2 = models.PositiveIntegerField(default=0)
+    estrellas_3 = models.PositiveIntegerField(default=0)
+    estrellas_4 = models.PositiveIntegerField(default=0)
+    estrellas_5 = models.PositiveIntegerField(default=0)
+    total_favoritos = models.PositiveIntegerField(default=0)
+    total_listas = models.PositiveIntegerField(default=0)
+    total_visitas = models.PositiveIntegerField(default=0)
+
+    # Promedio y peso (en reseñas) que se suponen antes de tener datos
+    PRIOR_MEDIA = 3.0
+    PRIOR_PESO = 10
+
+    def __str__(self):
+        return f"Estadísticas de {self.libro_id}"
+
+    @staticmethod
+    def campo_estrellas(calificacion):
+        return f'estrellas_{min(max(int(calificacion), 1), 5)}'
+
+    def conteos(self):
+        """Reseñas por estrella, de 1 a 5"""
+        return [getattr(self, f'estrellas_{estrellas}') for estrellas in range(1, 6)]
+
+    @property
     def total_reseñas(self):
-        """Retorna el total de reseñas del libro"""
-        return self.reseñas.count()
+        return sum(self.conteos())
+
+    @property
+    def promedio(self):
+        total = self.total_reseñas
+        if not total:
+            return 0
+        return round(sum(estrellas * cantidad for estrellas, cantidad in enumerate(self.conteos(), 1)) / total, 1)
+
+    @property
+    def promedio_bayesiano(self):
+        """Promedio que con pocas reseñas se acerca a PRIOR_MEDIA"""
+        conteos = self.conteos()
+        suma = sum(estrellas * cantidad for estrellas, cantidad in enumerate(conteos, 1))
+        return round((self.PRIOR_PESO * self.PRIOR_MEDIA + suma) / (self.PRIOR_PESO + sum(conteos)), 1)
+
+    def histograma(self):
+        """[{'estrellas', 'cantidad', 'porcentaje'}] de 5 a 1 estrellas, para la plantilla"""
+        conteos = self.conteos()
+        total = sum(conteos) or 1
+        return [
+            {'estrellas': estrellas, 'cantidad': conteos[estrellas - 1], 'porcentaje': round(100 * conteos[estrellas - 1] / total)}
+            for estrellas in range(5, 0, -1)
+        ]
+
+    @classmethod
+    def aplicar(cls, libro_id, **deltas):
+        """Suma `deltas` (campo=delta) a los contadores de un libro con F()"""
+        deltas = {campo: delta for campo, delta in deltas.items() if delta}
+        if deltas:
+            cls.objects.filter(libro_id=libro_id).update(
+                **{campo: F(campo) + delta for campo, delta in deltas.items()}
+            )
+
+    @classmethod
+    def aplicar_calificacion(cls, libro_id, calificacion, delta):
+        cls.aplicar(libro_id, **{cls.campo_estrellas(calificacion): delta})
+
+    @classmethod
+    def recalcular(cls, libro_id):
+        """Recalcula desde cero la fila de un libro (la crea si falta)"""
+        valores = {f'estrellas_{estrellas}': 0 for estrellas in range(1, 6)}
+        for calificacion, cantidad in (
+            Reseña.objects.filter(libro_id=libro_id).values('calificacion')
+            .annotate(cantidad=Count('id')).values_list('calificacion', 'cantidad')
+        ):
+            campo = cls.campo_estrellas(calificacion)
+            valores[campo] += cantidad
+        valores['total_favoritos'] = Favorito.objects.filter(libro_id=libro_id).count()
+        valores['total_listas'] = Lista.libros.through.objects.filter(libro_id=libro_id).count()
+        valores['total_visitas'] = Historial.objects.filter(libro_id=libro_id).count() + (
+            HistorialDiario.objects.filter(libro_id=libro_id).aggregate(v=Coalesce(Sum('visitas'), 0))['v']
+        )
+        cls.objects.update_or_create(libro_id=libro_id, defaults=valores)
+
+
+class ActividadLibro(models.Model):
+    """
+    Contadores de actividad de un libro por bloque de tiempo (una hora), para
+    tendencias.py: visitas, favoritos, reseñas y agregados a listas. Solo se
+    conservan los bloques de la ventana deslizante (tendencias.HORAS_VENTANA).
+    """
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='actividad')
+    bloque = models.DateTimeField()
+    visitas = models.PositiveIntegerField(default=0)
+    favoritos = models.PositiveIntegerField(default=0)
+    reseñas = models.PositiveIntegerField(default=0)
+    listas = models.PositiveIntegerField(default=0)
+
+    CAMPOS = ('visitas', 'favoritos', 'reseñas', 'listas')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'bloque'], name='actividad_libro_bloque_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['bloque'], name='actividad_bloque_idx'),
+        ]
+
+    def __str__(self):
+        return f"Actividad de {self.libro_id} en {self.bloque:%Y-%m-%d %H:00}"
+
+
+class RankingTendencias(models.Model):
+    """
+    Último ranking calculado por tendencias.calcular(), en una sola fila
+    (id=1): ids del top general en `general` y de cada género en `generos`.
+    Lo comparten el comando de cron y los procesos web, que lo copian un
+    rato en su caché local.
+    """
+    general = models.JSONField(default=list)
+    generos = models.JSONField(default=dict)
+    calculado = models.DateTimeField()
+
+    def __str__(self):
+        return f"Ranking de tendencias del {self.calculado:%Y-%m-%d %H:%M}"
 
 
 class Reseña(models.Model):
@@ -52,47 +253,206 @@ class Reseña(models.Model):
     calificacion = models.PositiveSmallIntegerField(default=1)
     fecha = models.DateTimeField(auto_now_add=True)
 
+    # Contadores desnormalizados; los mantienen los receivers de signals.py
+    total_valoraciones = models.PositiveIntegerField(default=0)
+    suma_puntuacion = models.PositiveIntegerField(default=0)
+    total_comentarios = models.PositiveIntegerField(default=0)
+    # Puntaje de "más útiles" (utilidad.py); se actualiza con cada valoración
+    utilidad = models.FloatField(default=0)
+
+    CAMPOS_CONTADORES = ('total_valoraciones', 'suma_puntuacion', 'total_comentarios', 'utilidad')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-fecha', '-id'], name='resena_fecha_idx'),
+            # Tramos de reseñas de un libro en detalle_libro
+            models.Index(fields=['libro', '-fecha', '-id'], name='resena_libro_fecha_idx'),
+            # Orden "más útiles" en detalle_libro y en el feed
+            models.Index(fields=['libro', '-utilidad', '-id'], name='resena_libro_utilidad_idx'),
+            models.Index(fields=['-utilidad', '-id'], name='resena_utilidad_idx'),
+        ]
+
     def __str__(self):
         return f"{self.usuario.username} - {self.libro.titulo}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guardar los valores leídos para calcular el delta en las ediciones (signals.py)
+        instancia = super().from_db(db, field_names, values)
+        instancia._calificacion_original = (instancia.__dict__.get('libro_id'), instancia.__dict__.get('calificacion'))
+        return instancia
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # auto_now_add pone la fecha en el INSERT; la diferencia es despreciable
+            self.utilidad = utilidad.puntaje(self.suma_puntuacion, self.total_valoraciones, self.fecha)
+        # Al editar una reseña no pisar los contadores con valores leídos antes
+        elif kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTADORES
+            ]
+        super().save(*args, **kwargs)
     
     def promedio_valoracion(self):
-        """Calcula el promedio de valoraciones de la reseña"""
-        valoraciones = self.valoraciones.all()
-        if valoraciones.exists():
-            total = sum([v.puntuacion for v in valoraciones])
-            return round(total / valoraciones.count(), 1)
-        return 0
-    
-    def total_valoraciones(self):
-        """Retorna el total de valoraciones recibidas"""
-        return self.valoraciones.count()
+        """Promedio de valoraciones de la reseña (contadores desnormalizados)"""
+        if not self.total_valoraciones:
+            return 0
+        return round(self.suma_puntuacion / self.total_valoraciones, 1)
+
+    @classmethod
+    def aplicar_valoracion(cls, reseña_id, delta_suma, delta_total):
+        """
+        Ajusta los contadores de valoración con F() cuando se crea, edita o
+        elimina una, y recalcula la utilidad con los valores ya actualizados
+        (la fila queda bloqueada por el UPDATE hasta el fin de la transacción).
+        """
+        with transaction.atomic():
+            cls.objects.filter(id=reseña_id).update(
+                suma_puntuacion=F('suma_puntuacion') + delta_suma,
+                total_valoraciones=F('total_valoraciones') + delta_total,
+            )
+            cls.actualizar_utilidad(reseña_id)
+
+    @classmethod
+    def actualizar_utilidad(cls, reseña_id):
+        fila = cls.objects.filter(id=reseña_id).values_list('suma_puntuacion', 'total_valoraciones', 'fecha').first()
+        if fila is not None:
+            cls.objects.filter(id=reseña_id).update(utilidad=utilidad.puntaje(*fila))
+
+    @classmethod
+    def recalcular_utilidad(cls, reseña_ids=None, lote=2000):
+        """Recalcula la utilidad de todas las reseñas (o de `reseña_ids`), p. ej. tras un bulk_create"""
+        reseñas = cls.objects.order_by('id').only('id', 'suma_puntuacion', 'total_valoraciones', 'fecha')
+        if reseña_ids is not None:
+            reseñas = reseñas.filter(id__in=reseña_ids)
+        pendientes = []
+        for reseña in reseñas.iterator(chunk_size=lote):
+            reseña.utilidad = utilidad.puntaje(reseña.suma_puntuacion, reseña.total_valoraciones, reseña.fecha)
+            pendientes.append(reseña)
+            if len(pendientes) >= lote:
+                cls.objects.bulk_update(pendientes, ['utilidad'])
+                pendientes = []
+        if pendientes:
+            cls.objects.bulk_update(pendientes, ['utilidad'])
+
+    @classmethod
+    def aplicar_comentario(cls, reseña_id, delta):
+        cls.objects.filter(id=reseña_id).update(total_comentarios=F('total_comentarios') + delta)
+
+    @classmethod
+    def recalcular_contadores(cls, reseña_id):
+        """Recalcula desde cero los contadores de una reseña (reparación de desvíos)"""
+        with transaction.atomic():
+            datos = ValoracionReseña.objects.filter(reseña_id=reseña_id).aggregate(
+                suma=Coalesce(Sum('puntuacion'), 0),
+                total=Count('id'),
+            )
+            cls.objects.filter(id=reseña_id).update(
+                suma_puntuacion=datos['suma'],
+                total_valoraciones=datos['total'],
+                total_comentarios=Comentario.objects.filter(reseña_id=reseña_id).count(),
+            )
+            cls.actualizar_utilidad(reseña_id)
 
 
 class Historial(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='historial_libros')
     libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Momento de la visita; el buffer de visitas.py la inserta más tarde con su hora real
+    fecha = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-fecha']
+        indexes = [
+            # Historial de un usuario (ver_historial, recorte por usuario en compactacion.py)
+            models.Index(fields=['usuario', '-fecha', '-id'], name='historial_usuario_fecha_idx'),
+            # Retención por antigüedad (compactacion.py)
+            models.Index(fields=['fecha', 'id'], name='historial_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usuario.username} consultó {self.libro.titulo}"
 
 
+class HistorialDiario(models.Model):
+    """
+    Visitas ya compactadas de Historial (compactacion.py): cuántas veces vio un
+    usuario un libro en un día. Historial + HistorialDiario suman todas las visitas.
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='historial_diario')
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
+    dia = models.DateField()
+    visitas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'libro', 'dia'], name='historial_diario_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', '-dia'], name='historial_diario_usuario_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario.username} consultó {self.libro.titulo} ({self.visitas}) el {self.dia}"
+
+
 class Lista(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='listas')
     nombre = models.CharField(max_length=100)
     descripcion = models.TextField(blank=True, null=True)
-    libros = models.ManyToManyField(Libro, related_name='listas')
+    # Ordenados por LibroEnLista.posicion; agregar con listas.agregar (ver listas.py)
+    libros = models.ManyToManyField(Libro, through='LibroEnLista', related_name='listas')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    # Libros en la lista; lo mantienen los receivers de signals.py
+    total_libros = models.PositiveIntegerField(default=0)
+
+    CAMPOS_CONTADORES = ('total_libros',)
+
     class Meta:
         ordering = ['-fecha_creacion']
 
     def __str__(self):
         return f"{self.nombre} ({self.usuario.username})"
 
+    def save(self, *args, **kwargs):
+        # Al editar nombre o descripción no pisar total_libros con un valor leído antes
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTADORES
+            ]
+        super().save(*args, **kwargs)
+
+
+class LibroEnLista(models.Model):
+    """
+    Tabla intermedia de Lista.libros (la misma tabla que usaba la relación
+    implícita) con la posición del libro y la fecha en que se agregó.
+
+    Las posiciones dejan huecos de HUECO entre sí: agregar al final o mover un
+    libro entre otros dos solo escribe su fila; si dos vecinos quedan pegados
+    se renumera la lista (listas.renumerar).
+    """
+    HUECO = 1 << 20
+
+    lista = models.ForeignKey(Lista, on_delete=models.CASCADE, related_name='entradas')
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='entradas_lista')
+    posicion = models.BigIntegerField()
+    fecha_agregado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'biblioteca_lista_libros'
+        unique_together = ('lista', 'libro')
+        indexes = [
+            # Páginas de detalle_lista y vecinos al mover un libro
+            models.Index(fields=['lista', 'posicion', 'id'], name='lista_libro_posicion_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.libro_id} en {self.lista_id} ({self.posicion})"
+
 
 class Comentario(models.Model):
     """
@@ -106,21 +466,84 @@ class Comentario(models.Model):
     # H16: Campo para respuestas anidadas
     padre = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='respuestas')
 
+    # Ruta materializada de ancestros (ver rutas.py); se asigna al crear
+    ruta = models.CharField(max_length=rutas.LARGO_RUTA, default='', editable=False)
+    profundidad = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    # Respuestas directas; lo mantienen los receivers de signals.py
+    total_respuestas = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['reseña', 'ruta'], name='comentario_ruta_idx'),
+        ]
 
     def __str__(self):
         if self.padre:
             return f"Respuesta de {self.usuario.username} a {self.padre.usuario.username}"
         return f"Comentario de {self.usuario.username} en {self.reseña.libro.titulo}"
+
+    def save(self, *args, **kwargs):
+        nuevo = self._state.adding
+        if nuevo and self.padre_id and self.padre.profundidad + 1 >= rutas.PROFUNDIDAD_MAXIMA:
+            # Al límite de profundidad la respuesta queda al mismo nivel que su padre
+            self.padre = self.padre.padre
+        if not nuevo and kwargs.get('update_fields') is None:
+            # Al editar no pisar total_respuestas con un valor leído antes
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'total_respuestas'
+            ]
+        super().save(*args, **kwargs)
+
+        if nuevo:
+            # La ruta incluye el id propio, que recién existe después del INSERT
+            ruta_padre = self.padre.ruta if self.padre_id else ''
+            self.ruta = rutas.ruta_hija(ruta_padre, self.pk)
+            self.profundidad = rutas.profundidad(self.ruta)
+            Comentario.objects.filter(pk=self.pk).update(ruta=self.ruta, profundidad=self.profundidad)
     
     def es_respuesta(self):
         """Retorna True si este comentario es una respuesta a otro"""
         return self.padre is not None
     
-    def total_respuestas(self):
-        """Cuenta las respuestas directas a este comentario"""
-        return self.respuestas.count()
+    @classmethod
+    def aplicar_respuesta(cls, comentario_id, delta):
+        cls.objects.filter(id=comentario_id).update(total_respuestas=F('total_respuestas') + delta)
+
+    @classmethod
+    def recalcular_respuestas(cls, comentario_id):
+        cls.objects.filter(id=comentario_id).update(
+            total_respuestas=cls.objects.filter(padre_id=comentario_id).count()
+        )
+
+    def subarbol(self, profundidad_maxima=None):
+        """
+        Este comentario y todas sus respuestas, en orden de hilo, con un solo
+        rango sobre comentario_ruta_idx. `profundidad_maxima` en niveles bajo este.
+        """
+        comentarios = Comentario.objects.filter(reseña_id=self.reseña_id, **rutas.rango(self.ruta))
+        if profundidad_maxima is not None:
+            comentarios = comentarios.filter(profundidad__lte=self.profundidad + profundidad_maxima)
+        return comentarios.order_by('ruta')
+
+    def total_subarbol(self):
+        """Respuestas a cualquier profundidad (sin contar este comentario)"""
+        return self.subarbol().count() - 1
+
+    @classmethod
+    def hilo(cls, reseña_id, profundidad_maxima=None):
+        """Toda la discusión de una reseña en orden de hilo"""
+        comentarios = cls.objects.filter(reseña_id=reseña_id)
+        if profundidad_maxima is not None:
+            comentarios = comentarios.filter(profundidad__lte=profundidad_maxima)
+        return comentarios.order_by('ruta')
+
+    @classmethod
+    def reconstruir_rutas(cls, reseña_ids=None):
+        """Recalcula rutas (p. ej. después de un bulk_create, que no pasa por save)"""
+        rutas.reconstruir(cls, reseña_ids)
 
 
 class Favorito(models.Model):
@@ -162,6 +585,13 @@ class ValoracionReseña(models.Model):
     def __str__(self):
         return f"{self.usuario.username} valoró con {self.puntuacion}★ la reseña de {self.reseña.usuario.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Valores leídos para calcular el delta de los contadores de Reseña (signals.py)
+        instancia = super().from_db(db, field_names, values)
+        instancia._puntuacion_original = (instancia.__dict__.get('reseña_id'), instancia.__dict__.get('puntuacion'))
+        return instancia
+
 
 class Notificacion(models.Model):
     """
@@ -190,6 +620,9 @@ class Notificacion(models.Model):
     
     class Meta:
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['usuario', '-fecha', '-id'], name='notif_usuario_fecha_idx'),
+        ]
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
     
@@ -197,9 +630,13 @@ class Notificacion(models.Model):
         return f"Notificación para {self.usuario.username}: {self.tipo}"
     
     def marcar_como_leida(self):
-        """Marca la notificación como leída"""
+        """
+        Marca la notificación como leída. Devuelve False si ya lo estaba (así
+        el contador de no leídas de notificaciones.py se descuenta una sola vez).
+        """
+        marcada = bool(Notificacion.objects.filter(pk=self.pk, leida=False).update(leida=True))
         self.leida = True
-        self.save()
+        return marcada
 
 
 class Seguimiento(models.Model):
@@ -0,0 +1,66 @@
+"""
+Contador de notificaciones no leídas por usuario, en la caché.
+
+El badge de base.html lo muestra en todas las páginas; en lugar de un COUNT
+por render se lee una clave por usuario:
+
+- crear una notificación no leída suma 1 (signals.py);
+- marcarla como leída o borrarla sin leer resta 1;
+- marcar_todas_leidas la pone en 0;
+- cualquier otro cambio (p. ej. desde el admin) borra la clave.
+
+Si la clave falta (expiró, se borró o se vació la caché) se recalcula con un
+COUNT y se guarda con cache.add, sin pisar un valor que otra petición haya
+escrito mientras tanto. Los cambios se aplican al confirmar la transacción;
+TIMEOUT_CONTADOR acota cuánto puede durar un desfase por una carrera entre
+un recálculo y una escritura.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import PREFIJO
+from .models import Notificacion
+
+
+TIMEOUT_CONTADOR = 15 * 60
+
+
+def _clave(usuario_id):
+    return f'{PREFIJO}:notificaciones:no_leidas:{usuario_id}'
+
+
+def no_leidas(usuario_id):
+    """Notificaciones no leídas de un usuario (COUNT solo si no está en la caché)"""
+    clave = _clave(usuario_id)
+    total = cache.get(clave)
+    if total is None:
+        total = Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+        cache.add(clave, total, TIMEOUT_CONTADOR)
+    return max(total, 0)
+
+
+def _sumar(clave, delta):
+    try:
+        cache.incr(clave, delta)
+    except ValueError:
+        # La clave no está: la próxima lectura la recalcula
+        pass
+
+
+def sumar(usuario_id, delta):
+    """Suma `delta` (positivo o negativo) al contador de `usuario_id` al confirmar la transacción"""
+    if delta:
+        clave = _clave(usuario_id)
+        transaction.on_commit(lambda: _sumar(clave, delta))
+
+
+def poner_en_cero(usuario_id):
+    """Tras marcar todas como leídas"""
+    clave = _clave(usuario_id)
+    transaction.on_commit(lambda: cache.set(clave, 0, TIMEOUT_CONTADOR))
+
+
+def invalidar(usuario_id):
+    """Cambio de delta desconocido: se recalcula en la próxima lectura"""
+    clave = _clave(usuario_id)
+    transaction.on_commit(lambda: cache.delete(clave))
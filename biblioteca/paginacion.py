@@ -0,0 +1,333 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En lugar de OFFSET + COUNT(*), cada página se pide "después de" (o "antes de")
+los valores de ordenamiento de la última (o primera) fila vista. El costo de
+una página no depende de su profundidad y las inserciones concurrentes no
+desplazan filas entre páginas.
+
+Los cursores son opacos: van firmados con django.core.signing, de modo que no
+se pueden fabricar a mano. La firma no lleva marca de tiempo, así que la misma
+posición produce siempre el mismo cursor (y la misma URL cacheable).
+"""
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Q
+
+from .cache import clave_versionada
+
+
+logger = logging.getLogger(__name__)
+
+SALT_CURSOR = 'biblioteca.paginacion.cursor'
+
+# Los totales exactos se guardan hasta que cambie la versión de sus dependencias
+TIMEOUT_TOTAL = 60 * 60
+
+# Hilo único para calcular totales exactos fuera de la petición
+_ejecutor_totales = ThreadPoolExecutor(max_workers=1, thread_name_prefix='biblioteca-totales')
+
+
+def _normalizar_orden(orden):
+    """Lista de (campo, descendente) con 'id' como desempate final"""
+    claves = [(campo.lstrip('-'), campo.startswith('-')) for campo in orden]
+    if not any(campo in ('id', 'pk') for campo, _ in claves):
+        descendente = claves[-1][1] if claves else False
+        claves.append(('id', descendente))
+    return claves
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    return valor
+
+
+# -------------------------------
+# Totales cacheados / estimados
+# -------------------------------
+class Total:
+    """Total de resultados; se muestra como "~N" cuando es una estimación"""
+
+    def __init__(self, valor, exacto):
+        self.valor = valor
+        self.exacto = exacto
+
+    def __str__(self):
+        return str(self.valor) if self.exacto else f'~{self.valor}'
+
+    def __int__(self):
+        return self.valor
+
+
+def estimar_total(queryset):
+    """
+    Estimación barata del total sin ejecutar COUNT(*).
+    Solo MySQL: estadísticas de la tabla si no hay filtros, o las filas que
+    EXPLAIN prevé para la tabla principal. None si no hay estimación.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'mysql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [queryset.model._meta.db_table],
+            )
+            fila = cursor.fetchone()
+            return int(fila[0]) if fila and fila[0] is not None else None
+
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN {sql}', params)
+        columnas = [col[0].lower() for col in cursor.description]
+        fila = cursor.fetchone()
+    if not fila or 'rows' not in columnas:
+        return None
+    filas = fila[columnas.index('rows')] or 0
+    filtrado = fila[columnas.index('filtered')] if 'filtered' in columnas else 100
+    return int(filas * (filtrado or 100) / 100)
+
+
+def _clave_total(queryset, dependencias):
+    sql, params = queryset.order_by().query.sql_with_params()
+    return clave_versionada('total', dependencias, queryset.db, sql, params)
+
+
+def _calcular_total(queryset, clave):
+    try:
+        cache.set(clave, queryset.order_by().count(), TIMEOUT_TOTAL)
+    except Exception:
+        logger.exception("No se pudo calcular el total de %s", queryset.model.__name__)
+    finally:
+        # El hilo abre su propia conexión; se cierra al terminar
+        connections.close_all()
+
+
+def total_cacheado(queryset, dependencias):
+    """
+    Total del queryset desde la caché versionada. Si no está, devuelve una
+    estimación y calcula el exacto en segundo plano; sin estimación posible
+    (p. ej. SQLite) se cuenta en el momento y se guarda.
+    """
+    if queryset.query.is_empty():
+        return Total(0, exacto=True)
+
+    clave = _clave_total(queryset, dependencias)
+    valor = cache.get(clave)
+    if valor is not None:
+        return Total(valor, exacto=True)
+
+    estimado = estimar_total(queryset)
+    if estimado is None:
+        valor = queryset.order_by().count()
+        cache.set(clave, valor, TIMEOUT_TOTAL)
+        return Total(valor, exacto=True)
+
+    # Evita encolar el mismo conteo varias veces mientras se calcula
+    if cache.add(f'{clave}:calculando', True, 60):
+        _ejecutor_totales.submit(_calcular_total, queryset.all(), clave)
+    return Total(estimado, exacto=False)
+
+
+# -------------------------------
+# Paginación por cursor
+# -------------------------------
+_firmador = signing.Signer(salt=SALT_CURSOR)
+
+
+def leer_cursor(cursor):
+    """Contenido de un cursor ({'v', 'd', 'n'}) o None si falta o no es válido"""
+    if not cursor:
+        return None
+    try:
+        datos = _firmador.unsign_object(cursor)
+    except signing.BadSignature:
+        return None
+    if not isinstance(datos, dict) or not {'v', 'd', 'n'} <= datos.keys():
+        return None
+    return datos
+
+
+class PaginaCursor:
+    """Página de resultados; se itera igual que django.core.paginator.Page"""
+
+    def __init__(self, object_list, numero, has_next, has_previous,
+                 cursor_siguiente, cursor_anterior, request, parametro):
+        self.object_list = object_list
+        self.number = numero
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self._request = request
+        self._parametro = parametro
+        # Total de resultados (Total) si la vista lo pidió; ver total_cacheado
+        self.total = None
+
+    def estado(self):
+        """Todo lo necesario para reconstruir la página salvo las filas (ver resultados.py)"""
+        return {
+            'numero': self.number,
+            'has_next': self._has_next,
+            'has_previous': self._has_previous,
+            'cursor_siguiente': self.cursor_siguiente,
+            'cursor_anterior': self.cursor_anterior,
+            'parametro': self._parametro,
+            'total': (self.total.valor, self.total.exacto) if self.total is not None else None,
+        }
+
+    @classmethod
+    def desde_estado(cls, estado, object_list, request):
+        pagina = cls(
+            object_list, estado['numero'], estado['has_next'], estado['has_previous'],
+            estado['cursor_siguiente'], estado['cursor_anterior'], request, estado['parametro'],
+        )
+        if estado['total'] is not None:
+            pagina.total = Total(*estado['total'])
+        return pagina
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _url(self, cursor):
+        parametros = self._request.GET.copy()
+        parametros.pop(self._parametro, None)
+        parametros.pop('page', None)
+        if cursor:
+            parametros[self._parametro] = cursor
+        return '?' + parametros.urlencode()
+
+    @property
+    def url_primera(self):
+        return self._url(None)
+
+    @property
+    def url_siguiente(self):
+        return self._url(self.cursor_siguiente) if self._has_next else None
+
+    @property
+    def url_anterior(self):
+        if not self._has_previous:
+            return None
+        # Volver a la primera página sin cursor mantiene la URL canónica
+        return self._url(None if self.number <= 2 else self.cursor_anterior)
+
+
+class PaginadorCursor:
+    """
+    Paginador keyset sobre un queryset y una lista de campos de orden
+    (mismo formato que order_by). Los campos de orden no deben ser nulos.
+    """
+
+    def __init__(self, queryset, orden, por_pagina=20, parametro='cursor'):
+        self.claves = _normalizar_orden(orden)
+        self.queryset = queryset.order_by(*self._orden(invertido=False))
+        self.por_pagina = por_pagina
+        self.parametro = parametro
+
+    def _orden(self, invertido):
+        return [
+            ('-' if descendente != invertido else '') + campo
+            for campo, descendente in self.claves
+        ]
+
+    def _valores(self, objeto):
+        return [_serializar(getattr(objeto, campo)) for campo, _ in self.claves]
+
+    def _a_python(self, campo, valor):
+        try:
+            return self.queryset.model._meta.get_field(campo).to_python(valor)
+        except FieldDoesNotExist:
+            # Anotaciones (p. ej. relevancia): el valor JSON ya es utilizable
+            return valor
+
+    def _condicion(self, valores, retroceder):
+        """(k1, k2, ...) > (v1, v2, ...) respetando la dirección de cada clave"""
+        valores = [self._a_python(campo, valor) for (campo, _), valor in zip(self.claves, valores)]
+        condicion = Q()
+        for i, (campo, descendente) in enumerate(self.claves):
+            operador = 'lt' if descendente != retroceder else 'gt'
+            iguales = {c: v for (c, _), v in zip(self.claves[:i], valores[:i])}
+            condicion |= Q(**iguales, **{f'{campo}__{operador}': valores[i]})
+        return condicion
+
+    def _codificar(self, valores, direccion, numero):
+        return _firmador.sign_object({'v': valores, 'd': direccion, 'n': numero}, compress=True)
+
+    def _decodificar(self, cursor):
+        datos = leer_cursor(cursor)
+        if datos is None or len(datos.get('v', [])) != len(self.claves):
+            return None
+        return datos
+
+    def get_page(self, cursor=None, request=None):
+        datos = self._decodificar(cursor)
+
+        if datos is None:
+            filas = list(self.queryset[:self.por_pagina + 1])
+            numero = 1
+            has_previous = False
+            has_next = len(filas) > self.por_pagina
+            filas = filas[:self.por_pagina]
+        elif datos['d'] == 'p':
+            filas = list(
+                self.queryset.filter(self._condicion(datos['v'], retroceder=True))
+                .order_by(*self._orden(invertido=True))[:self.por_pagina + 1]
+            )
+            has_previous = len(filas) > self.por_pagina
+            numero = max(datos['n'], 2) if has_previous else 1
+            has_next = True
+            filas = list(reversed(filas[:self.por_pagina]))
+        else:
+            filas = list(
+                self.queryset.filter(self._condicion(datos['v'], retroceder=False))[:self.por_pagina + 1]
+            )
+            numero = datos['n']
+            has_previous = True
+            has_next = len(filas) > self.por_pagina
+            filas = filas[:self.por_pagina]
+
+        cursor_siguiente = self._codificar(self._valores(filas[-1]), 'n', numero + 1) if filas else None
+        cursor_anterior = self._codificar(self._valores(filas[0]), 'p', numero - 1) if filas else None
+
+        return PaginaCursor(
+            filas, numero, has_next, has_previous,
+            cursor_siguiente, cursor_anterior, request, self.parametro,
+        )
+
+
+def paginar_por_cursor(request, queryset, orden, por_pagina=20, parametro='cursor', dependencias=None):
+    """
+    Atajo para las vistas: lee el cursor de request.GET y devuelve la página.
+    Con `dependencias` (espacios de biblioteca.cache) la página trae además el
+    total de resultados cacheado o estimado en `pagina.total`.
+    """
+    paginador = PaginadorCursor(queryset, orden, por_pagina, parametro)
+    pagina = paginador.get_page(request.GET.get(parametro), request)
+    if dependencias:
+        pagina.total = total_cacheado(queryset, dependencias)
+    return pagina
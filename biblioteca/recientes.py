@@ -0,0 +1,79 @@
+"""
+Libros vistos recientemente por cada usuario, en la caché.
+
+Una lista de tamaño fijo con los TAMAÑO últimos libros distintos que vio el
+usuario ([(libro_id, instante)], el más reciente primero). visitas.registrar
+la actualiza en cada visita, así que no depende de que el buffer de Historial
+se haya vaciado. Si la caché la perdió se reconstruye una vez desde Historial.
+
+La usan el bloque "Continúa leyendo" de home, la primera página de
+ver_historial y recomendaciones; los libros se hidratan con una sola consulta.
+"""
+import datetime
+import time
+
+from django.core.cache import cache
+
+from .cache import PREFIJO
+from .models import Historial, Libro
+
+
+# Libros distintos que se recuerdan por usuario
+TAMAÑO = 20
+
+TIMEOUT_RECIENTES = 30 * 24 * 60 * 60
+
+
+def _clave(usuario_id):
+    return f'{PREFIJO}:recientes:{usuario_id}'
+
+
+def _reconstruir(usuario_id):
+    entradas = []
+    vistos = set()
+    # Alcanza con unas pocas filas por libro (historial_usuario_fecha_idx)
+    filas = (
+        Historial.objects.filter(usuario_id=usuario_id).order_by('-fecha', '-id')
+        .values_list('libro_id', 'fecha')[:TAMAÑO * 10]
+    )
+    for libro_id, fecha in filas:
+        if libro_id not in vistos:
+            vistos.add(libro_id)
+            entradas.append((libro_id, fecha.timestamp()))
+            if len(entradas) == TAMAÑO:
+                break
+    return entradas
+
+
+def obtener(usuario_id):
+    """[(libro_id, instante)] del más reciente al más antiguo"""
+    entradas = cache.get(_clave(usuario_id))
+    if entradas is None:
+        entradas = _reconstruir(usuario_id)
+        cache.set(_clave(usuario_id), entradas, TIMEOUT_RECIENTES)
+    return entradas
+
+
+def agregar(usuario_id, libro_id, instante=None):
+    """Pone `libro_id` al principio (sin repetirlo) y descarta lo que exceda TAMAÑO"""
+    instante = time.time() if instante is None else instante
+    entradas = [entrada for entrada in obtener(usuario_id) if entrada[0] != libro_id]
+    entradas.insert(0, (libro_id, instante))
+    cache.set(_clave(usuario_id), entradas[:TAMAÑO], TIMEOUT_RECIENTES)
+
+
+def libro_ids(usuario_id):
+    return [libro_id for libro_id, _ in obtener(usuario_id)]
+
+
+def hidratar(usuario_id, limite=TAMAÑO):
+    """[{'libro', 'fecha'}] con los libros cargados en una sola consulta (se omiten los borrados)"""
+    entradas = obtener(usuario_id)[:limite]
+    if not entradas:
+        return []
+    libros = Libro.objects.in_bulk([libro_id for libro_id, _ in entradas])
+    return [
+        {'libro': libros[libro_id], 'fecha': datetime.datetime.fromtimestamp(instante, tz=datetime.timezone.utc)}
+        for libro_id, instante in entradas
+        if libro_id in libros
+    ]
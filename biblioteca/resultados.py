@@ -0,0 +1,91 @@
+"""
+Caché de resultados para buscar_libros y lista_libros.
+
+La clave son los parámetros normalizados (q, orden, valoracion, genero y la
+posición del cursor). Se guarda solo la lista ordenada de ids, el estado de
+la página y los agregados (facetas, total). Las filas se hidratan con una
+sola consulta id__in. Toda escritura de Libro o Reseña sube la versión
+'libros' (signals.py), lo que invalida todas las entradas a la vez.
+
+Los contadores de aciertos/fallos quedan en la caché compartida; ver el
+comando estadisticas_cache.
+"""
+import json
+
+from django.core.cache import cache
+
+from .cache import PREFIJO, clave_versionada
+from .models import Libro
+from .paginacion import leer_cursor
+
+
+TIMEOUT_RESULTADOS = 10 * 60
+
+# Resultados cuyo total todavía es una estimación ("~N") se guardan poco tiempo
+TIMEOUT_PROVISIONAL = 60
+
+CONTADORES = ('aciertos', 'fallos')
+
+
+def _clave_contador(nombre):
+    return f'{PREFIJO}:resultados:{nombre}'
+
+
+def _contar(nombre):
+    clave = _clave_contador(nombre)
+    if cache.add(clave, 1, timeout=None):
+        return
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, timeout=None)
+
+
+def estadisticas():
+    """{'aciertos', 'fallos', 'ratio'} acumulados desde el último reinicio"""
+    valores = cache.get_many([_clave_contador(nombre) for nombre in CONTADORES])
+    aciertos = valores.get(_clave_contador('aciertos'), 0)
+    fallos = valores.get(_clave_contador('fallos'), 0)
+    total = aciertos + fallos
+    return {'aciertos': aciertos, 'fallos': fallos, 'ratio': aciertos / total if total else 0.0}
+
+
+def reiniciar_estadisticas():
+    cache.delete_many([_clave_contador(nombre) for nombre in CONTADORES])
+
+
+def parametros(request, **valores):
+    """Parámetros de la clave: texto sin mayúsculas ni espacios repetidos y el cursor decodificado"""
+    normalizados = {
+        nombre: ' '.join(str(valor).lower().split())
+        for nombre, valor in valores.items()
+    }
+    normalizados['cursor'] = leer_cursor(request.GET.get('cursor'))
+    return normalizados
+
+
+def obtener(prefijo, parametros, calcular):
+    """
+    Devuelve el resultado cacheado para `parametros` o lo calcula con `calcular()`.
+    `calcular` devuelve un dict serializable con al menos 'ids'; si incluye
+    'provisional': True se guarda con TIMEOUT_PROVISIONAL.
+    """
+    clave = clave_versionada(f'resultados:{prefijo}', ['libros'], json.dumps(parametros, sort_keys=True))
+    datos = cache.get(clave)
+    if datos is not None:
+        _contar('aciertos')
+        return datos
+
+    _contar('fallos')
+    datos = calcular()
+    cache.set(clave, datos, TIMEOUT_PROVISIONAL if datos.get('provisional') else TIMEOUT_RESULTADOS)
+    return datos
+
+
+def hidratar(ids, queryset=None):
+    """Libros en el orden de `ids` (con sus estadísticas), con una sola consulta"""
+    if not ids:
+        return []
+    queryset = Libro.objects.select_related('estadisticas') if queryset is None else queryset
+    por_id = queryset.in_bulk(ids)
+    return [por_id[libro_id] for libro_id in ids if libro_id in por_id]
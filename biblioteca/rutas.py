@@ -0,0 +1,65 @@
+"""
+Rutas materializadas para los hilos de comentarios.
+
+Cada comentario guarda en `ruta` los ids de sus ancestros y el suyo, con
+ancho fijo: '0000000012/0000000031/'. Ordenar por (reseña, ruta) recorre el
+hilo en profundidad, y un subárbol es el rango [ruta, ruta + '~'), que el
+índice comentario_ruta_idx resuelve con un solo recorrido.
+
+Funciones puras (sin importar modelos) para poder usarlas desde migraciones.
+"""
+ANCHO_SEGMENTO = 10
+
+# Los segmentos solo usan dígitos y '/', todos menores que '~'
+FIN_RANGO = '~'
+
+# 40 niveles * 11 caracteres; las respuestas más profundas cuelgan del nivel 40
+PROFUNDIDAD_MAXIMA = 40
+LARGO_RUTA = PROFUNDIDAD_MAXIMA * (ANCHO_SEGMENTO + 1)
+
+
+def ruta_hija(ruta_padre, comentario_id):
+    return f'{ruta_padre}{comentario_id:0{ANCHO_SEGMENTO}d}/'
+
+
+def profundidad(ruta):
+    """0 para un comentario raíz, 1 para una respuesta directa, ..."""
+    return ruta.count('/') - 1
+
+
+def rango(ruta):
+    """Filtros de un subárbol (incluye el propio comentario)"""
+    return {'ruta__gte': ruta, 'ruta__lt': ruta + FIN_RANGO}
+
+
+def reconstruir(modelo, reseña_ids=None, lote=2000):
+    """
+    Recalcula ruta y profundidad de `modelo` (Comentario, real o histórico).
+    Recorre por (reseña, id): los padres siempre tienen id menor que sus
+    respuestas, así que basta recordar las rutas de la reseña en curso.
+    """
+    filas = modelo.objects.order_by('reseña_id', 'id').only('id', 'reseña_id', 'padre_id', 'ruta', 'profundidad')
+    if reseña_ids is not None:
+        filas = filas.filter(reseña_id__in=reseña_ids)
+
+    pendientes = []
+    reseña_actual = None
+    rutas = {}
+    for comentario in filas.iterator(chunk_size=lote):
+        if comentario.reseña_id != reseña_actual:
+            reseña_actual = comentario.reseña_id
+            rutas = {}
+        ruta_padre = rutas.get(comentario.padre_id, '')
+        if profundidad(ruta_padre) + 1 >= PROFUNDIDAD_MAXIMA:
+            ruta_padre = ruta_padre[:-(ANCHO_SEGMENTO + 1)]
+        ruta = ruta_hija(ruta_padre, comentario.id)
+        rutas[comentario.id] = ruta
+        if (comentario.ruta, comentario.profundidad) != (ruta, profundidad(ruta)):
+            comentario.ruta = ruta
+            comentario.profundidad = profundidad(ruta)
+            pendientes.append(comentario)
+        if len(pendientes) >= lote:
+            modelo.objects.bulk_update(pendientes, ['ruta', 'profundidad'])
+            pendientes = []
+    if pendientes:
+        modelo.objects.bulk_update(pendientes, ['ruta', 'profundidad'])
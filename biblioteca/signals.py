@@ -0,0 +1,294 @@
+"""
+Receivers que mantienen los agregados desnormalizados al día.
+
+Se usan signals (y no los métodos de las vistas) porque las reseñas también se
+borran en cascada (usuario, libro) y desde moderacion.resolver_reporte.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cache, membresias, notificaciones, tendencias
+from .autocompletar import indice as indice_autocompletar
+from .models import (
+    Comentario, EstadisticasLibro, Favorito, Historial, Libro, Lista, Notificacion, Reseña, Seguimiento,
+    ValoracionReseña,
+)
+from .trigramas import indice as indice_trigramas
+
+
+# -------------------------------
+# Agregados de calificación en Libro
+# -------------------------------
+@receiver(post_save, sender=Reseña)
+def reseña_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    calificacion = int(instance.calificacion)
+    if created:
+        Libro.aplicar_calificacion(instance.libro_id, calificacion, 1)
+        EstadisticasLibro.aplicar_calificacion(instance.libro_id, calificacion, 1)
+    else:
+        libro_original, calificacion_original = getattr(instance, '_calificacion_original', (None, None))
+        if libro_original is None or calificacion_original is None:
+            # No sabemos el valor anterior (instancia construida a mano o campo diferido)
+            Libro.recalcular_calificaciones(instance.libro_id)
+            EstadisticasLibro.recalcular(instance.libro_id)
+        elif libro_original != instance.libro_id:
+            Libro.aplicar_calificacion(libro_original, -calificacion_original, -1)
+            Libro.aplicar_calificacion(instance.libro_id, calificacion, 1)
+            EstadisticasLibro.aplicar_calificacion(libro_original, calificacion_original, -1)
+            EstadisticasLibro.aplicar_calificacion(instance.libro_id, calificacion, 1)
+        elif calificacion_original != calificacion:
+            Libro.aplicar_calificacion(instance.libro_id, calificacion - calificacion_original, 0)
+            EstadisticasLibro.aplicar(instance.libro_id, **{
+                EstadisticasLibro.campo_estrellas(calificacion_original): -1,
+                EstadisticasLibro.campo_estrellas(calificacion): 1,
+            })
+
+    instance._calificacion_original = (instance.libro_id, calificacion)
+
+    if created:
+        indice_autocompletar.ajustar_reseñas(instance.libro_id, 1)
+        tendencias.registrar(instance.libro_id, reseñas=1)
+
+
+@receiver(post_delete, sender=Reseña)
+def reseña_eliminada(sender, instance, **kwargs):
+    Libro.aplicar_calificacion(instance.libro_id, -int(instance.calificacion), -1)
+    EstadisticasLibro.aplicar_calificacion(instance.libro_id, instance.calificacion, -1)
+    indice_autocompletar.ajustar_reseñas(instance.libro_id, -1)
+
+
+# -------------------------------
+# Estadísticas de libro (favoritos, listas y visitas) y total_libros de Lista
+# -------------------------------
+@receiver(post_save, sender=Libro)
+def libro_creado_estadisticas(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EstadisticasLibro.objects.get_or_create(libro=instance)
+
+
+@receiver(post_save, sender=Favorito)
+def favorito_guardado(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EstadisticasLibro.aplicar(instance.libro_id, total_favoritos=1)
+        tendencias.registrar(instance.libro_id, favoritos=1)
+
+
+@receiver(post_delete, sender=Favorito)
+def favorito_eliminado(sender, instance, **kwargs):
+    EstadisticasLibro.aplicar(instance.libro_id, total_favoritos=-1)
+
+
+@receiver(post_save, sender=Historial)
+def visita_registrada(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EstadisticasLibro.aplicar(instance.libro_id, total_visitas=1)
+
+
+def _quitar_de_listas(filas, contar_listas=True):
+    """Descuenta total_listas (libro) y total_libros (lista) por cada fila que se va a borrar"""
+    pares = list(filas.values_list('lista_id', 'libro_id'))
+    for libro_id, cantidad in Counter(libro_id for _, libro_id in pares).items():
+        EstadisticasLibro.aplicar(libro_id, total_listas=-cantidad)
+    if contar_listas:
+        for lista_id, cantidad in Counter(lista_id for lista_id, _ in pares).items():
+            Lista.objects.filter(pk=lista_id).update(total_libros=F('total_libros') - cantidad)
+
+
+@receiver(m2m_changed, sender=Lista.libros.through)
+def libros_de_lista_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    # Las filas de la tabla intermedia se borran sin post_delete (modelo auto_created),
+    # así que las bajas se descuentan en pre_remove / pre_clear, dentro de la misma transacción
+    campo_instancia, campo_otro = ('libro_id', 'lista_id') if reverse else ('lista_id', 'libro_id')
+    filas = sender.objects.filter(**{campo_instancia: instance.pk})
+
+    if action == 'post_add' and pk_set:
+        # add() solo inserta (y reporta en pk_set) las filas que no existían
+        if reverse:
+            EstadisticasLibro.aplicar(instance.pk, total_listas=len(pk_set))
+            tendencias.registrar(instance.pk, listas=len(pk_set))
+            Lista.objects.filter(pk__in=pk_set).update(total_libros=F('total_libros') + 1)
+        else:
+            EstadisticasLibro.objects.filter(libro_id__in=pk_set).update(total_listas=F('total_listas') + 1)
+            tendencias.registrar_varios(pk_set, listas=1)
+            Lista.objects.filter(pk=instance.pk).update(total_libros=F('total_libros') + len(pk_set))
+    elif action == 'pre_remove' and pk_set:
+        _quitar_de_listas(filas.filter(**{f'{campo_otro}__in': pk_set}))
+    elif action == 'pre_clear':
+        _quitar_de_listas(filas)
+
+
+@receiver(pre_delete, sender=Libro)
+def libro_eliminado_listas(sender, instance, **kwargs):
+    # Sus filas de LibroEnLista se borran en cascada, sin m2m_changed
+    Lista.objects.filter(entradas__libro_id=instance.pk).update(total_libros=F('total_libros') - 1)
+
+
+@receiver(pre_delete, sender=Lista)
+def lista_eliminada_estadisticas(sender, instance, **kwargs):
+    _quitar_de_listas(Lista.libros.through.objects.filter(lista_id=instance.pk), contar_listas=False)
+
+
+# -------------------------------
+# Contadores de valoraciones, comentarios y respuestas
+# -------------------------------
+@receiver(post_save, sender=ValoracionReseña)
+def valoracion_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    puntuacion = int(instance.puntuacion)
+    if created:
+        Reseña.aplicar_valoracion(instance.reseña_id, puntuacion, 1)
+    else:
+        reseña_original, puntuacion_original = getattr(instance, '_puntuacion_original', (None, None))
+        if reseña_original is None or puntuacion_original is None:
+            Reseña.recalcular_contadores(instance.reseña_id)
+        elif reseña_original != instance.reseña_id:
+            Reseña.aplicar_valoracion(reseña_original, -puntuacion_original, -1)
+            Reseña.aplicar_valoracion(instance.reseña_id, puntuacion, 1)
+        elif puntuacion_original != puntuacion:
+            Reseña.aplicar_valoracion(instance.reseña_id, puntuacion - puntuacion_original, 0)
+
+    instance._puntuacion_original = (instance.reseña_id, puntuacion)
+
+
+@receiver(post_delete, sender=ValoracionReseña)
+def valoracion_eliminada(sender, instance, **kwargs):
+    Reseña.aplicar_valoracion(instance.reseña_id, -int(instance.puntuacion), -1)
+
+
+@receiver(post_save, sender=Comentario)
+def comentario_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    Reseña.aplicar_comentario(instance.reseña_id, 1)
+    if instance.padre_id:
+        Comentario.aplicar_respuesta(instance.padre_id, 1)
+
+
+@receiver(post_delete, sender=Comentario)
+def comentario_eliminado(sender, instance, **kwargs):
+    # En un borrado en cascada las filas padre pueden no existir ya: el UPDATE no hace nada
+    Reseña.aplicar_comentario(instance.reseña_id, -1)
+    if instance.padre_id:
+        Comentario.aplicar_respuesta(instance.padre_id, -1)
+
+
+# -------------------------------
+# Invalidación de cachés versionadas (biblioteca.cache)
+# -------------------------------
+# cache.invalidar espera al COMMIT de la escritura; si se deshace, no invalida
+@receiver([post_save, post_delete], sender=Libro)
+def invalidar_libros(sender, **kwargs):
+    cache.invalidar('libros')
+
+
+@receiver([post_save, post_delete], sender=Reseña)
+def invalidar_reseñas(sender, **kwargs):
+    # Las reseñas cambian promedio/total_reseñas de Libro
+    cache.invalidar('resenas', 'libros')
+
+
+@receiver([post_save, post_delete], sender=Comentario)
+@receiver([post_save, post_delete], sender=ValoracionReseña)
+def invalidar_comentarios(sender, **kwargs):
+    # Comentarios y valoraciones se muestran en el detalle del libro
+    cache.invalidar('comentarios')
+
+
+@receiver([post_save, post_delete], sender=Seguimiento)
+def invalidar_seguimientos(sender, **kwargs):
+    cache.invalidar('seguimientos')
+
+
+@receiver([post_save, post_delete], sender=Lista)
+@receiver(m2m_changed, sender=Lista.libros.through)
+def invalidar_listas(sender, **kwargs):
+    cache.invalidar('listas')
+
+
+# -------------------------------
+# Pertenencias por usuario (membresias.py)
+# -------------------------------
+@receiver([post_save, post_delete], sender=Favorito)
+def membresias_favoritos(sender, instance, raw=False, **kwargs):
+    if not raw:
+        membresias.invalidar('favoritos', instance.usuario_id)
+
+
+@receiver([post_save, post_delete], sender=Seguimiento)
+def membresias_seguimientos(sender, instance, raw=False, **kwargs):
+    if not raw:
+        membresias.invalidar('siguiendo', instance.seguidor_id)
+
+
+@receiver(m2m_changed, sender=Lista.libros.through)
+def membresias_listas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    if not reverse:
+        usuario_ids = [instance.usuario_id]
+    else:
+        # Desde el libro (libro.listas.add/remove/clear): los dueños de esas listas
+        listas = Lista.objects.filter(libros=instance) if action == 'pre_clear' else Lista.objects.filter(id__in=pk_set or ())
+        usuario_ids = set(listas.values_list('usuario_id', flat=True))
+    membresias.invalidar('en_listas', *usuario_ids)
+
+
+@receiver(post_delete, sender=Lista)
+def membresias_lista_eliminada(sender, instance, **kwargs):
+    membresias.invalidar('en_listas', instance.usuario_id)
+
+
+# -------------------------------
+# Contador de notificaciones no leídas (notificaciones.py)
+# -------------------------------
+@receiver(post_save, sender=Notificacion)
+def notificacion_guardada(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        notificaciones.sumar(instance.usuario_id, 0 if instance.leida else 1)
+    else:
+        # Edición (admin, fixtures): no se sabe si cambió `leida`
+        notificaciones.invalidar(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Notificacion)
+def notificacion_eliminada(sender, instance, **kwargs):
+    if not instance.leida:
+        notificaciones.sumar(instance.usuario_id, -1)
+
+
+# -------------------------------
+# Índices en memoria: autocompletado y trigramas
+# -------------------------------
+@receiver(post_save, sender=Libro)
+def libro_guardado_indices(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cache.invalidar('autocompletar', 'trigramas')
+
+    def actualizar_indices():
+        indice_autocompletar.actualizar(instance)
+        indice_trigramas.actualizar(instance)
+
+    # Después del incremento de versión de arriba, que también espera al COMMIT
+    transaction.on_commit(actualizar_indices)
+
+
+@receiver(post_delete, sender=Libro)
+def libro_eliminado_indices(sender, instance, **kwargs):
+    cache.invalidar('autocompletar', 'trigramas')
+    libro_id = instance.id
+
+    def eliminar_de_indices():
+        indice_autocompletar.eliminar(libro_id)
+        indice_trigramas.eliminar(libro_id)
+
+    transaction.on_commit(eliminar_de_indices)
@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from biblioteca import fragmentos
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hueco(context, nombre, *args):
+    """Fragmento por usuario; dentro de cache_personalizado deja un marcador (ver fragmentos.py)"""
+    request = context.get('request')
+    if getattr(request, 'huecos_diferidos', False):
+        return mark_safe(fragmentos.marcador(nombre, args))
+    return fragmentos.renderizar(request, nombre, args)
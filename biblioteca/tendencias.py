@@ -0,0 +1,197 @@
+"""
+Libros en tendencia.
+
+Cada evento (visita, favorito, reseña, agregado a lista) suma en la fila de
+ActividadLibro de su libro y su hora, con F(). Solo se conservan las horas de
+la ventana deslizante HORAS_VENTANA.
+
+calcular() (comando calcular_tendencias, pensado para cron) pondera cada hora
+con decaimiento exponencial de vida media VIDA_MEDIA_HORAS, arma el top
+TOP_K general y por género, y lo guarda en la fila de RankingTendencias: la
+caché por defecto es local a cada proceso, así que lo que calcula el comando
+no llegaría a los procesos web si solo quedara ahí. home, buscar_libros por
+género y recomendaciones sin historial leen una copia en la caché local de a
+lo sumo TIMEOUT_COPIA segundos, y la fila cuando la copia falta. Si no hay
+ranking o tiene más de INTERVALO_CALCULO, lo recalcula un hilo en segundo
+plano y mientras tanto la vista usa lo que haya (o su orden de respaldo).
+"""
+import datetime
+import heapq
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import PREFIJO
+from .models import ActividadLibro, Libro, RankingTendencias
+
+
+logger = logging.getLogger(__name__)
+
+HORAS_VENTANA = 7 * 24
+VIDA_MEDIA_HORAS = 24
+
+# Peso de cada tipo de evento en el puntaje
+PESOS = {'visitas': 1, 'favoritos': 5, 'reseñas': 8, 'listas': 3}
+
+# Libros del ranking general y de cada género
+TOP_K = 50
+
+# Un ranking más viejo que esto se recalcula en segundo plano al leerlo
+INTERVALO_CALCULO = 15 * 60
+
+# Cuánto vale la copia del ranking en la caché de cada proceso
+TIMEOUT_COPIA = 60
+
+# Filas por lote al borrar horas fuera de la ventana
+LOTE_BORRADO = 2000
+
+CLAVE_RANKING = f'{PREFIJO}:tendencias:ranking'
+
+_ejecutor_tendencias = ThreadPoolExecutor(max_workers=1, thread_name_prefix='biblioteca-tendencias')
+
+
+def bloque_de(instante=None):
+    """Hora (UTC) a la que pertenece `instante`"""
+    instante = instante or timezone.now()
+    return instante.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def registrar(libro_id, instante=None, **deltas):
+    """Suma `deltas` (visitas=, favoritos=, reseñas=, listas=) a la hora de `instante`"""
+    deltas = {campo: delta for campo, delta in deltas.items() if delta > 0}
+    if not deltas:
+        return
+    bloque = bloque_de(instante)
+    filas = ActividadLibro.objects.filter(libro_id=libro_id, bloque=bloque)
+    if filas.update(**{campo: F(campo) + delta for campo, delta in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            ActividadLibro.objects.create(libro_id=libro_id, bloque=bloque, **deltas)
+    except IntegrityError:
+        # Otra petición creó la fila entre el UPDATE y el INSERT
+        filas.update(**{campo: F(campo) + delta for campo, delta in deltas.items()})
+
+
+def registrar_varios(libro_ids, instante=None, **deltas):
+    """registrar() con los mismos `deltas` para varios libros: un UPDATE y un INSERT en bloque"""
+    deltas = {campo: delta for campo, delta in deltas.items() if delta > 0}
+    libro_ids = set(libro_ids)
+    if not deltas or not libro_ids:
+        return
+    bloque = bloque_de(instante)
+    filas = ActividadLibro.objects.filter(bloque=bloque, libro_id__in=libro_ids)
+    existentes = set(filas.values_list('libro_id', flat=True))
+    if existentes:
+        filas.filter(libro_id__in=existentes).update(**{campo: F(campo) + delta for campo, delta in deltas.items()})
+    faltantes = libro_ids - existentes
+    try:
+        with transaction.atomic():
+            ActividadLibro.objects.bulk_create([
+                ActividadLibro(libro_id=libro_id, bloque=bloque, **deltas) for libro_id in faltantes
+            ])
+    except IntegrityError:
+        # Otra petición creó alguna de las filas: se sigue de a un libro
+        for libro_id in faltantes:
+            registrar(libro_id, instante, **deltas)
+
+
+def podar(lote=LOTE_BORRADO):
+    """Borra en lotes las horas que quedaron fuera de la ventana"""
+    corte = bloque_de() - datetime.timedelta(hours=HORAS_VENTANA)
+    borradas = 0
+    while True:
+        ids = list(ActividadLibro.objects.filter(bloque__lt=corte).values_list('id', flat=True)[:lote])
+        if not ids:
+            return borradas
+        borradas += ActividadLibro.objects.filter(id__in=ids).delete()[0]
+
+
+def calcular(top_k=TOP_K):
+    """Recalcula el ranking con decaimiento exponencial, lo guarda (RankingTendencias) y lo devuelve"""
+    podar()
+    ahora = timezone.now()
+    corte = bloque_de(ahora) - datetime.timedelta(hours=HORAS_VENTANA)
+
+    puntajes = defaultdict(float)
+    for fila in ActividadLibro.objects.filter(bloque__gte=corte).values_list(
+        'libro_id', 'bloque', *ActividadLibro.CAMPOS,
+    ).iterator():
+        libro_id, bloque, *conteos = fila
+        horas = max((ahora - bloque).total_seconds() / 3600, 0)
+        peso = 0.5 ** (horas / VIDA_MEDIA_HORAS)
+        puntajes[libro_id] += peso * sum(
+            PESOS[campo] * conteo for campo, conteo in zip(ActividadLibro.CAMPOS, conteos)
+        )
+
+    def top(candidatos):
+        return [libro_id for libro_id, _ in heapq.nlargest(top_k, candidatos, key=lambda par: (par[1], par[0]))]
+
+    por_genero = defaultdict(list)
+    generos = dict(Libro.objects.filter(id__in=list(puntajes)).values_list('id', 'genero'))
+    for libro_id, puntaje in puntajes.items():
+        if libro_id in generos:
+            por_genero[generos[libro_id]].append((libro_id, puntaje))
+
+    fila, _ = RankingTendencias.objects.update_or_create(pk=1, defaults={
+        'general': top((libro_id, puntaje) for libro_id, puntaje in puntajes.items() if libro_id in generos),
+        'generos': {genero: top(candidatos) for genero, candidatos in por_genero.items()},
+        'calculado': ahora,
+    })
+    ranking = _como_dict(fila)
+    cache.set(CLAVE_RANKING, ranking, TIMEOUT_COPIA)
+    return ranking
+
+
+def _como_dict(fila):
+    return {'general': fila.general, 'generos': fila.generos, 'calculado': fila.calculado.timestamp()}
+
+
+def _ranking():
+    """Ranking guardado (copia de la caché local o la fila), o None si nunca se calculó"""
+    ranking = cache.get(CLAVE_RANKING)
+    if ranking is None:
+        fila = RankingTendencias.objects.filter(pk=1).first()
+        if fila is None:
+            return None
+        ranking = _como_dict(fila)
+        cache.set(CLAVE_RANKING, ranking, TIMEOUT_COPIA)
+    return ranking
+
+
+def _calcular_hilo():
+    try:
+        calcular()
+    except Exception:
+        logger.exception("No se pudieron calcular las tendencias")
+    finally:
+        # El hilo abre su propia conexión; se cierra al terminar
+        connections.close_all()
+
+
+def ids(genero=None, limite=TOP_K):
+    """Ids en tendencia (generales o de `genero`), o [] si el ranking aún no existe"""
+    ranking = _ranking()
+    if ranking is None or time.time() - ranking['calculado'] > INTERVALO_CALCULO:
+        # Sin cron el ranking se mantiene igual al día
+        if cache.add(f'{CLAVE_RANKING}:calculando', True, 60):
+            _ejecutor_tendencias.submit(_calcular_hilo)
+    if ranking is None:
+        return []
+    lista = ranking['generos'].get(genero, []) if genero else ranking['general']
+    return lista[:limite]
+
+
+def libros(genero=None, limite=TOP_K):
+    """Libros en tendencia en orden, hidratados con una sola consulta"""
+    libro_ids = ids(genero, limite)
+    if not libro_ids:
+        return []
+    por_id = Libro.objects.select_related('estadisticas').in_bulk(libro_ids)
+    return [por_id[libro_id] for libro_id in libro_ids if libro_id in por_id]
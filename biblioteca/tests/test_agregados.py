@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from usuarios.models import Usuario
+
+from biblioteca.models import Libro, Reseña
+
+
+def _usuario(nombre):
+    return Usuario.objects.create_user(username=nombre, password='clave-de-prueba', nombre=nombre)
+
+
+# -------------------------------
+# Agregados de calificación en Libro
+# -------------------------------
+class AgregadosLibroTests(TestCase):
+    """Los receivers de signals.py dejan los agregados igual que un recálculo desde cero"""
+
+    CAMPOS = ('suma_calificaciones', 'total_reseñas', 'promedio')
+
+    def setUp(self):
+        self.ana = _usuario('ana')
+        self.beto = _usuario('beto')
+        self.libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+        self.otro = Libro.objects.create(titulo='Ficciones', autor='Jorge Luis Borges')
+
+    def _valores(self, libro):
+        return Libro.objects.values(*self.CAMPOS).get(pk=libro.pk)
+
+    def assertIgualARecalculo(self, *libros):
+        for libro in libros:
+            mantenidos = self._valores(libro)
+            Libro.recalcular_calificaciones(libro.pk)
+            self.assertEqual(mantenidos, self._valores(libro), libro.titulo)
+
+    def test_crear_editar_y_borrar_reseñas(self):
+        reseña = Reseña.objects.create(usuario=self.ana, libro=self.libro, comentario='Bueno', calificacion=4)
+        Reseña.objects.create(usuario=self.beto, libro=self.libro, comentario='Regular', calificacion=2)
+        self.assertIgualARecalculo(self.libro)
+        self.assertEqual(self._valores(self.libro), {'suma_calificaciones': 6, 'total_reseñas': 2, 'promedio': 3.0})
+
+        reseña.calificacion = 5
+        reseña.save()
+        self.assertIgualARecalculo(self.libro)
+
+        # Editar el libro de la reseña mueve el agregado de un libro al otro
+        reseña.libro = self.otro
+        reseña.save()
+        self.assertIgualARecalculo(self.libro, self.otro)
+
+        reseña.delete()
+        self.assertIgualARecalculo(self.libro, self.otro)
+        self.assertEqual(self._valores(self.otro)['promedio'], 0)
+
+    def test_borrado_en_cascada(self):
+        Reseña.objects.create(usuario=self.ana, libro=self.libro, comentario='Bueno', calificacion=4)
+        Reseña.objects.create(usuario=self.ana, libro=self.otro, comentario='Muy bueno', calificacion=5)
+        Reseña.objects.create(usuario=self.beto, libro=self.libro, comentario='Malo', calificacion=1)
+
+        # Borrar el usuario borra sus reseñas
+        self.ana.delete()
+        self.assertIgualARecalculo(self.libro, self.otro)
+        self.assertEqual(self._valores(self.libro)['total_reseñas'], 1)
+
+    def test_recalcular_valoraciones_repara_cargas_en_bloque(self):
+        # bulk_create no envía post_save: los agregados quedan desfasados
+        Reseña.objects.bulk_create([
+            Reseña(usuario=self.ana, libro=self.libro, comentario='a', calificacion=5),
+            Reseña(usuario=self.beto, libro=self.libro, comentario='b', calificacion=3),
+        ])
+        self.assertEqual(self._valores(self.libro)['total_reseñas'], 0)
+        call_command('recalcular_valoraciones', stdout=StringIO())
+        self.assertEqual(self._valores(self.libro), {'suma_calificaciones': 8, 'total_reseñas': 2, 'promedio': 4.0})
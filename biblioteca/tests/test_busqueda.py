@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from biblioteca.busqueda import buscar_libros_texto, tokenizar
+from biblioteca.models import Libro
+
+
+# -------------------------------
+# Texto completo (FULLTEXT / FTS5)
+# -------------------------------
+class BusquedaTextoTests(TransactionTestCase):
+    """
+    TransactionTestCase: el índice FULLTEXT de InnoDB solo ve filas confirmadas,
+    así que dentro de la transacción de TestCase no encontraría nada.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.en_titulo = Libro.objects.create(
+            titulo='El túnel', autor='Ernesto Sábato', genero='policial', descripcion='Una novela breve.',
+        )
+        self.en_descripcion = Libro.objects.create(
+            titulo='Sobre héroes y tumbas', autor='Ernesto Sábato', genero='historia',
+            descripcion='Aparece un túnel en la historia.',
+        )
+        self.otro = Libro.objects.create(titulo='Ficciones', autor='Jorge Luis Borges', genero='fantasia')
+
+    def _ids(self, query):
+        return list(buscar_libros_texto(Libro.objects.all(), query).order_by('-relevancia', '-id')
+                    .values_list('id', flat=True))
+
+    def test_el_titulo_pesa_mas_que_la_descripcion(self):
+        self.assertEqual(self._ids('túnel'), [self.en_titulo.id, self.en_descripcion.id])
+
+    def test_todos_los_terminos_son_obligatorios_y_aceptan_prefijos(self):
+        self.assertEqual(self._ids('ficc borges'), [self.otro.id])
+        self.assertEqual(self._ids('ficciones sabato'), [])
+
+    def test_operadores_del_motor_se_descartan(self):
+        self.assertEqual(tokenizar('"borges" -ficciones* OR (x)'), ['borges', 'ficciones', 'or', 'x'])
+        self.assertEqual(self._ids('borges* +"'), [self.otro.id])
+
+    def test_el_indice_sigue_a_las_escrituras(self):
+        self.otro.titulo = 'El Aleph'
+        self.otro.save()
+        self.assertEqual(self._ids('aleph'), [self.otro.id])
+        self.assertEqual(self._ids('ficciones'), [])
+        self.otro.delete()
+        self.assertEqual(self._ids('aleph'), [])
+
+    def test_una_busqueda_por_genero_incluye_sus_libros(self):
+        self.assertIn(self.otro.id, self._ids('fantasía'))
+
+    def test_vista(self):
+        respuesta = self.client.get(reverse('buscar_libros'), {'q': 'túnel'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([libro.id for libro in respuesta.context['resultados']],
+                         [self.en_titulo.id, self.en_descripcion.id])
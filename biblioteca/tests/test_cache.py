@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from biblioteca import cache as cache_versionada
+from biblioteca.models import Libro
+
+
+# -------------------------------
+# Versiones
+# -------------------------------
+class VersionesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidar_espera_al_commit(self):
+        antes = cache_versionada.version('libros')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            cache_versionada.invalidar('libros')
+            self.assertEqual(cache_versionada.version('libros'), antes)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(cache_versionada.version('libros'), antes + 1)
+
+    def test_una_version_perdida_no_vuelve_atras(self):
+        clave = cache_versionada.clave_versionada('prueba', ['libros'], 'x')
+        cache.delete(cache_versionada._clave_version('libros'))
+        self.assertNotEqual(cache_versionada.clave_versionada('prueba', ['libros'], 'x'), clave)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_check_de_cache_local(self):
+        avisos = cache_versionada.check_cache_compartida(None)
+        self.assertEqual([aviso.id for aviso in avisos], ['biblioteca.W001'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_check_de_cache_compartida(self):
+        self.assertEqual(cache_versionada.check_cache_compartida(None), [])
+
+
+# -------------------------------
+# Páginas completas para anónimos
+# -------------------------------
+class CacheAnonimoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+        self.llamadas = 0
+
+    def _vista(self, cuerpo=None):
+        @cache_versionada.cache_anonimo('libros')
+        def vista(request):
+            self.llamadas += 1
+            respuesta = HttpResponse(f'{self.llamadas}')
+            if cuerpo:
+                cuerpo(request, respuesta)
+            return respuesta
+        return vista
+
+    def test_la_segunda_visita_anonima_no_toca_la_base_de_datos(self):
+        self.client.get(reverse('lista_libros'))
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(reverse('lista_libros'))
+        self.assertContains(respuesta, 'Rayuela')
+        self.assertIn('Cookie', respuesta['Vary'])
+
+    def test_una_escritura_invalida_la_pagina(self):
+        self.client.get(reverse('lista_libros'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Libro.objects.create(titulo='Ficciones', autor='Jorge Luis Borges')
+        self.assertContains(self.client.get(reverse('lista_libros')), 'Ficciones')
+
+    def test_la_clave_incluye_la_url(self):
+        vista = self._vista()
+        fabrica = RequestFactory()
+        self.assertEqual(vista(fabrica.get('/a')).content, b'1')
+        self.assertEqual(vista(fabrica.get('/a')).content, b'1')
+        self.assertEqual(vista(fabrica.get('/a?pagina=2')).content, b'2')
+
+    def test_con_sesion_no_se_cachea(self):
+        vista = self._vista()
+        fabrica = RequestFactory()
+        for _ in range(2):
+            request = fabrica.get('/a')
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = 'abc'
+            vista(request)
+        self.assertEqual(self.llamadas, 2)
+
+    def test_con_token_csrf_no_se_cachea(self):
+        vista = self._vista(lambda request, respuesta: get_token(request))
+        vista(RequestFactory().get('/a'))
+        vista(RequestFactory().get('/a'))
+        self.assertEqual(self.llamadas, 2)
+
+    def test_si_pone_cookies_no_se_cachea(self):
+        vista = self._vista(lambda request, respuesta: respuesta.set_cookie('preferencia', 'x'))
+        vista(RequestFactory().get('/a'))
+        vista(RequestFactory().get('/a'))
+        self.assertEqual(self.llamadas, 2)
+
+    def test_el_detalle_de_un_libro_pide_sesion(self):
+        for url in (
+            reverse('detalle_libro', args=[self.libro.id]),
+            reverse('reseñas_libro', args=[self.libro.id]),
+        ):
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 302)
+            self.assertTrue(respuesta['Location'].startswith(settings.LOGIN_URL))
@@ -0,0 +1,130 @@
+import datetime
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from usuarios.models import Usuario
+
+from biblioteca import compactacion
+from biblioteca.models import EstadisticasLibro, Historial, HistorialDiario, Libro
+
+
+def _usuario(nombre):
+    return Usuario.objects.create_user(username=nombre, password='clave-de-prueba', nombre=nombre)
+
+
+# -------------------------------
+# Compactación de Historial
+# -------------------------------
+class CompactacionTests(TestCase):
+    """Historial + HistorialDiario cuentan las mismas visitas antes y después de compactar"""
+
+    def setUp(self):
+        cache.clear()
+        self.ana = _usuario('ana')
+        self.beto = _usuario('beto')
+        self.libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+        self.otro = Libro.objects.create(titulo='Ficciones', autor='Jorge Luis Borges')
+        self.ahora = timezone.now()
+
+    def _visita(self, usuario, libro, hace_dias=0, hace_minutos=0):
+        return Historial.objects.create(
+            usuario=usuario, libro=libro,
+            fecha=self.ahora - datetime.timedelta(days=hace_dias, minutes=hace_minutos),
+        )
+
+    def _totales(self):
+        """Visitas por (usuario, libro) sumando las dos tablas"""
+        totales = {}
+        for fila in Historial.objects.order_by().values('usuario_id', 'libro_id').annotate(n=Count('id')):
+            clave = (fila['usuario_id'], fila['libro_id'])
+            totales[clave] = totales.get(clave, 0) + fila['n']
+        for fila in HistorialDiario.objects.order_by().values('usuario_id', 'libro_id').annotate(n=Sum('visitas')):
+            clave = (fila['usuario_id'], fila['libro_id'])
+            totales[clave] = totales.get(clave, 0) + fila['n']
+        return totales
+
+    def assertTotalVisitasCoincide(self, *libros):
+        for libro in libros:
+            mantenido = EstadisticasLibro.objects.get(libro=libro).total_visitas
+            EstadisticasLibro.recalcular(libro.pk)
+            self.assertEqual(mantenido, EstadisticasLibro.objects.get(libro=libro).total_visitas, libro.titulo)
+
+    def test_colapsar_deja_la_ultima_de_cada_racha(self):
+        self._visita(self.ana, self.libro, hace_minutos=30)
+        self._visita(self.ana, self.libro, hace_minutos=20)
+        self._visita(self.ana, self.otro, hace_minutos=10)
+        ultima = self._visita(self.ana, self.libro)
+        antes = self._totales()
+
+        self.assertEqual(compactacion.colapsar(), 1)
+        self.assertEqual(
+            list(Historial.objects.filter(usuario=self.ana).values_list('libro_id', flat=True)),
+            [self.libro.id, self.otro.id, self.libro.id],
+        )
+        self.assertTrue(Historial.objects.filter(pk=ultima.pk).exists())
+        self.assertEqual(self._totales(), antes)
+
+    def test_colapsar_por_lotes(self):
+        for minutos in range(7):
+            self._visita(self.ana, self.libro, hace_minutos=minutos)
+        self.assertEqual(compactacion.colapsar(lote=2), 6)
+        self.assertEqual(Historial.objects.count(), 1)
+        self.assertEqual(self._totales(), {(self.ana.id, self.libro.id): 7})
+
+    def test_enrollar_suma_a_la_fila_del_dia(self):
+        self._visita(self.ana, self.libro, hace_dias=100, hace_minutos=5)
+        self._visita(self.ana, self.otro, hace_dias=100)
+        self._visita(self.ana, self.libro, hace_dias=10)
+        antes = self._totales()
+
+        self.assertEqual(compactacion.enrollar(dias=90), 2)
+        # Una segunda tanda del mismo día suma a la fila existente
+        self._visita(self.ana, self.libro, hace_dias=100, hace_minutos=1)
+        self.assertEqual(compactacion.enrollar(dias=90), 1)
+
+        self.assertEqual(Historial.objects.count(), 1)
+        dia = HistorialDiario.objects.get(usuario=self.ana, libro=self.libro)
+        self.assertEqual(dia.visitas, 2)
+        antes[(self.ana.id, self.libro.id)] += 1
+        self.assertEqual(self._totales(), antes)
+
+    def test_recortar_conserva_las_mas_recientes(self):
+        recientes = [self._visita(self.beto, libro, hace_minutos=minutos)
+                     for minutos, libro in enumerate([self.libro, self.otro])]
+        for minutos in range(2, 6):
+            self._visita(self.beto, self.libro if minutos % 2 else self.otro, hace_minutos=minutos)
+        antes = self._totales()
+
+        self.assertEqual(compactacion.recortar(maximo=2, lote=3), 4)
+        self.assertEqual(
+            set(Historial.objects.filter(usuario=self.beto).values_list('pk', flat=True)),
+            {visita.pk for visita in recientes},
+        )
+        self.assertEqual(self._totales(), antes)
+
+    def test_el_comando_no_pierde_visitas(self):
+        for usuario in (self.ana, self.beto):
+            for dias in (200, 120, 30, 1):
+                self._visita(usuario, self.libro, hace_dias=dias)
+                self._visita(usuario, self.libro, hace_dias=dias, hace_minutos=1)
+                self._visita(usuario, self.otro, hace_dias=dias, hace_minutos=2)
+        antes = self._totales()
+
+        call_command('compactar_historial', dias=90, maximo=3, stdout=StringIO())
+        self.assertLessEqual(Historial.objects.filter(usuario=self.ana).count(), 3)
+        self.assertEqual(self._totales(), antes)
+        self.assertTotalVisitasCoincide(self.libro, self.otro)
+
+    def test_no_corre_dos_veces_a_la_vez(self):
+        cache.add(compactacion.CLAVE_BLOQUEO, True)
+        self._visita(self.ana, self.libro)
+        self._visita(self.ana, self.libro, hace_minutos=1)
+        salida = StringIO()
+        call_command('compactar_historial', stdout=salida)
+        self.assertIn('en curso', salida.getvalue())
+        self.assertEqual(Historial.objects.count(), 2)
@@ -0,0 +1,64 @@
+from django.test import TestCase
+
+from usuarios.models import Usuario
+
+from biblioteca.models import Comentario, Libro, Reseña, ValoracionReseña
+
+
+# -------------------------------
+# Contadores de comentarios y respuestas
+# -------------------------------
+class ContadoresComentariosTests(TestCase):
+
+    def setUp(self):
+        self.ana = Usuario.objects.create_user(username='ana', password='clave-de-prueba', nombre='ana')
+        libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+        self.reseña = Reseña.objects.create(usuario=self.ana, libro=libro, comentario='Bueno', calificacion=4)
+
+    def _comentar(self, padre=None):
+        return Comentario.objects.create(usuario=self.ana, reseña=self.reseña, contenido='...', padre=padre)
+
+    def assertContadoresReales(self):
+        reseña = Reseña.objects.get(pk=self.reseña.pk)
+        valoraciones = ValoracionReseña.objects.filter(reseña=self.reseña)
+        self.assertEqual(reseña.total_valoraciones, valoraciones.count())
+        self.assertEqual(reseña.suma_puntuacion, sum(valoraciones.values_list('puntuacion', flat=True)))
+        self.assertEqual(reseña.total_comentarios, Comentario.objects.filter(reseña=self.reseña).count())
+        for comentario in Comentario.objects.filter(reseña=self.reseña):
+            self.assertEqual(comentario.total_respuestas, comentario.respuestas.count(), comentario.pk)
+
+    def test_borrar_un_padre(self):
+        raiz = self._comentar()
+        respuesta = self._comentar(raiz)
+        self._comentar(respuesta)
+        self._comentar(raiz)
+        hermano = self._comentar()
+        self._comentar(hermano)
+        self.assertContadoresReales()
+
+        # El borrado en cascada se lleva las respuestas y sus descendientes
+        respuesta.delete()
+        self.assertContadoresReales()
+        raiz.delete()
+        self.assertContadoresReales()
+        self.assertEqual(Reseña.objects.get(pk=self.reseña.pk).total_comentarios, 2)
+
+    def test_valoraciones(self):
+        beto = Usuario.objects.create_user(username='beto', password='clave-de-prueba', nombre='beto')
+        valoracion = ValoracionReseña.objects.create(usuario=self.ana, reseña=self.reseña, puntuacion=2)
+        ValoracionReseña.objects.create(usuario=beto, reseña=self.reseña, puntuacion=5)
+        self.assertContadoresReales()
+
+        valoracion.puntuacion = 4
+        valoracion.save()
+        self.assertContadoresReales()
+
+        # Editar la reseña no pisa los contadores con los valores leídos antes
+        reseña = Reseña.objects.get(pk=self.reseña.pk)
+        ValoracionReseña.objects.filter(pk=valoracion.pk).delete()
+        reseña.comentario = 'Editado'
+        reseña.save()
+        self.assertEqual(Reseña.objects.get(pk=self.reseña.pk).total_valoraciones, 1)
+
+        beto.delete()
+        self.assertContadoresReales()
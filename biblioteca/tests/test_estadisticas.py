@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from usuarios.models import Usuario
+
+from biblioteca.listas import agregar_libros
+from biblioteca.models import EstadisticasLibro, Favorito, Historial, Libro, Lista, Reseña
+
+
+def _usuario(nombre):
+    return Usuario.objects.create_user(username=nombre, password='clave-de-prueba', nombre=nombre)
+
+
+# -------------------------------
+# Estadísticas por libro (histograma, favoritos, listas y visitas)
+# -------------------------------
+class EstadisticasLibroTests(TestCase):
+    """Los receivers de signals.py dejan la fila igual que EstadisticasLibro.recalcular"""
+
+    CAMPOS = (
+        'estrellas_1', 'estrellas_2', 'estrellas_3', 'estrellas_4', 'estrellas_5',
+        'total_favoritos', 'total_listas', 'total_visitas',
+    )
+
+    def setUp(self):
+        self.ana = _usuario('ana')
+        self.beto = _usuario('beto')
+        self.libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+        self.otro = Libro.objects.create(titulo='Ficciones', autor='Jorge Luis Borges')
+
+    def _valores(self, libro):
+        return EstadisticasLibro.objects.values(*self.CAMPOS).get(libro_id=libro.pk)
+
+    def assertIgualARecalculo(self, *libros):
+        for libro in libros:
+            mantenidos = self._valores(libro)
+            EstadisticasLibro.recalcular(libro.pk)
+            self.assertEqual(mantenidos, self._valores(libro), libro.titulo)
+
+    def test_se_crea_con_el_libro(self):
+        self.assertEqual(set(self._valores(self.libro).values()), {0})
+
+    def test_histograma_de_reseñas(self):
+        reseña = Reseña.objects.create(usuario=self.ana, libro=self.libro, comentario='a', calificacion=4)
+        Reseña.objects.create(usuario=self.beto, libro=self.libro, comentario='b', calificacion=2)
+        self.assertIgualARecalculo(self.libro)
+
+        reseña.calificacion = 5
+        reseña.save()
+        reseña.libro = self.otro
+        reseña.save()
+        self.assertIgualARecalculo(self.libro, self.otro)
+        self.assertEqual(self._valores(self.otro)['estrellas_5'], 1)
+
+        reseña.delete()
+        self.assertIgualARecalculo(self.libro, self.otro)
+
+        estadisticas = EstadisticasLibro.objects.get(libro=self.libro)
+        self.assertEqual(estadisticas.total_reseñas, 1)
+        self.assertEqual(estadisticas.promedio, 2)
+        self.assertEqual([fila['cantidad'] for fila in estadisticas.histograma()], [0, 0, 0, 1, 0])
+
+    def test_favoritos_listas_y_visitas(self):
+        Favorito.objects.create(usuario=self.ana, libro=self.libro)
+        favorito = Favorito.objects.create(usuario=self.beto, libro=self.libro)
+        lista = Lista.objects.create(usuario=self.ana, nombre='Pendientes')
+        otra = Lista.objects.create(usuario=self.beto, nombre='Leídos')
+        agregar_libros(lista, [self.libro.pk, self.otro.pk])
+        agregar_libros(otra, [self.libro.pk])
+        Historial.objects.create(usuario=self.ana, libro=self.libro)
+        Historial.objects.create(usuario=self.ana, libro=self.libro)
+        self.assertIgualARecalculo(self.libro, self.otro)
+        self.assertEqual(self._valores(self.libro)['total_listas'], 2)
+
+        favorito.delete()
+        lista.libros.remove(self.otro)
+        otra.delete()
+        self.assertIgualARecalculo(self.libro, self.otro)
+        self.assertEqual(self._valores(self.libro)['total_listas'], 1)
+
+    def test_borrado_en_cascada(self):
+        Reseña.objects.create(usuario=self.ana, libro=self.libro, comentario='a', calificacion=3)
+        Favorito.objects.create(usuario=self.ana, libro=self.libro)
+        agregar_libros(Lista.objects.create(usuario=self.ana, nombre='Pendientes'), [self.libro.pk])
+
+        self.ana.delete()
+        self.assertIgualARecalculo(self.libro)
+        self.assertEqual(self._valores(self.libro)['total_favoritos'], 0)
+        self.assertEqual(self._valores(self.libro)['total_listas'], 0)
+
+    def test_recalcular_estadisticas_repara_cargas_en_bloque(self):
+        Reseña.objects.bulk_create([Reseña(usuario=self.ana, libro=self.libro, comentario='a', calificacion=5)])
+        Favorito.objects.bulk_create([Favorito(usuario=self.ana, libro=self.libro)])
+        call_command('recalcular_estadisticas', stdout=StringIO())
+        valores = self._valores(self.libro)
+        self.assertEqual((valores['estrellas_5'], valores['total_favoritos']), (1, 1))
@@ -0,0 +1,159 @@
+import datetime
+import io
+import json
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from usuarios.models import Usuario
+
+from biblioteca import exportacion
+from biblioteca.listas import agregar_libros, mover
+from biblioteca.models import EstadisticasLibro, Favorito, Historial, HistorialDiario, Libro, Lista
+
+
+def _usuario(nombre):
+    return Usuario.objects.create_user(username=nombre, password='clave-de-prueba', nombre=nombre)
+
+
+def _archivo(contenido):
+    """Lo que recibe importar(): líneas en bytes, como un archivo subido"""
+    return io.BytesIO(contenido.encode('utf-8'))
+
+
+# -------------------------------
+# Exportación e importación de listas y favoritos
+# -------------------------------
+class ExportacionTests(TestCase):
+
+    def setUp(self):
+        self.ana = _usuario('ana')
+        self.beto = _usuario('beto')
+        self.libros = [
+            Libro.objects.create(titulo=titulo, autor=autor)
+            for titulo, autor in [
+                ('Rayuela', 'Julio Cortázar'), ('Ficciones', 'Jorge Luis Borges'),
+                ('El túnel', 'Ernesto Sabato'), ('Pedro Páramo', 'Juan Rulfo'),
+            ]
+        ]
+        rayuela, ficciones, tunel, paramo = (libro.id for libro in self.libros)
+
+        pendientes = Lista.objects.create(usuario=self.ana, nombre='Pendientes', descripcion='Para el verano')
+        agregar_libros(pendientes, [rayuela, ficciones, tunel])
+        mover(pendientes, tunel)
+        agregar_libros(Lista.objects.create(usuario=self.ana, nombre='Leídos, "clásicos"'), [paramo])
+        Favorito.objects.create(usuario=self.ana, libro_id=ficciones)
+        Favorito.objects.create(usuario=self.ana, libro_id=paramo)
+        Historial.objects.create(usuario=self.ana, libro_id=rayuela)
+        HistorialDiario.objects.create(usuario=self.ana, libro_id=ficciones, dia=datetime.date(2025, 1, 1), visitas=4)
+
+    def _exportar(self, usuario, formato):
+        return ''.join(exportacion.exportar(usuario, formato))
+
+    def _listas(self, usuario):
+        return {
+            lista.nombre: (lista.descripcion, list(lista.entradas.order_by('posicion', 'id').values_list('libro_id', flat=True)))
+            for lista in Lista.objects.filter(usuario=usuario)
+        }
+
+    def _favoritos(self, usuario):
+        return set(Favorito.objects.filter(usuario=usuario).values_list('libro_id', flat=True))
+
+    def test_exporta_todo(self):
+        filas = [json.loads(linea) for linea in self._exportar(self.ana, 'jsonl').splitlines()]
+        tipos = [fila['tipo'] for fila in filas]
+        self.assertEqual(
+            tipos, ['lista'] * 2 + ['libro_lista'] * 4 + ['favorito'] * 2 + ['historial', 'historial_diario'],
+        )
+        self.assertEqual(filas[-1]['visitas'], 4)
+        # Los libros de cada lista salen en su orden
+        pendientes = filas[0]['lista']
+        self.assertEqual(
+            [fila['titulo'] for fila in filas if fila['tipo'] == 'libro_lista' and fila['lista'] == pendientes],
+            ['El túnel', 'Rayuela', 'Ficciones'],
+        )
+
+    def test_exporta_por_tramos(self):
+        completo = self._exportar(self.ana, 'jsonl')
+        with mock.patch.object(exportacion, 'LOTE', 1):
+            self.assertEqual(self._exportar(self.ana, 'jsonl'), completo)
+
+    def test_ida_y_vuelta(self):
+        for formato in ('jsonl', 'csv'):
+            with self.subTest(formato=formato):
+                destino = _usuario(f'destino-{formato}')
+                contenido = self._exportar(self.ana, formato)
+                resumen = exportacion.importar(destino, _archivo(contenido), formato)
+
+                self.assertEqual(resumen, {'listas': 2, 'libros_lista': 4, 'favoritos': 2, 'omitidas': 0})
+                self.assertEqual(self._listas(destino), self._listas(self.ana))
+                self.assertEqual(self._favoritos(destino), self._favoritos(self.ana))
+                # El historial solo se exporta
+                self.assertFalse(Historial.objects.filter(usuario=destino).exists())
+                self.assertFalse(HistorialDiario.objects.filter(usuario=destino).exists())
+
+    def test_importar_dos_veces_no_duplica(self):
+        contenido = self._exportar(self.ana, 'jsonl')
+        exportacion.importar(self.beto, _archivo(contenido), 'jsonl')
+        resumen = exportacion.importar(self.beto, _archivo(contenido), 'jsonl')
+        self.assertEqual(resumen, {'listas': 0, 'libros_lista': 0, 'favoritos': 0, 'omitidas': 0})
+        self.assertEqual(Lista.objects.filter(usuario=self.beto).count(), 2)
+        self.assertEqual(EstadisticasLibro.objects.get(libro=self.libros[1]).total_favoritos, 2)
+
+    def test_importar_por_lotes(self):
+        contenido = self._exportar(self.ana, 'csv')
+        with mock.patch.object(exportacion, 'LOTE', 2):
+            resumen = exportacion.importar(self.beto, _archivo(contenido), 'csv')
+        self.assertEqual(resumen['libros_lista'], 4)
+        self.assertEqual(self._listas(self.beto), self._listas(self.ana))
+
+    def test_resuelve_por_titulo_y_autor(self):
+        # Un id de otra instalación: vale el título y autor
+        filas = [
+            {'tipo': 'favorito', 'libro_id': 999999, 'titulo': 'Rayuela', 'autor': 'JULIO CORTAZAR'},
+            {'tipo': 'favorito', 'libro_id': self.libros[1].id, 'titulo': 'Pedro Páramo', 'autor': 'Juan Rulfo'},
+        ]
+        contenido = ''.join(json.dumps(fila) + '\n' for fila in filas)
+        resumen = exportacion.importar(self.beto, _archivo(contenido), 'jsonl')
+        self.assertEqual(resumen['favoritos'], 2)
+        self.assertEqual(self._favoritos(self.beto), {self.libros[0].id, self.libros[3].id})
+
+    def test_filas_invalidas_se_omiten(self):
+        contenido = '\n'.join([
+            'no es json',
+            '[1, 2]',
+            json.dumps({'tipo': 'desconocido'}),
+            json.dumps({'tipo': 'lista', 'lista': 1, 'nombre': ''}),
+            json.dumps({'tipo': 'favorito', 'titulo': 'No existe', 'autor': 'Nadie'}),
+            json.dumps({'tipo': 'favorito', 'libro_id': self.libros[0].id}),
+            '',
+        ])
+        resumen = exportacion.importar(self.beto, _archivo(contenido), 'jsonl')
+        self.assertEqual(resumen, {'listas': 0, 'libros_lista': 0, 'favoritos': 1, 'omitidas': 5})
+
+    def test_formato_de(self):
+        self.assertEqual(exportacion.formato_de('datos.CSV'), 'csv')
+        self.assertEqual(exportacion.formato_de('datos.ndjson'), 'jsonl')
+        self.assertIsNone(exportacion.formato_de('datos.txt'))
+        self.assertIsNone(exportacion.formato_de('datos'))
+
+    def test_vistas(self):
+        self.client.force_login(self.ana)
+        respuesta = self.client.get(reverse('exportar_datos'), {'formato': 'csv'})
+        self.assertTrue(respuesta.streaming)
+        contenido = b''.join(respuesta.streaming_content)
+        self.assertEqual(self.client.get(reverse('exportar_datos'), {'formato': 'xml'}).status_code, 404)
+
+        self.client.force_login(self.beto)
+        respuesta = self.client.post(
+            reverse('importar_datos'), {'archivo': SimpleUploadedFile('datos.csv', contenido)}, follow=True,
+        )
+        self.assertContains(respuesta, 'Importación terminada')
+        self.assertEqual(self._listas(self.beto), self._listas(self.ana))
+
+        respuesta = self.client.post(
+            reverse('importar_datos'), {'archivo': SimpleUploadedFile('datos.txt', contenido)}, follow=True,
+        )
+        self.assertContains(respuesta, 'El archivo debe ser .csv o .jsonl.')
@@ -0,0 +1,90 @@
+import re
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from usuarios.models import Usuario
+
+from biblioteca import fragmentos, views, visitas
+from biblioteca.models import Favorito, Libro, Reseña
+
+
+_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def _usuario(nombre, **extra):
+    return Usuario.objects.create_user(username=nombre, password='clave-de-prueba', nombre=nombre, **extra)
+
+
+# -------------------------------
+# Páginas cacheadas por perfil con huecos por usuario
+# -------------------------------
+class CachePersonalizadoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # detalle_libro deja las visitas en la cola del proceso
+        self.addCleanup(visitas._cola.clear)
+        self.ana = _usuario('ana')
+        self.beto = _usuario('beto')
+        self.libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+        Favorito.objects.create(usuario=self.ana, libro=self.libro)
+        self.url = reverse('detalle_libro', args=[self.libro.id])
+
+    def _get(self, usuario, client=None):
+        client = client or Client()
+        client.force_login(usuario)
+        return client.get(self.url)
+
+    def test_una_sola_pagina_por_perfil_con_los_huecos_de_cada_usuario(self):
+        with mock.patch.object(views, '_pagina_reseñas', wraps=views._pagina_reseñas) as pagina_reseñas:
+            de_ana = self._get(self.ana)
+            de_beto = self._get(self.beto)
+        self.assertEqual(pagina_reseñas.call_count, 1)
+
+        self.assertContains(de_ana, '<span class="user-name">ana</span>', html=True)
+        self.assertContains(de_ana, 'Ya en favoritos')
+        self.assertContains(de_beto, '<span class="user-name">beto</span>', html=True)
+        self.assertContains(de_beto, 'Agregar a favoritos')
+        self.assertNotContains(de_beto, 'Ya en favoritos')
+        for respuesta in (de_ana, de_beto):
+            self.assertNotContains(respuesta, '<!--hueco:')
+
+    def test_el_token_csrf_es_de_cada_visitante(self):
+        self._get(self.ana)
+        client = Client(enforce_csrf_checks=True)
+        pagina = self._get(self.beto, client).content.decode()
+        token = _TOKEN.search(pagina).group(1)
+
+        respuesta = client.post(reverse('crear_reseña', args=[self.libro.id]), {
+            'comentario': 'Muy bueno', 'calificacion': 5, 'csrfmiddlewaretoken': token,
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertTrue(Reseña.objects.filter(usuario=self.beto, libro=self.libro).exists())
+
+    def test_una_escritura_invalida_la_pagina(self):
+        self._get(self.ana)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reseña.objects.create(usuario=self.beto, libro=self.libro, comentario='Nueva reseña', calificacion=4)
+        self.assertContains(self._get(self.ana), 'Nueva reseña')
+
+    def test_perfiles(self):
+        fabrica = RequestFactory()
+        perfiles = []
+        for usuario in (self.ana, _usuario('admin', rol=Usuario.RolUsuario.ADMIN),
+                        _usuario('root', is_superuser=True)):
+            request = fabrica.get('/')
+            request.user = usuario
+            perfiles.append(fragmentos.perfil(request))
+        self.assertEqual(perfiles, ['usuario', 'admin', 'usuario:superusuario'])
+
+    def test_fuera_de_la_cache_el_hueco_se_renderiza_en_el_lugar(self):
+        request = RequestFactory().get('/')
+        request.user = self.ana
+        html = Template("{% load huecos %}{% hueco 'favorito' libro_id %}").render(
+            Context({'request': request, 'libro_id': self.libro.id})
+        )
+        self.assertIn('Ya en favoritos', html)
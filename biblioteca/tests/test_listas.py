@@ -0,0 +1,172 @@
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.urls import reverse
+
+from usuarios.models import Usuario
+
+from biblioteca import listas
+from biblioteca.models import Libro, LibroEnLista, Lista
+
+
+def _usuario(nombre):
+    return Usuario.objects.create_user(username=nombre, password='clave-de-prueba', nombre=nombre)
+
+
+def _libros(cantidad):
+    return [Libro.objects.create(titulo=f'Libro {numero}', autor='Autor') for numero in range(cantidad)]
+
+
+# -------------------------------
+# Altas y bajas en bloque
+# -------------------------------
+class CambiosListaTests(TestCase):
+
+    def setUp(self):
+        self.ana = _usuario('ana')
+        self.lista = Lista.objects.create(usuario=self.ana, nombre='Pendientes')
+        self.libros = _libros(4)
+        self.ids = [libro.id for libro in self.libros]
+
+    def _total(self):
+        self.lista.refresh_from_db(fields=['total_libros'])
+        return self.lista.total_libros
+
+    def test_leer_ids(self):
+        self.assertEqual(listas.leer_ids(' 3,1,,3, 2 '), [3, 1, 2])
+        self.assertEqual(listas.leer_ids(''), [])
+        for invalido in ('1,x', '0', '-4', ','.join(str(i) for i in range(1, listas.MAX_CAMBIOS + 2))):
+            with self.subTest(invalido=invalido[:20]):
+                with self.assertRaises(ValidationError):
+                    listas.leer_ids(invalido)
+
+    def test_agregar_ignora_repetidos_e_inexistentes(self):
+        self.assertEqual(listas.agregar_libros(self.lista, [self.ids[1], self.ids[0], self.ids[1]]), [self.ids[1], self.ids[0]])
+        self.assertEqual(listas.agregar_libros(self.lista, [self.ids[0], 999999, self.ids[2]]), [self.ids[2]])
+        self.assertEqual(listas.ids_en_lista(self.lista, self.ids), {self.ids[0], self.ids[1], self.ids[2]})
+        self.assertEqual(self._total(), 3)
+
+    def test_aplicar_cambios(self):
+        listas.agregar_libros(self.lista, self.ids[:2])
+        cambios = listas.aplicar_cambios(
+            self.lista, agregar=[self.ids[2], self.ids[3], self.ids[0]], quitar=[self.ids[1], self.ids[3]],
+        )
+        # ids[3] está en las dos: se ignora; ids[0] ya estaba
+        self.assertEqual(cambios, {'agregados': 1, 'quitados': 1})
+        self.assertEqual(listas.ids_en_lista(self.lista, self.ids), {self.ids[0], self.ids[2]})
+        self.assertEqual(self._total(), 2)
+
+    def test_total_libros_al_borrar(self):
+        listas.agregar_libros(self.lista, self.ids)
+        self.libros[0].delete()
+        self.assertEqual(self._total(), 3)
+        self.lista.libros.clear()
+        self.assertEqual(self._total(), 0)
+
+    def test_editar_nombre_no_pisa_el_total(self):
+        vieja = Lista.objects.get(pk=self.lista.pk)
+        listas.agregar_libros(self.lista, self.ids[:2])
+        vieja.nombre = 'Leídos'
+        vieja.save()
+        self.assertEqual(self._total(), 2)
+
+    def test_vista_libros_lista(self):
+        self.client.force_login(self.ana)
+        url = reverse('libros_lista', args=[self.lista.id])
+        respuesta = self.client.post(url, {'agregar': ','.join(map(str, self.ids[:3])), 'quitar': ''})
+        self.assertEqual(respuesta.json(), {'agregados': 3, 'quitados': 0, 'total': 3})
+        respuesta = self.client.post(url, {'agregar': '', 'quitar': str(self.ids[0])})
+        self.assertEqual(respuesta.json(), {'agregados': 0, 'quitados': 1, 'total': 2})
+        self.assertEqual(self.client.post(url, {'agregar': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        # Las listas de otro usuario no se tocan
+        self.client.force_login(_usuario('beto'))
+        self.assertEqual(self.client.post(url, {'agregar': str(self.ids[3])}).status_code, 404)
+
+    def test_selector_marca_los_que_ya_estan(self):
+        listas.agregar_libros(self.lista, [self.ids[1]])
+        self.client.force_login(self.ana)
+        respuesta = self.client.get(reverse('selector_libros'), {'lista': self.lista.id})
+        marcados = {fila['id'] for fila in respuesta.json()['resultados'] if fila['en_lista']}
+        self.assertEqual(marcados, {self.ids[1]})
+
+
+# -------------------------------
+# Orden de la lista
+# -------------------------------
+class OrdenListaTests(TestCase):
+
+    def setUp(self):
+        self.ana = _usuario('ana')
+        self.lista = Lista.objects.create(usuario=self.ana, nombre='Pendientes')
+        self.a, self.b, self.c, self.d = [libro.id for libro in _libros(4)]
+        listas.agregar_libros(self.lista, [self.a, self.b, self.c])
+
+    def _orden(self):
+        return list(self.lista.entradas.order_by('posicion', 'id').values_list('libro_id', flat=True))
+
+    def _posiciones(self):
+        return list(self.lista.entradas.order_by('posicion', 'id').values_list('posicion', flat=True))
+
+    def test_agregar_al_final_con_huecos(self):
+        hueco = LibroEnLista.HUECO
+        self.assertEqual(self._posiciones(), [hueco, 2 * hueco, 3 * hueco])
+        listas.agregar_libros(self.lista, [self.d])
+        self.assertEqual(self._orden(), [self.a, self.b, self.c, self.d])
+        self.assertEqual(self._posiciones()[-1], 4 * hueco)
+
+    def test_mover(self):
+        self.assertTrue(listas.mover(self.lista, self.c))
+        self.assertEqual(self._orden(), [self.c, self.a, self.b])
+        self.assertTrue(listas.mover(self.lista, self.c, despues_de=self.a))
+        self.assertEqual(self._orden(), [self.a, self.c, self.b])
+        self.assertTrue(listas.mover(self.lista, self.a, despues_de=self.b))
+        self.assertEqual(self._orden(), [self.c, self.b, self.a])
+        self.assertTrue(listas.mover_al_final(self.lista, self.c))
+        self.assertEqual(self._orden(), [self.b, self.a, self.c])
+
+    def test_mover_rechaza_libros_ajenos_a_la_lista(self):
+        self.assertFalse(listas.mover(self.lista, self.d))
+        self.assertFalse(listas.mover(self.lista, self.a, despues_de=self.d))
+        self.assertFalse(listas.mover(self.lista, self.a, despues_de=self.a))
+        self.assertFalse(listas.mover_al_final(self.lista, self.d))
+        self.assertEqual(self._orden(), [self.a, self.b, self.c])
+
+    def test_sin_hueco_renumera_sin_cambiar_el_orden(self):
+        for posicion, libro_id in enumerate([self.a, self.b, self.c], start=1):
+            LibroEnLista.objects.filter(lista=self.lista, libro_id=libro_id).update(posicion=posicion)
+        self.assertTrue(listas.mover(self.lista, self.c, despues_de=self.a))
+        self.assertEqual(self._orden(), [self.a, self.c, self.b])
+        posiciones = self._posiciones()
+        self.assertTrue(all(b - a >= 2 for a, b in zip(posiciones, posiciones[1:])))
+
+    def test_muchos_movimientos_en_el_mismo_hueco(self):
+        # Cada movimiento parte el hueco a la mitad hasta que hay que renumerar
+        esperado = [self.a, self.b, self.c]
+        with mock.patch.object(listas, 'renumerar', wraps=listas.renumerar) as renumerar:
+            for _ in range(30):
+                self.assertTrue(listas.mover(self.lista, esperado[-1], despues_de=esperado[0]))
+                esperado.insert(1, esperado.pop())
+                self.assertEqual(self._orden(), esperado)
+        self.assertEqual(renumerar.call_count, 1)
+
+    def test_renumerar(self):
+        listas.mover(self.lista, self.c, despues_de=self.a)
+        listas.renumerar(self.lista, lote=2)
+        self.assertEqual(self._orden(), [self.a, self.c, self.b])
+        self.assertEqual(self._posiciones(), [LibroEnLista.HUECO * numero for numero in (1, 2, 3)])
+
+    def test_vistas(self):
+        self.client.force_login(self.ana)
+        url = reverse('mover_libro_lista', args=[self.lista.id])
+        self.client.post(url, {'libro': self.c, 'despues_de': ''})
+        self.assertEqual(self._orden(), [self.c, self.a, self.b])
+        self.client.post(url, {'libro': self.c, 'al_final': '1'})
+        self.assertEqual(self._orden(), [self.a, self.b, self.c])
+        respuesta = self.client.post(url, {'libro': 'x'}, follow=True)
+        self.assertContains(respuesta, 'No se pudo mover el libro.')
+
+        respuesta = self.client.get(reverse('detalle_lista', args=[self.lista.id]))
+        self.assertEqual([entrada.libro_id for entrada in respuesta.context['entradas']], [self.a, self.b, self.c])
@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from usuarios.models import Usuario
+
+from biblioteca import notificaciones
+from biblioteca.models import Notificacion
+
+
+# -------------------------------
+# Contador de notificaciones no leídas
+# -------------------------------
+class ContadorNoLeidasTests(TestCase):
+    """El contador de la caché acompaña a un COUNT en cada paso"""
+
+    def setUp(self):
+        cache.clear()
+        self.ana = Usuario.objects.create_user(username='ana', password='clave-de-prueba', nombre='ana')
+        self.client.force_login(self.ana)
+
+    def _crear(self, leida=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notificacion.objects.create(usuario=self.ana, tipo='seguidor', mensaje='Nuevo seguidor', leida=leida)
+
+    def _post(self, nombre, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(nombre, args=args))
+
+    def assertContadorCorrecto(self, esperado):
+        # Con la clave en la caché la lectura no consulta la base
+        with self.assertNumQueries(0):
+            total = notificaciones.no_leidas(self.ana.id)
+        self.assertEqual(total, esperado)
+        self.assertEqual(total, Notificacion.objects.filter(usuario=self.ana, leida=False).count())
+
+    def test_sin_clave_recalcula_y_la_guarda(self):
+        Notificacion.objects.bulk_create([
+            Notificacion(usuario=self.ana, tipo='seguidor', mensaje='a'),
+            Notificacion(usuario=self.ana, tipo='seguidor', mensaje='b', leida=True),
+        ])
+        with self.assertNumQueries(1):
+            self.assertEqual(notificaciones.no_leidas(self.ana.id), 1)
+        self.assertContadorCorrecto(1)
+
+    def test_crear_marcar_y_eliminar(self):
+        self.assertEqual(notificaciones.no_leidas(self.ana.id), 0)
+        primera = self._crear()
+        segunda = self._crear()
+        leida = self._crear(leida=True)
+        self.assertContadorCorrecto(2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('marcar_notificacion_leida', args=[primera.id]))
+        self.assertContadorCorrecto(1)
+        # Marcarla otra vez no descuenta de nuevo
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('marcar_notificacion_leida', args=[primera.id]))
+        self.assertContadorCorrecto(1)
+
+        # Borrar una leída no cambia el contador; una sin leer lo descuenta
+        self._post('eliminar_notificacion', leida.id)
+        self.assertContadorCorrecto(1)
+        self._post('eliminar_notificacion', segunda.id)
+        self.assertContadorCorrecto(0)
+
+    def test_marcar_todas(self):
+        for _ in range(3):
+            self._crear()
+        notificaciones.no_leidas(self.ana.id)
+        self._post('marcar_todas_leidas')
+        self.assertContadorCorrecto(0)
+
+    def test_una_edicion_invalida_la_clave(self):
+        notificaciones.no_leidas(self.ana.id)
+        notificacion = self._crear()
+        self.assertContadorCorrecto(1)
+        notificacion.leida = True
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacion.save()
+        self.assertEqual(notificaciones.no_leidas(self.ana.id), 0)
+        self.assertContadorCorrecto(0)
+
+    def test_un_rollback_no_toca_el_contador(self):
+        self.assertEqual(notificaciones.no_leidas(self.ana.id), 0)
+        # Sin confirmar la transacción la notificación no cuenta todavía
+        with self.captureOnCommitCallbacks(execute=False):
+            Notificacion.objects.create(usuario=self.ana, tipo='seguidor', mensaje='a')
+        with self.assertNumQueries(0):
+            self.assertEqual(notificaciones.no_leidas(self.ana.id), 0)
+
+    def test_el_badge_usa_el_contador(self):
+        self._crear()
+        self._crear()
+        respuesta = self.client.get(reverse('ver_notificaciones'))
+        self.assertEqual(respuesta.context['no_leidas'], 2)
+        self.assertEqual(respuesta.context['notificaciones_no_leidas'], 2)
@@ -0,0 +1,80 @@
+import datetime
+
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from usuarios.models import Usuario
+
+from biblioteca.models import Libro, Notificacion
+from biblioteca.paginacion import PaginadorCursor, paginar_por_cursor
+
+
+# -------------------------------
+# Paginación por cursor
+# -------------------------------
+class PaginadorCursorTests(TestCase):
+
+    def setUp(self):
+        # Títulos repetidos: el desempate por id tiene que ser estable
+        Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {i % 7}', autor=f'Autor {i}') for i in range(53)
+        ])
+
+    def _recorrer(self, queryset, orden):
+        paginador = PaginadorCursor(queryset, orden, por_pagina=10)
+        paginas = [paginador.get_page()]
+        while paginas[-1].has_next():
+            paginas.append(paginador.get_page(paginas[-1].cursor_siguiente))
+        return paginador, paginas
+
+    def test_adelante_sin_perder_ni_repetir(self):
+        for orden in (['titulo'], ['-titulo'], ['-id']):
+            with self.subTest(orden=orden):
+                _, paginas = self._recorrer(Libro.objects.all(), orden)
+                vistos = [libro.pk for pagina in paginas for libro in pagina]
+                desempate = '-id' if orden[0].startswith('-') else 'id'
+                self.assertEqual(vistos, list(Libro.objects.order_by(*orden, desempate).values_list('pk', flat=True)))
+                self.assertEqual([len(pagina) for pagina in paginas], [10] * 5 + [3])
+                self.assertFalse(paginas[0].has_previous())
+
+    def test_atras_devuelve_la_misma_pagina(self):
+        paginador, paginas = self._recorrer(Libro.objects.all(), ['titulo'])
+        for anterior, pagina in zip(paginas, paginas[1:]):
+            self.assertTrue(pagina.has_previous())
+            atras = paginador.get_page(pagina.cursor_anterior)
+            self.assertEqual([libro.pk for libro in atras], [libro.pk for libro in anterior])
+            self.assertEqual(atras.number, anterior.number)
+            self.assertEqual(atras.has_previous(), anterior.has_previous())
+            self.assertTrue(atras.has_next())
+
+    def test_las_inserciones_no_desplazan_filas(self):
+        paginador, paginas = self._recorrer(Libro.objects.all(), ['-id'])
+        Libro.objects.create(titulo='Nuevo', autor='Autor')
+        segunda = paginador.get_page(paginas[0].cursor_siguiente)
+        self.assertEqual([libro.pk for libro in segunda], [libro.pk for libro in paginas[1]])
+
+    def test_orden_por_fecha(self):
+        usuario = Usuario.objects.create_user(username='ana', password='clave-de-prueba', nombre='ana')
+        base = timezone.now()
+        notificaciones = Notificacion.objects.bulk_create([
+            Notificacion(usuario=usuario, tipo='comentario', mensaje=str(i)) for i in range(25)
+        ])
+        # fecha es auto_now_add: de a tres notificaciones con la misma fecha
+        for i, notificacion in enumerate(notificaciones):
+            Notificacion.objects.filter(pk=notificacion.pk).update(fecha=base - datetime.timedelta(minutes=i // 3))
+        _, paginas = self._recorrer(Notificacion.objects.all(), ['-fecha'])
+        vistos = [notificacion.pk for pagina in paginas for notificacion in pagina]
+        self.assertEqual(vistos, list(Notificacion.objects.order_by('-fecha', '-id').values_list('pk', flat=True)))
+
+    def test_cursor_invalido_vuelve_al_principio(self):
+        paginador, paginas = self._recorrer(Libro.objects.all(), ['titulo'])
+        pagina = paginador.get_page('no-es-un-cursor')
+        self.assertEqual(pagina.number, 1)
+        self.assertEqual([libro.pk for libro in pagina], [libro.pk for libro in paginas[0]])
+
+    def test_urls(self):
+        request = RequestFactory().get('/biblioteca/libros/', {'genero': 'terror'})
+        pagina = paginar_por_cursor(request, Libro.objects.all(), ['id'], 10)
+        self.assertIsNone(pagina.url_anterior)
+        self.assertIn('genero=terror', pagina.url_siguiente)
+        self.assertIn('cursor=', pagina.url_siguiente)
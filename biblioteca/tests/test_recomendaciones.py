@@ -0,0 +1,48 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from usuarios.models import Usuario
+
+from biblioteca import visitas
+from biblioteca.models import Historial, HistorialDiario, Libro, Reseña
+
+
+# -------------------------------
+# Recomendaciones personalizadas
+# -------------------------------
+class RecomendacionesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(visitas._cola.clear)
+        self.ana = Usuario.objects.create_user(username='ana', password='clave-de-prueba', nombre='ana')
+        self.reseñado = Libro.objects.create(titulo='Drácula', autor='Bram Stoker', genero='terror')
+        Reseña.objects.create(usuario=self.ana, libro=self.reseñado, comentario='Excelente', calificacion=5)
+        self.client.force_login(self.ana)
+
+    def _recomendados(self):
+        respuesta = self.client.get(reverse('recomendaciones'))
+        return {libro.id for libro in respuesta.context['libros_recomendados']}
+
+    def test_excluye_los_libros_ya_vistos(self):
+        en_historial = Libro.objects.create(titulo='It', autor='Stephen King', genero='terror')
+        compactado = Libro.objects.create(titulo='Carrie', autor='Stephen King', genero='terror')
+        en_buffer = Libro.objects.create(titulo='Frankenstein', autor='Mary Shelley', genero='terror')
+        nuevo = Libro.objects.create(titulo='El resplandor', autor='Stephen King', genero='terror')
+        Libro.objects.create(titulo='Emma', autor='Jane Austen', genero='romance')
+
+        Historial.objects.create(usuario=self.ana, libro=en_historial)
+        HistorialDiario.objects.create(usuario=self.ana, libro=compactado, dia=datetime.date(2025, 1, 1), visitas=3)
+        visitas.registrar(self.ana.id, en_buffer.id)
+
+        self.assertEqual(self._recomendados(), {self.reseñado.id, nuevo.id})
+
+    def test_lo_que_vio_otro_usuario_no_cuenta(self):
+        beto = Usuario.objects.create_user(username='beto', password='clave-de-prueba', nombre='beto')
+        libro = Libro.objects.create(titulo='It', autor='Stephen King', genero='terror')
+        Historial.objects.create(usuario=beto, libro=libro)
+        HistorialDiario.objects.create(usuario=beto, libro=libro, dia=datetime.date(2025, 1, 1), visitas=1)
+        self.assertIn(libro.id, self._recomendados())
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from biblioteca.busqueda import buscar_libros_aproximado
+from biblioteca.models import Libro
+from biblioteca.texto import normalizar
+from biblioteca.trigramas import indice, trigramas
+
+
+class NormalizacionTests(TestCase):
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar('Fiódor  Dostoyevski'), 'fiodor dostoyevski')
+        self.assertEqual(normalizar('¡Sábato, Ernesto!'), 'sabato ernesto')
+        self.assertEqual(normalizar(None), '')
+
+    def test_clave_busqueda(self):
+        libro = Libro.objects.create(titulo='Cien años de soledad', autor='Gabriel García Márquez')
+        self.assertEqual(libro.clave_busqueda, 'cien anos de soledad gabriel garcia marquez')
+
+    def test_trigramas_con_relleno(self):
+        self.assertEqual(trigramas('Sol'), {'  s', ' so', 'sol', 'ol '})
+
+
+# -------------------------------
+# Índice de trigramas y ranking por similitud
+# -------------------------------
+class IndiceTrigramasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dostoyevski = Libro.objects.create(titulo='Crimen y castigo', autor='Fiódor Dostoyevski')
+        self.dostoievski = Libro.objects.create(titulo='El jugador', autor='Dostoievski')
+        self.tolstoi = Libro.objects.create(titulo='Guerra y paz', autor='León Tolstói')
+        # Los receivers actualizan el índice al confirmar; aquí no hay COMMIT
+        indice.construir()
+
+    def test_tolerante_a_erratas_y_tildes(self):
+        ids = [libro_id for libro_id, _ in indice.buscar('dostoyevsky')]
+        self.assertEqual(ids[0], self.dostoyevski.id)
+        self.assertIn(self.dostoievski.id, ids)
+        self.assertNotIn(self.tolstoi.id, ids)
+        self.assertEqual([libro_id for libro_id, _ in indice.buscar('leon tolstoi')], [self.tolstoi.id])
+
+    def test_ordena_por_similitud(self):
+        resultados = indice.buscar('dostoievski')
+        self.assertEqual([libro_id for libro_id, _ in resultados], [self.dostoievski.id, self.dostoyevski.id])
+        self.assertEqual(resultados[0][1], 1.0)
+        self.assertLess(resultados[1][1], 1.0)
+
+    def test_umbral(self):
+        self.assertEqual(indice.buscar('zzzz'), [])
+        self.assertEqual(indice.buscar('dostoievski', umbral=1.0), [(self.dostoievski.id, 1.0)])
+
+    def test_actualizar_y_eliminar(self):
+        self.tolstoi.titulo = 'Ana Karénina'
+        self.tolstoi.save()
+        indice.actualizar(self.tolstoi)
+        self.assertEqual([libro_id for libro_id, _ in indice.buscar('karenina')], [self.tolstoi.id])
+        indice.eliminar(self.tolstoi.id)
+        self.assertEqual(indice.buscar('karenina'), [])
+
+    def test_busqueda_aproximada(self):
+        resultados = buscar_libros_aproximado(Libro.objects.all(), 'dostoievski').order_by('-relevancia', 'id')
+        self.assertEqual([libro.id for libro in resultados], [self.dostoievski.id, self.dostoyevski.id])
+
+    def test_la_vista_usa_la_busqueda_aproximada_sin_coincidencias_exactas(self):
+        respuesta = self.client.get(reverse('buscar_libros'), {'q': 'tolstoy'})
+        self.assertTrue(respuesta.context['busqueda_aproximada'])
+        self.assertEqual([libro.id for libro in respuesta.context['resultados']], [self.tolstoi.id])
@@ -0,0 +1,66 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from usuarios.models import Usuario
+
+from biblioteca import utilidad
+from biblioteca.models import Libro, Reseña, ValoracionReseña
+
+
+HOY = datetime.datetime(2026, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def _dias(dias):
+    return HOY + datetime.timedelta(days=dias)
+
+
+# -------------------------------
+# Puntaje de "Más útiles"
+# -------------------------------
+class PuntajeTests(TestCase):
+
+    def test_una_reseña_muy_valorada_no_la_pasa_una_sin_valorar_de_pocos_meses_despues(self):
+        valorada = utilidad.puntaje(5 * 100, 100, HOY)
+        for dias in (21, 90, 180):
+            with self.subTest(dias=dias):
+                self.assertGreater(valorada, utilidad.puntaje(0, 0, _dias(dias)))
+
+    def test_la_antigüedad_sigue_contando(self):
+        self.assertLess(utilidad.puntaje(5 * 100, 100, HOY), utilidad.puntaje(0, 0, _dias(400)))
+
+    def test_a_igual_fecha_ordena_la_calidad(self):
+        # Una sola valoración de 5★ no supera a veinte de 4★
+        self.assertLess(utilidad.puntaje(5, 1, HOY), utilidad.puntaje(4 * 20, 20, HOY))
+        self.assertLess(utilidad.puntaje(1 * 30, 30, HOY), utilidad.puntaje(0, 0, HOY))
+
+    def test_no_depende_del_momento_de_la_consulta(self):
+        self.assertEqual(utilidad.puntaje(12, 3, HOY), utilidad.puntaje(12, 3, HOY.replace(tzinfo=None)))
+
+
+class OrdenUtilidadTests(TestCase):
+    """El índice resena_libro_utilidad_idx devuelve el orden de arriba"""
+
+    def test_orden_de_mas_utiles(self):
+        autor = Usuario.objects.create_user(username='autor', password='clave-de-prueba', nombre='autor')
+        votantes = [
+            Usuario.objects.create_user(username=f'v{i}', password='clave-de-prueba', nombre=f'v{i}')
+            for i in range(12)
+        ]
+        libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+
+        def reseña(fecha, puntuaciones):
+            nueva = Reseña.objects.create(usuario=autor, libro=libro, comentario='...', calificacion=4)
+            Reseña.objects.filter(pk=nueva.pk).update(fecha=fecha)
+            for votante, puntuacion in zip(votantes, puntuaciones):
+                ValoracionReseña.objects.create(usuario=votante, reseña=nueva, puntuacion=puntuacion)
+            return nueva.pk
+
+        ahora = timezone.now()
+        muy_valorada = reseña(ahora - datetime.timedelta(days=60), [5] * 12)
+        sin_valorar = reseña(ahora, [])
+        mal_valorada = reseña(ahora - datetime.timedelta(days=1), [1] * 12)
+
+        orden = list(Reseña.objects.filter(libro=libro).order_by('-utilidad', '-id').values_list('pk', flat=True))
+        self.assertEqual(orden, [muy_valorada, sin_valorar, mal_valorada])
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+
+from usuarios.models import Usuario
+
+from biblioteca import visitas
+from biblioteca.models import ActividadLibro, EstadisticasLibro, Historial, Libro
+
+
+# -------------------------------
+# Buffer de visitas
+# -------------------------------
+class BufferVisitasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        visitas._cola.clear()
+        self.ana = Usuario.objects.create_user(username='ana', password='clave-de-prueba', nombre='ana')
+        self.libro = Libro.objects.create(titulo='Rayuela', autor='Julio Cortázar')
+        self.otro = Libro.objects.create(titulo='Ficciones', autor='Jorge Luis Borges')
+
+    def tearDown(self):
+        visitas._cola.clear()
+
+    def test_deduplica_dentro_de_la_ventana(self):
+        self.assertTrue(visitas.registrar(self.ana.id, self.libro.id))
+        self.assertFalse(visitas.registrar(self.ana.id, self.libro.id))
+        self.assertTrue(visitas.registrar(self.ana.id, self.otro.id))
+        self.assertEqual(visitas.pendientes(), 2)
+        self.assertFalse(Historial.objects.exists())
+
+        # Pasada la ventana (la clave expiró) la visita vuelve a contar
+        cache.delete(visitas._clave_reciente(self.ana.id, self.libro.id))
+        self.assertTrue(visitas.registrar(self.ana.id, self.libro.id))
+
+    def test_vaciar_inserta_y_ajusta_contadores(self):
+        visitas.registrar(self.ana.id, self.libro.id)
+        visitas.registrar(self.ana.id, self.otro.id)
+        self.assertEqual(visitas.vaciar(), 2)
+        self.assertEqual(visitas.pendientes(), 0)
+        self.assertEqual(visitas.vaciar(), 0)
+
+        self.assertEqual(Historial.objects.filter(usuario=self.ana).count(), 2)
+        self.assertEqual(EstadisticasLibro.objects.get(libro=self.libro).total_visitas, 1)
+        self.assertEqual(ActividadLibro.objects.get(libro=self.libro).visitas, 1)
+
+    def test_vacia_al_llenar_el_lote(self):
+        libros = [Libro.objects.create(titulo=f'Libro {i}', autor='Autor') for i in range(3)]
+        with mock.patch.object(visitas, 'LOTE_VACIADO', 3):
+            visitas.registrar(self.ana.id, libros[0].id)
+            visitas.registrar(self.ana.id, libros[1].id)
+            self.assertFalse(Historial.objects.exists())
+            visitas.registrar(self.ana.id, libros[2].id)
+        self.assertEqual(Historial.objects.count(), 3)
+        self.assertEqual(visitas.pendientes(), 0)
+
+    def test_vacia_cuando_la_mas_vieja_vence(self):
+        visitas.registrar(self.ana.id, self.libro.id)
+        visitas._cola[0] = (self.ana.id, self.libro.id, visitas._cola[0][2] - visitas.INTERVALO_VACIADO)
+        visitas.registrar(self.ana.id, self.otro.id)
+        self.assertEqual(Historial.objects.count(), 2)
+
+    def test_salta_libros_borrados(self):
+        visitas.registrar(self.ana.id, self.libro.id)
+        visitas.registrar(self.ana.id, self.otro.id)
+        self.otro.delete()
+        self.assertEqual(visitas.vaciar(), 1)
+
+    def test_un_vaciado_fallido_no_pierde_visitas(self):
+        visitas.registrar(self.ana.id, self.libro.id)
+        with mock.patch.object(visitas, '_insertar', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                visitas.vaciar()
+        self.assertEqual(visitas.pendientes(), 1)
+        self.assertEqual(visitas.vaciar(), 1)
+
+    def test_con_la_cola_llena_no_queda_deduplicada(self):
+        with mock.patch.object(visitas, 'MAX_PENDIENTES', 0), self.assertLogs(visitas.logger, 'WARNING'):
+            self.assertFalse(visitas.registrar(self.ana.id, self.libro.id))
+        self.assertIsNone(cache.get(visitas._clave_reciente(self.ana.id, self.libro.id)))
+        self.assertTrue(visitas.registrar(self.ana.id, self.libro.id))
+
+    def test_la_vista_de_detalle_registra_la_visita(self):
+        self.client.force_login(self.ana)
+        url = reverse('detalle_libro', args=[self.libro.id])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(visitas.pendientes(), 1)
+        visitas.vaciar()
+        self.assertEqual(list(Historial.objects.values_list('libro_id', flat=True)), [self.libro.id])
@@ -0,0 +1,18 @@
+"""
+Normalización de texto para búsqueda: minúsculas, sin tildes ni signos.
+"Fiódor Dostoyevski" -> "fiodor dostoyevski", "Sábato" -> "sabato".
+"""
+import re
+import unicodedata
+
+
+_NO_ALFANUMERICO = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def normalizar(texto):
+    """Pasa a minúsculas, quita diacríticos y colapsa todo lo no alfanumérico a un espacio"""
+    if not texto:
+        return ''
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(' ', sin_tildes).strip()
@@ -0,0 +1,157 @@
+"""
+Búsqueda aproximada (tolerante a erratas) con un índice de trigramas en memoria.
+
+Cada libro aporta los trigramas de su `clave_busqueda` (título + autor
+normalizados, ver biblioteca.texto). La similitud con la consulta es la
+fracción de trigramas de la consulta presentes en el libro, como
+word_similarity de pg_trgm: "dostoievski" sigue encontrando "Dostoyevski".
+
+Para no recorrer todo el catálogo se usa filtrado por prefijo: un libro con al
+menos T trigramas en común con la consulta (de n) aparece forzosamente en
+alguna de las n - T + 1 listas más cortas, así que solo esas se recorren y los
+candidatos se verifican contra su clave.
+
+Igual que autocompletar.py, se construye en el primer uso, se actualiza desde
+los signals de Libro y se reconstruye si la versión 'trigramas' de la caché
+compartida cambió en otro proceso.
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+from collections import Counter
+
+from . import cache as cache_versionada
+from .models import Libro
+from .texto import normalizar
+
+
+INTERVALO_VERIFICACION = 30
+
+# Fracción mínima de trigramas de la consulta que debe tener un resultado
+UMBRAL_SIMILITUD = 0.5
+
+# Candidatos verificados como máximo por consulta
+MAX_CANDIDATOS = 5000
+
+
+def _relleno(clave):
+    """'cien anos' -> '  cien   anos ': un trigrama de consulta está en el libro
+    si y solo si es subcadena de este texto (verificación sin recalcular trigramas)"""
+    return ''.join(f'  {palabra} ' for palabra in clave.split())
+
+
+def _trigramas_normalizados(clave):
+    resultado = set()
+    for palabra in clave.split():
+        relleno = f'  {palabra} '
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return resultado
+
+
+def trigramas(texto):
+    """Trigramas de cada palabra con relleno, como pg_trgm: 'sol' -> {'  s', ' so', 'sol', 'ol '}"""
+    return _trigramas_normalizados(normalizar(texto))
+
+
+class IndiceTrigramas:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._listas = {}        # trigrama -> array('q') de ids
+        self._textos = {}        # libro_id -> _relleno(clave_busqueda)
+        self._version = None
+        self._verificado = 0.0
+
+    # -------------------------------
+    # Construcción y mantenimiento
+    # -------------------------------
+    def construir(self):
+        version = cache_versionada.version('trigramas')
+        listas = {}
+        textos = {}
+        filas = Libro.objects.order_by('id').values_list('id', 'clave_busqueda').iterator(chunk_size=5000)
+        for libro_id, clave in filas:
+            textos[libro_id] = _relleno(clave)
+            for trigrama in _trigramas_normalizados(clave):
+                lista = listas.get(trigrama)
+                if lista is None:
+                    lista = listas[trigrama] = array('q')
+                lista.append(libro_id)
+        with self._lock:
+            self._listas = listas
+            self._textos = textos
+            self._version = version
+            self._verificado = time.monotonic()
+
+    def _asegurar_vigente(self):
+        ahora = time.monotonic()
+        if self._version is not None and ahora - self._verificado < INTERVALO_VERIFICACION:
+            return
+        with self._lock:
+            if self._version is not None and cache_versionada.version('trigramas') == self._version:
+                self._verificado = ahora
+                return
+            self.construir()
+
+    def _quitar(self, libro_id):
+        texto = self._textos.pop(libro_id, None)
+        if texto is None:
+            return
+        for trigrama in _trigramas_normalizados(texto):
+            try:
+                self._listas[trigrama].remove(libro_id)
+            except (KeyError, ValueError):
+                pass
+
+    def actualizar(self, libro):
+        """Inserta o reemplaza un libro (post_save de Libro)"""
+        with self._lock:
+            if self._version is None:
+                return
+            self._quitar(libro.id)
+            self._textos[libro.id] = _relleno(libro.clave_busqueda)
+            for trigrama in _trigramas_normalizados(libro.clave_busqueda):
+                self._listas.setdefault(trigrama, array('q')).append(libro.id)
+            self._version = cache_versionada.version('trigramas')
+
+    def eliminar(self, libro_id):
+        """Quita un libro (post_delete de Libro)"""
+        with self._lock:
+            if self._version is None:
+                return
+            self._quitar(libro_id)
+            self._version = cache_versionada.version('trigramas')
+
+    # -------------------------------
+    # Consulta
+    # -------------------------------
+    def buscar(self, query, limite=200, umbral=UMBRAL_SIMILITUD):
+        """[(libro_id, similitud)] ordenado de mayor a menor similitud"""
+        consulta = trigramas(query)
+        if not consulta:
+            return []
+        self._asegurar_vigente()
+
+        minimo = max(1, math.ceil(umbral * len(consulta)))
+        with self._lock:
+            # Filtrado por prefijo: solo las n - T + 1 listas más cortas generan candidatos
+            ordenados = sorted(consulta, key=lambda t: len(self._listas.get(t, ())))
+            generadores = ordenados[:len(consulta) - minimo + 1]
+            conteo = Counter()
+            for trigrama in generadores:
+                conteo.update(self._listas.get(trigrama, ()))
+
+            candidatos = conteo.most_common(MAX_CANDIDATOS) if len(conteo) > MAX_CANDIDATOS else conteo.items()
+            resultados = []
+            for libro_id, _ in candidatos:
+                texto = self._textos[libro_id]
+                comunes = sum(1 for trigrama in consulta if trigrama in texto)
+                if comunes >= minimo:
+                    resultados.append((libro_id, comunes / len(consulta)))
+
+        return heapq.nlargest(limite, resultados, key=lambda par: (par[1], -par[0]))
+
+
+indice = IndiceTrigramas()
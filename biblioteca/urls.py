@@ -2,8 +2,11 @@ from django.urls import path
 from .views import (
     home,
     buscar_libros,
+    autocompletar,
     lista_libros,
     detalle_libro,
+    reseñas_libro,
+    comentarios_reseña,
     crear_libro,
     editar_libro,
     eliminar_libro,
@@ -11,12 +14,17 @@ from .views import (
     detalle_lista,
     editar_lista,
     eliminar_lista,
+    selector_libros,
+    libros_lista,
+    mover_libro_lista,
     crear_reseña,
     editar_reseña,
     eliminar_reseña,
     agregar_favorito,
     quitar_favorito,
     ver_historial,
+    exportar_datos,
+    importar_datos,
     crear_categoria,
     crear_comentario,
     editar_comentario,
@@ -40,6 +48,7 @@ urlpatterns = [
     # Home y búsqueda
     path('', home, name='homeGeneral'),
     path('buscar/', buscar_libros, name='buscar_libros'),
+    path('buscar/autocompletar/', autocompletar, name='autocompletar'),
     path('libros/', lista_libros, name='lista_libros'),
     path('libro/<int:libro_id>/', detalle_libro, name='detalle_libro'),
 
@@ -53,14 +62,19 @@ urlpatterns = [
     path('lista/<int:lista_id>/', detalle_lista, name='detalle_lista'),
     path('lista/<int:lista_id>/editar/', editar_lista, name='editar_lista'),
     path('lista/<int:lista_id>/eliminar/', eliminar_lista, name='eliminar_lista'),
+    path('lista/<int:lista_id>/libros/', libros_lista, name='libros_lista'),
+    path('lista/<int:lista_id>/mover/', mover_libro_lista, name='mover_libro_lista'),
+    path('lista/selector/', selector_libros, name='selector_libros'),
 
     # Reseñas
     path('libro/<int:libro_id>/reseña/', crear_reseña, name='crear_reseña'),
+    path('libro/<int:libro_id>/reseñas/', reseñas_libro, name='reseñas_libro'),
     path('reseña/<int:reseña_id>/editar/', editar_reseña, name='editar_reseña'),
     path('reseña/<int:reseña_id>/eliminar/', eliminar_reseña, name='eliminar_reseña'),
 
     # Comentarios (H6, H7, H8)
     path('reseña/<int:reseña_id>/comentario/', crear_comentario, name='crear_comentario'),
+    path('reseña/<int:reseña_id>/comentarios/', comentarios_reseña, name='comentarios_reseña'),
     path('comentario/<int:comentario_id>/editar/', editar_comentario, name='editar_comentario'),
     path('comentario/<int:comentario_id>/eliminar/', eliminar_comentario, name='eliminar_comentario'),
 
@@ -80,6 +94,10 @@ urlpatterns = [
     # Historial
     path('historial/', ver_historial, name='ver_historial'),
 
+    # Exportación e importación de listas, favoritos e historial
+    path('datos/exportar/', exportar_datos, name='exportar_datos'),
+    path('datos/importar/', importar_datos, name='importar_datos'),
+
     # Categorías (solo admin/superuser)
     path('categoria/crear/', crear_categoria, name='crear_categoria'),
 
@@ -0,0 +1,47 @@
+"""
+Puntaje de utilidad de una reseña (H9: "identificar las reseñas más útiles").
+
+La calidad es el promedio bayesiano de sus valoraciones: con pocas valoraciones
+se acerca a PRIOR_MEDIA, así una sola valoración de 5★ no supera a veinte de 4★.
+
+La antigüedad resta con vida media VIDA_MEDIA, larga a propósito: entre la
+mejor calidad posible (log2 5 ≈ 2,3) y una reseña sin valoraciones (log2 3 ≈
+1,6) hay unos 0,7 de puntaje, así que con un año de vida media una reseña
+sin valorar tiene que ser unos ocho meses más nueva para pasar a una de 5★
+muy valorada. Con una vida media corta "Más útiles" sería casi "Más recientes".
+
+Ordenar por calidad · 2^(-edad / VIDA_MEDIA) equivale a ordenar por
+log2(calidad) + segundos_desde_EPOCA / VIDA_MEDIA, que no depende del momento
+de la consulta. Por eso el puntaje se guarda en Reseña.utilidad (indexado) y
+solo cambia cuando cambian sus valoraciones, nunca por el paso del tiempo.
+"""
+import datetime
+import math
+
+from django.utils import timezone
+
+
+# Promedio y peso (en valoraciones) que se suponen antes de tener datos
+PRIOR_MEDIA = 3.0
+PRIOR_PESO = 5
+
+# Una reseña pierde la mitad de su peso cada VIDA_MEDIA (cambiarla exige recalcular_utilidad)
+VIDA_MEDIA = datetime.timedelta(days=365)
+
+# Origen fijo de la escala de tiempo (cambiarlo exige recalcular_utilidad)
+EPOCA = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def calidad(suma, total):
+    """Promedio bayesiano de las puntuaciones (1 a 5)"""
+    return (PRIOR_PESO * PRIOR_MEDIA + suma) / (PRIOR_PESO + total)
+
+
+def puntaje(suma, total, fecha):
+    """Valor de Reseña.utilidad; mayor es más útil"""
+    if fecha is None:
+        fecha = timezone.now()
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha, datetime.timezone.utc)
+    antiguedad = (fecha - EPOCA) / VIDA_MEDIA
+    return math.log2(calidad(suma, total)) + antiguedad
@@ -1,15 +1,32 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q, Avg, Count
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.views.decorators.cache import never_cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from collections import Counter
-
-from .forms import ListaForm, ReseñaForm, LibroForm, CategoriaForm, ComentarioForm
-from .models import Libro, Reseña, Favorito, Historial, Lista, Comentario, ValoracionReseña, Notificacion, Seguimiento
+import re
+
+from .autocompletar import indice as indice_autocompletar
+from .busqueda import buscar_libros_aproximado, buscar_libros_texto
+from .cache import cache_anonimo
+from .facetas import calcular_facetas
+from .forms import ListaForm, ReseñaForm, LibroForm, CategoriaForm, ComentarioForm, ImportacionForm
+from .fragmentos import cache_personalizado
+from .hilos import cargar_mas_comentarios, cargar_reseñas
+from .listas import aplicar_cambios, ids_en_lista, leer_ids, mover, mover_al_final
+from .models import (
+    Libro, Reseña, Favorito, Historial, HistorialDiario, Lista, Comentario, ValoracionReseña, Notificacion, Seguimiento,
+)
+from .paginacion import PaginaCursor, PaginadorCursor, paginar_por_cursor
+from . import resultados as cache_resultados
+from . import exportacion, recientes, tendencias, visitas
+from . import notificaciones as contador_notificaciones
 from usuarios.models import Usuario
 
 
@@ -73,8 +90,12 @@ def eliminar_libro(request, libro_id):
 # -------------------------------
 # Home y búsqueda
 # -------------------------------
+@cache_anonimo('libros')
+@cache_personalizado('libros')
 def home(request):
-    libros_destacados = Libro.objects.all()[:3]
+    # Destacados: ranking de tendencias precalculado (tendencias.py); mientras
+    # no exista, los mejor valorados por libro_valoracion_idx
+    libros_destacados = tendencias.libros(limite=3) or Libro.objects.order_by('-promedio', '-total_reseñas', '-id')[:3]
     libros_recientes = Libro.objects.order_by('-id')[:6]
 
     categorias = [
@@ -94,65 +115,42 @@ def home(request):
     })
 
 
+# Criterios de orden de buscar_libros; los valores se usan como claves del cursor
+ORDENES_BUSQUEDA = {
+    'relevancia': ['-relevancia', '-id'],
+    'reciente': ['-id'],
+    'antiguo': ['id'],
+    'titulo_az': ['titulo', 'id'],
+    'titulo_za': ['-titulo', '-id'],
+    'autor': ['autor', 'id'],
+    # Mejor valoración primero (los sin valoración al final), usa libro_valoracion_idx
+    'valoracion': ['-promedio', '-total_reseñas', '-id'],
+}
+
+
+@cache_anonimo('libros')
+@cache_personalizado('libros')
 def buscar_libros(request):
     """
     H12: Como usuario, quiero filtrar los resultados de búsqueda,
     para encontrar rápidamente los libros mejor valorados o más recientes.
     """
     query = request.GET.get('q', '')
-    orden = request.GET.get('orden', 'reciente')
+    # Con texto de búsqueda el orden por defecto es la relevancia del índice
+    orden = request.GET.get('orden', 'relevancia' if query else 'reciente')
     valoracion_min = request.GET.get('valoracion', '')
     genero = request.GET.get('genero', '')
+    if orden not in ORDENES_BUSQUEDA or (orden == 'relevancia' and not query):
+        orden = 'reciente'
     
-    # Anotar libros con promedio de calificación y conteo de reseñas
-    resultados = Libro.objects.annotate(
-        promedio_calificacion_db=Avg('reseñas__calificacion'),
-        total_reseñas_db=Count('reseñas')
+    # Ids de la página, facetas y total salen de la caché de resultados (resultados.py)
+    datos = cache_resultados.obtener(
+        'buscar',
+        cache_resultados.parametros(request, q=query, orden=orden, valoracion=valoracion_min, genero=genero),
+        lambda: _calcular_busqueda(request, query, orden, valoracion_min, genero),
     )
-
-    # Filtro por búsqueda de texto
-    if query:
-        resultados = resultados.filter(
-            Q(titulo__icontains=query) |
-            Q(autor__icontains=query) |
-            Q(genero__icontains=query)
-        )
-    
-    # Filtro por género
-    if genero:
-        resultados = resultados.filter(genero=genero)
+    page_obj = PaginaCursor.desde_estado(datos['pagina'], cache_resultados.hidratar(datos['ids']), request)
     
-    # Filtro por valoración mínima
-    if valoracion_min:
-        try:
-            val_min = int(valoracion_min)
-            resultados = resultados.filter(promedio_calificacion_db__gte=val_min)
-        except ValueError:
-            pass
-    
-    # Ordenamiento
-    if orden == 'reciente':
-        resultados = resultados.order_by('-id')
-    elif orden == 'antiguo':
-        resultados = resultados.order_by('id')
-    elif orden == 'titulo_az':
-        resultados = resultados.order_by('titulo')
-    elif orden == 'titulo_za':
-        resultados = resultados.order_by('-titulo')
-    elif orden == 'autor':
-        resultados = resultados.order_by('autor')
-    elif orden == 'valoracion':
-        # Ordenar por mejor valoración (los sin valoración al final)
-        resultados = resultados.order_by('-promedio_calificacion_db', '-total_reseñas_db')
-    
-    # Paginación: 20 libros por página
-    paginator = Paginator(resultados, 20)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
-    
-    # Obtener géneros disponibles para el filtro
-    generos_disponibles = Libro.objects.values_list('genero', flat=True).distinct().order_by('genero')
-
     return render(request, 'biblioteca/libros/buscar_libros.html', {
         'resultados': page_obj,
         'page_obj': page_obj,
@@ -160,17 +158,84 @@ def buscar_libros(request):
         'orden': orden,
         'valoracion_min': valoracion_min,
         'genero': genero,
-        'generos_disponibles': generos_disponibles,
+        'facetas': datos['facetas'],
+        'busqueda_aproximada': datos['busqueda_aproximada'],
+        # Página de un género: sus libros en tendencia, ya precalculados
+        'tendencias_genero': tendencias.libros(genero, 6) if genero and not query and not page_obj.has_previous() else [],
     })
 
 
-def lista_libros(request):
-    libros = Libro.objects.all().order_by('-id')
+def _calcular_busqueda(request, query, orden, valoracion_min, genero):
+    """Ejecuta la búsqueda de buscar_libros; solo se llama si no está en caché"""
+    # Promedio y total de reseñas son columnas desnormalizadas de Libro
+    resultados = Libro.objects.all()
+
+    # Filtro por búsqueda de texto (índice FULLTEXT / FTS5, ver busqueda.py)
+    if query:
+        resultados = buscar_libros_texto(resultados, query)
+    
+    # Facetas con conteos sobre la búsqueda, antes de los filtros de faceta
+    try:
+        val_min = int(valoracion_min) if valoracion_min else None
+    except ValueError:
+        val_min = None
+    facetas = calcular_facetas(resultados, genero, val_min)
+    
+    # Sin coincidencias exactas: búsqueda aproximada (erratas) por trigramas
+    busqueda_aproximada = False
+    if query and not facetas['total']:
+        resultados = buscar_libros_aproximado(Libro.objects.all(), query)
+        facetas = calcular_facetas(resultados, genero, val_min)
+        busqueda_aproximada = bool(facetas['total'])
+    
+    # Filtro por género
+    if genero:
+        resultados = resultados.filter(genero=genero)
     
-    # Paginación: 20 libros por página
-    paginator = Paginator(libros, 20)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Filtro por valoración mínima
+    if val_min is not None:
+        resultados = resultados.filter(promedio__gte=val_min)
+    
+    # Paginación por cursor: 20 libros por página, sin OFFSET ni COUNT(*).
+    # Cada criterio termina en 'id' como desempate del cursor
+    page_obj = paginar_por_cursor(request, resultados, ORDENES_BUSQUEDA[orden], 20, dependencias=['libros'])
+    
+    return {
+        'ids': [libro.id for libro in page_obj],
+        'pagina': page_obj.estado(),
+        'facetas': facetas,
+        'busqueda_aproximada': busqueda_aproximada,
+        'provisional': not page_obj.total.exacto,
+    }
+
+
+def autocompletar(request):
+    """Sugerencias para la caja de búsqueda (JSON), servidas desde el índice en memoria"""
+    query = request.GET.get('q', '')
+    try:
+        limite = min(max(int(request.GET.get('limite', 8)), 1), 20)
+    except ValueError:
+        limite = 8
+
+    resultados = [
+        {
+            'id': libro['id'],
+            'titulo': libro['titulo'],
+            'autor': libro['autor'],
+            'url': reverse('detalle_libro', args=[libro['id']]),
+        }
+        for libro in indice_autocompletar.buscar(query, limite)
+    ]
+    return JsonResponse({'resultados': resultados})
+
+
+@cache_anonimo('libros')
+@cache_personalizado('libros')
+def lista_libros(request):
+    datos = cache_resultados.obtener(
+        'lista', cache_resultados.parametros(request), lambda: _calcular_lista(request),
+    )
+    page_obj = PaginaCursor.desde_estado(datos['pagina'], cache_resultados.hidratar(datos['ids']), request)
     
     return render(request, 'biblioteca/libros/lista_libros.html', {
         'libros': page_obj,
@@ -178,6 +243,16 @@ def lista_libros(request):
     })
 
 
+def _calcular_lista(request):
+    # Paginación por cursor: 20 libros por página
+    page_obj = paginar_por_cursor(request, Libro.objects.all(), ['-id'], 20, dependencias=['libros'])
+    return {
+        'ids': [libro.id for libro in page_obj],
+        'pagina': page_obj.estado(),
+        'provisional': not page_obj.total.exacto,
+    }
+
+
 # -------------------------------
 # Listas de usuario
 # -------------------------------
@@ -186,10 +261,11 @@ def crear_lista(request):
     if request.method == 'POST':
         form = ListaForm(request.POST)
         if form.is_valid():
-            lista = form.save(commit=False)
-            lista.usuario = request.user
-            lista.save()
-            form.save_m2m()
+            with transaction.atomic():
+                lista = form.save(commit=False)
+                lista.usuario = request.user
+                lista.save()
+                aplicar_cambios(lista, form.cleaned_data['agregar'])
             return redirect('perfil')
     else:
         form = ListaForm()
@@ -199,7 +275,46 @@ def crear_lista(request):
 @login_required
 def detalle_lista(request, lista_id):
     lista = get_object_or_404(Lista, id=lista_id, usuario=request.user)
-    return render(request, 'biblioteca/listas/detalle_lista.html', {'lista': lista})
+    # Paginación por cursor en el orden de la lista: 24 libros por página (lista_libro_posicion_idx)
+    page_obj = paginar_por_cursor(request, lista.entradas.select_related('libro'), ['posicion', 'id'], 24)
+    entradas = list(page_obj)
+    # Destinos de "subir" / "bajar" dentro de la página: el libro detrás del cual queda
+    for indice, entrada in enumerate(entradas):
+        entrada.subir_despues_de = entrada.bajar_despues_de = None
+        if indice >= 2:
+            entrada.subir_despues_de = entradas[indice - 2].libro_id
+        elif indice == 1 and not page_obj.has_previous():
+            entrada.subir_despues_de = ''
+        if indice + 1 < len(entradas):
+            entrada.bajar_despues_de = entradas[indice + 1].libro_id
+    return render(request, 'biblioteca/listas/detalle_lista.html', {
+        'lista': lista,
+        'entradas': entradas,
+        'page_obj': page_obj,
+    })
+
+
+@login_required
+def mover_libro_lista(request, lista_id):
+    """
+    Cambia la posición de un libro de la lista (POST): detrás del libro
+    `despues_de`, al principio si viene vacío o al final con `al_final`.
+    """
+    lista = get_object_or_404(Lista, id=lista_id, usuario=request.user)
+    if request.method == 'POST':
+        libro_id = request.POST.get('libro', '')
+        despues_de = request.POST.get('despues_de', '')
+        if not libro_id.isdigit() or (despues_de and not despues_de.isdigit()):
+            movido = False
+        elif request.POST.get('al_final'):
+            movido = mover_al_final(lista, int(libro_id))
+        else:
+            movido = mover(lista, int(libro_id), int(despues_de) if despues_de else None)
+        if not movido:
+            messages.error(request, "No se pudo mover el libro.")
+    url = reverse('detalle_lista', args=[lista.id])
+    cursor = request.POST.get('cursor')
+    return redirect(f"{url}?{urlencode({'cursor': cursor})}" if cursor else url)
 
 
 @login_required
@@ -208,12 +323,74 @@ def editar_lista(request, lista_id):
     if request.method == 'POST':
         form = ListaForm(request.POST, instance=lista)
         if form.is_valid():
-            form.save()
+            # Nombre, descripción y la diferencia de libros, todo o nada
+            with transaction.atomic():
+                form.save()
+                aplicar_cambios(lista, form.cleaned_data['agregar'], form.cleaned_data['quitar'])
             messages.success(request, "La lista se actualizó correctamente.")
             return redirect('perfil')
     else:
         form = ListaForm(instance=lista)
-    return render(request, 'biblioteca/listas/editar_lista.html', {'form': form, 'lista': lista})
+    # Solo el total y una vista previa; el selector pide los libros por páginas
+    return render(request, 'biblioteca/listas/editar_lista.html', {
+        'form': form,
+        'lista': lista,
+        'total_libros': lista.total_libros,
+        'vista_previa': [entrada.libro for entrada in lista.entradas.select_related('libro').order_by('posicion', 'id')[:6]],
+    })
+
+
+@login_required
+def selector_libros(request):
+    """
+    Páginas del selector de libros de las listas (JSON): búsqueda de texto o
+    catálogo completo, con cursor. Con `lista` marca los libros que ya están
+    en esa lista y con `en_lista=1` recorre solo esos.
+    """
+    lista = None
+    if request.GET.get('lista', '').isdigit():
+        lista = get_object_or_404(Lista, id=request.GET['lista'], usuario=request.user)
+    query = request.GET.get('q', '').strip()
+
+    if lista is not None and request.GET.get('en_lista') == '1':
+        # En el orden de la lista (lista_libro_posicion_idx)
+        libros = Libro.objects.filter(entradas_lista__lista=lista).annotate(posicion=F('entradas_lista__posicion'))
+        orden = ['posicion', 'id']
+    elif query:
+        libros = buscar_libros_texto(Libro.objects.all(), query)
+        if not libros.exists():
+            # Erratas: mismo respaldo por trigramas que buscar_libros
+            libros = buscar_libros_aproximado(Libro.objects.all(), query)
+        orden = ['-relevancia', 'id']
+    else:
+        libros, orden = Libro.objects.all(), ['titulo', 'id']
+
+    paginador = PaginadorCursor(libros.only('id', 'titulo', 'autor'), orden, 20)
+    pagina = paginador.get_page(request.GET.get('cursor'), request)
+    presentes = ids_en_lista(lista, [libro.id for libro in pagina])
+    return JsonResponse({
+        'resultados': [
+            {'id': libro.id, 'titulo': libro.titulo, 'autor': libro.autor, 'en_lista': libro.id in presentes}
+            for libro in pagina
+        ],
+        'cursor_siguiente': pagina.cursor_siguiente if pagina.has_next() else None,
+    })
+
+
+@login_required
+def libros_lista(request, lista_id):
+    """Agrega y quita libros de una lista en bloque (POST con ids separados por comas); responde JSON"""
+    lista = get_object_or_404(Lista, id=lista_id, usuario=request.user)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido.'}, status=405)
+    try:
+        agregar = leer_ids(request.POST.get('agregar', ''))
+        quitar = leer_ids(request.POST.get('quitar', ''))
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages[0]}, status=400)
+    cambios = aplicar_cambios(lista, agregar, quitar)
+    lista.refresh_from_db(fields=['total_libros'])
+    return JsonResponse({**cambios, 'total': lista.total_libros})
 
 
 @login_required
@@ -229,23 +406,88 @@ def eliminar_lista(request, lista_id):
 # -------------------------------
 # Libros y reseñas
 # -------------------------------
-@login_required
-def detalle_libro(request, libro_id):
-    libro = get_object_or_404(Libro, id=libro_id)
-
+def _registrar_visita(request, libro_id):
+    # Sin un INSERT por visita: el buffer deduplica y escribe por lotes (visitas.py)
     if request.user.is_authenticated and getattr(request.user, "is_usuario", False):
-        Historial.objects.create(usuario=request.user, libro=libro)
+        visitas.registrar(request.user.id, libro_id)
+
+
+# Reseñas por tramo en detalle_libro y en "Cargar más reseñas"
+RESEÑAS_POR_PAGINA = 10
+
+# Órdenes de reseñas (?orden=) en detalle_libro y en el feed; cada uno tiene su índice
+ORDENES_RESEÑAS = {
+    'reciente': ['-fecha', '-id'],
+    # Más útiles primero (utilidad.py), usa resena_libro_utilidad_idx
+    'utilidad': ['-utilidad', '-id'],
+}
 
-    reseñas = Reseña.objects.filter(libro=libro)
 
-    es_favorito = False
-    if request.user.is_authenticated:
-        es_favorito = Favorito.objects.filter(usuario=request.user, libro=libro).exists()
+def _orden_reseñas(request):
+    orden = request.GET.get('orden')
+    return orden if orden in ORDENES_RESEÑAS else 'reciente'
 
+
+def _pagina_reseñas(request, libro):
+    """Tramo de reseñas según el orden y el cursor de request.GET, y la URL del siguiente"""
+    orden = _orden_reseñas(request)
+    paginador = PaginadorCursor(
+        Reseña.objects.filter(libro=libro).select_related('usuario'), ORDENES_RESEÑAS[orden], RESEÑAS_POR_PAGINA,
+    )
+    pagina = paginador.get_page(request.GET.get('cursor'), request)
+    url_siguiente = None
+    if pagina.has_next():
+        url_siguiente = reverse('reseñas_libro', args=[libro.id]) + '?' + urlencode(
+            {'orden': orden, 'cursor': pagina.cursor_siguiente}
+        )
+    return cargar_reseñas(list(pagina)), url_siguiente
+
+
+# es_favorito y las acciones sobre reseñas propias son huecos (fragmentos.py)
+@login_required
+@cache_personalizado('libros', 'resenas', 'comentarios', efecto=_registrar_visita)
+def detalle_libro(request, libro_id):
+    libro = get_object_or_404(Libro.objects.select_related('estadisticas'), id=libro_id)
+
+    # Solo el primer tramo de reseñas; el resto se pide desde la página (hilos.py)
+    reseñas, url_siguiente = _pagina_reseñas(request, libro)
     return render(request, 'biblioteca/libros/detalle_libro.html', {
         'libro': libro,
         'reseñas': reseñas,
-        'es_favorito': es_favorito
+        'url_siguiente': url_siguiente,
+        'orden': _orden_reseñas(request),
+    })
+
+
+@login_required
+@cache_personalizado('libros', 'resenas', 'comentarios')
+def reseñas_libro(request, libro_id):
+    """Siguiente tramo de reseñas de un libro (fragmento HTML para "Cargar más")"""
+    libro = get_object_or_404(Libro, id=libro_id)
+    reseñas, url_siguiente = _pagina_reseñas(request, libro)
+    return render(request, 'biblioteca/includes/reseñas_pagina.html', {
+        'reseñas': reseñas,
+        'url_siguiente': url_siguiente,
+    })
+
+
+@login_required
+@cache_personalizado('resenas', 'comentarios')
+def comentarios_reseña(request, reseña_id):
+    """Siguiente tramo del hilo de comentarios de una reseña (fragmento HTML)"""
+    reseña = get_object_or_404(Reseña, id=reseña_id)
+    despues = request.GET.get('despues', '')
+    if not re.fullmatch(r'[0-9/]*', despues):
+        despues = ''
+
+    grupos, ultima_ruta, hay_mas = cargar_mas_comentarios(reseña.id, despues)
+    url_siguiente = None
+    if hay_mas:
+        url_siguiente = reverse('comentarios_reseña', args=[reseña.id]) + '?' + urlencode({'despues': ultima_ruta})
+    return render(request, 'biblioteca/includes/comentarios_pagina.html', {
+        'reseña_id': reseña.id,
+        'grupos': grupos,
+        'url_siguiente': url_siguiente,
     })
 
 
@@ -273,7 +515,6 @@ def crear_reseña(request, libro_id):
 @login_required
 def editar_reseña(request, reseña_id):
     reseña = get_object_or_404(Reseña, id=reseña_id, usuario=request.user)
-    libro = reseña.libro
     
     if request.method == 'POST':
         form = ReseñaForm(request.POST, instance=reseña)
@@ -281,9 +522,7 @@ def editar_reseña(request, reseña_id):
             reseña_actualizada = form.save(commit=False)
             reseña_actualizada.save()
             
-            # Forzar recalculación del promedio del libro
-            nuevo_promedio = libro.promedio_calificacion()
-            
+            # El promedio del libro se actualiza en signals.reseña_guardada
             messages.success(
                 request, 
                 f"La reseña se actualizó correctamente. Nueva calificación: {reseña_actualizada.calificacion} estrellas."
@@ -329,8 +568,60 @@ def quitar_favorito(request, libro_id):
 # -------------------------------
 @login_required
 def ver_historial(request):
-    historial = Historial.objects.filter(usuario=request.user).order_by('-fecha')
-    return render(request, 'biblioteca/usuario/historial.html', {'historial': historial})
+    # Primera página: libros vistos recientemente desde la caché (recientes.py);
+    # "Ver historial completo" pagina Historial por cursor sobre historial_usuario_fecha_idx
+    if not request.GET.get('completo'):
+        return render(request, 'biblioteca/usuario/historial.html', {
+            'historial': recientes.hidratar(request.user.id),
+            'recientes': True,
+        })
+
+    historial = Historial.objects.filter(usuario=request.user).select_related('libro')
+    page_obj = paginar_por_cursor(request, historial, ['-fecha', '-id'], 20)
+    return render(request, 'biblioteca/usuario/historial.html', {
+        'historial': page_obj,
+        'page_obj': page_obj,
+    })
+
+
+# -------------------------------
+# Exportación e importación de datos del usuario
+# -------------------------------
+@login_required
+def exportar_datos(request):
+    """Descarga (en streaming) las listas, favoritos e historial del usuario en JSONL o CSV"""
+    formato = request.GET.get('formato', 'jsonl')
+    if formato not in exportacion.FORMATOS:
+        raise Http404("Formato de exportación no válido.")
+    content_type, extension = exportacion.FORMATOS[formato]
+    respuesta = StreamingHttpResponse(exportacion.exportar(request.user, formato), content_type=content_type)
+    respuesta['Content-Disposition'] = f'attachment; filename="biblioteca-{request.user.id}.{extension}"'
+    return respuesta
+
+
+@login_required
+def importar_datos(request):
+    """Importa listas y favoritos desde un archivo exportado (POST multipart)"""
+    if request.method != 'POST':
+        return redirect('perfil')
+    form = ImportacionForm(request.POST, request.FILES)
+    if not form.is_valid():
+        messages.error(request, form.errors['archivo'][0])
+        return redirect('perfil')
+    archivo = form.cleaned_data['archivo']
+    try:
+        resumen = exportacion.importar(request.user, archivo, exportacion.formato_de(archivo.name))
+    except ValidationError as error:
+        messages.error(request, error.messages[0])
+        return redirect('perfil')
+    mensaje = (
+        f"Importación terminada: {resumen['listas']} lista(s) nueva(s), "
+        f"{resumen['libros_lista']} libro(s) agregado(s) a listas y {resumen['favoritos']} favorito(s)."
+    )
+    if resumen['omitidas']:
+        mensaje += f" Se omitieron {resumen['omitidas']} fila(s) sin libro reconocible."
+    messages.success(request, mensaje)
+    return redirect('perfil')
 
 
 # -------------------------------
@@ -518,13 +809,11 @@ def ver_notificaciones(request):
     H14: Como usuario registrado, quiero ver todas mis notificaciones
     en un feed personalizado.
     """
-    notificaciones = Notificacion.objects.filter(usuario=request.user).order_by('-fecha')
-    no_leidas = notificaciones.filter(leida=False).count()
+    notificaciones = Notificacion.objects.filter(usuario=request.user)
+    no_leidas = contador_notificaciones.no_leidas(request.user.id)
     
-    # Paginación (10 por página)
-    paginator = Paginator(notificaciones, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor (10 por página)
+    page_obj = paginar_por_cursor(request, notificaciones, ['-fecha', '-id'], 10)
     
     return render(request, 'biblioteca/usuario/notificaciones.html', {
         'notificaciones': page_obj,
@@ -536,7 +825,8 @@ def ver_notificaciones(request):
 def marcar_notificacion_leida(request, notificacion_id):
     """Marca una notificación específica como leída"""
     notificacion = get_object_or_404(Notificacion, id=notificacion_id, usuario=request.user)
-    notificacion.marcar_como_leida()
+    if notificacion.marcar_como_leida():
+        contador_notificaciones.sumar(request.user.id, -1)
     
     # Redirigir al objeto relacionado si existe
     if notificacion.libro:
@@ -552,6 +842,7 @@ def marcar_todas_leidas(request):
     """Marca todas las notificaciones del usuario como leídas"""
     if request.method == 'POST':
         Notificacion.objects.filter(usuario=request.user, leida=False).update(leida=True)
+        contador_notificaciones.poner_en_cero(request.user.id)
         messages.success(request, "Todas las notificaciones han sido marcadas como leídas.")
     
     return redirect('ver_notificaciones')
@@ -563,6 +854,7 @@ def eliminar_notificacion(request, notificacion_id):
     notificacion = get_object_or_404(Notificacion, id=notificacion_id, usuario=request.user)
     
     if request.method == 'POST':
+        # Si no estaba leída, el receiver de post_delete descuenta el contador
         notificacion.delete()
         messages.success(request, "Notificación eliminada.")
     
@@ -660,17 +952,31 @@ def dejar_seguir_usuario(request, usuario_id):
     return redirect('perfil_usuario_publico', usuario_id=usuario_id)
 
 
+def _con_totales(seguimientos, campo):
+    """Anota reseñas, seguidores y seguidos del usuario `campo` de cada fila (subconsultas, no una consulta por fila)"""
+    def total(modelo, filtro):
+        return Coalesce(Subquery(
+            modelo.objects.filter(**{filtro: OuterRef(campo)}).order_by()
+            .values(filtro).annotate(c=Count('id')).values('c')
+        ), 0)
+    return seguimientos.annotate(
+        total_reseñas=total(Reseña, 'usuario'),
+        total_seguidores=total(Seguimiento, 'seguido'),
+        total_siguiendo=total(Seguimiento, 'seguidor'),
+    )
+
+
 @login_required
 def lista_siguiendo(request):
     """Lista de usuarios que sigue"""
-    siguiendo = Seguimiento.objects.filter(seguidor=request.user).select_related('seguido')
+    siguiendo = _con_totales(Seguimiento.objects.filter(seguidor=request.user).select_related('seguido'), 'seguido')
     return render(request, 'biblioteca/usuario/lista_siguiendo.html', {'siguiendo': siguiendo})
 
 
 @login_required
 def lista_seguidores(request):
-    """Lista de seguidores"""
-    seguidores = Seguimiento.objects.filter(seguido=request.user).select_related('seguidor')
+    """Lista de seguidores; el botón Seguir / Siguiendo sale de membresias.siguiendo"""
+    seguidores = _con_totales(Seguimiento.objects.filter(seguido=request.user).select_related('seguidor'), 'seguidor')
     return render(request, 'biblioteca/usuario/lista_seguidores.html', {'seguidores': seguidores})
 
 
@@ -683,76 +989,88 @@ def feed_personalizado(request):
     
     reseñas_feed = Reseña.objects.filter(
         usuario_id__in=usuarios_seguidos
-    ).select_related('usuario', 'libro').order_by('-fecha')
+    ).select_related('usuario', 'libro')
     
-    # Paginación: 15 reseñas por página
-    paginator = Paginator(reseñas_feed, 15)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor: 15 reseñas por página, recientes o más útiles
+    orden = _orden_reseñas(request)
+    page_obj = paginar_por_cursor(
+        request, reseñas_feed, ORDENES_RESEÑAS[orden], 15, dependencias=['resenas', 'seguimientos']
+    )
     
     return render(request, 'biblioteca/feed_personalizado.html', {
         'reseñas': page_obj,
         'page_obj': page_obj,
-        'total_siguiendo': len(usuarios_seguidos)
+        'total_siguiendo': len(usuarios_seguidos),
+        'orden': orden,
     })
 
 
 @login_required
+@cache_personalizado('resenas', 'seguimientos', 'listas')
 def perfil_usuario_publico(request, usuario_id):
     """H20: Perfil público"""
     usuario_perfil = get_object_or_404(Usuario, id=usuario_id)
-    esta_siguiendo = Seguimiento.esta_siguiendo(request.user, usuario_perfil) if request.user.is_authenticated else False
     
+    # El botón Seguir / Siguiendo es un hueco por usuario (fragmentos.py)
     return render(request, 'biblioteca/usuario/perfil_publico.html', {
         'usuario_perfil': usuario_perfil,
-        'esta_siguiendo': esta_siguiendo,
         'total_seguidores': usuario_perfil.seguidores.count(),
         'total_siguiendo': usuario_perfil.siguiendo.count(),
         'reseñas': usuario_perfil.reseñas.select_related('libro').order_by('-fecha')[:10],
-        'listas': usuario_perfil.listas.prefetch_related('libros')[:5],
-        'es_propio': usuario_perfil == request.user
+        'listas': usuario_perfil.listas.all()[:5],
     })
 
 
 @login_required
 def recomendaciones(request):
     """H19: Recomendaciones personalizadas"""
-    generos_historial = list(Historial.objects.filter(usuario=request.user).values_list('libro__genero', flat=True))
+    # Géneros de los libros vistos recientemente (recientes.py) en lugar de recorrer Historial
+    generos_historial = list(Libro.objects.filter(id__in=recientes.libro_ids(request.user.id)).values_list('genero', flat=True))
     generos_listas = list(Lista.objects.filter(usuario=request.user).values_list('libros__genero', flat=True))
     generos_reseñas = list(Reseña.objects.filter(usuario=request.user, calificacion__gte=4).values_list('libro__genero', flat=True))
     
     todos_generos = generos_historial + generos_listas + generos_reseñas
     
+    orden = ['-promedio', '-total_reseñas', '-id']
     if not todos_generos:
-        libros_recomendados = Libro.objects.annotate(
-            promedio=Avg('reseñas__calificacion'),
-            total=Count('reseñas')
-        ).filter(total__gte=1).order_by('-promedio', '-total')
-        razon = "Libros mejor valorados"
+        # Sin historial: el ranking de tendencias precalculado, en su orden
+        en_tendencia = tendencias.ids()
+        if en_tendencia:
+            libros_recomendados = Libro.objects.filter(id__in=en_tendencia).annotate(posicion=Case(
+                *[When(id=libro_id, then=Value(posicion)) for posicion, libro_id in enumerate(en_tendencia)],
+                output_field=IntegerField(),
+            ))
+            orden = ['posicion', 'id']
+            razon = "Libros en tendencia"
+        else:
+            libros_recomendados = Libro.objects.filter(total_reseñas__gte=1)
+            razon = "Libros mejor valorados"
     else:
         contador_generos = Counter(todos_generos)
         generos_favoritos = [g for g, _ in contador_generos.most_common(3)]
-        libros_vistos = set(Historial.objects.filter(usuario=request.user).values_list('libro_id', flat=True))
-        
+        # Ya vistos: un EXISTS por candidato sobre Historial y las visitas compactadas
+        # en HistorialDiario, más las que todavía esperan en el buffer de visitas.py
         libros_recomendados = Libro.objects.filter(
             genero__in=generos_favoritos
-        ).exclude(id__in=libros_vistos).annotate(
-            promedio=Avg('reseñas__calificacion'),
-            total=Count('reseñas')
-        ).order_by('-promedio', '-total')
+        ).exclude(
+            Exists(Historial.objects.filter(usuario=request.user, libro=OuterRef('pk')))
+        ).exclude(
+            Exists(HistorialDiario.objects.filter(usuario=request.user, libro=OuterRef('pk')))
+        ).exclude(id__in=recientes.libro_ids(request.user.id))
         
         razon = f"Basado en: {', '.join([g.replace('_', ' ').title() for g in generos_favoritos])}"
     
-    # Paginación para recomendaciones principales: 20 por página
-    paginator = Paginator(libros_recomendados, 20)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor para recomendaciones principales: 20 por página
+    page_obj = paginar_por_cursor(
+        request, libros_recomendados.select_related('estadisticas'), orden, 20,
+        dependencias=['libros'],
+    )
     
     usuarios_seguidos = Seguimiento.objects.filter(seguidor=request.user).values_list('seguido_id', flat=True)
     libros_seguidos = Libro.objects.filter(
         reseñas__usuario_id__in=usuarios_seguidos,
         reseñas__calificacion__gte=4
-    ).distinct().annotate(promedio=Avg('reseñas__calificacion')).order_by('-promedio')[:6] if usuarios_seguidos else []
+    ).select_related('estadisticas').distinct().order_by('-promedio')[:6] if usuarios_seguidos else []
     
     return render(request, 'biblioteca/recomendaciones.html', {
         'libros_recomendados': page_obj,
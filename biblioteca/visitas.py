@@ -0,0 +1,140 @@
+"""
+Buffer de escritura para las visitas a detalle_libro (Historial).
+
+La vista no hace un INSERT por visita: registrar() descarta las repetidas al
+mismo libro dentro de VENTANA_VISITAS (cache.add sobre una clave por usuario
+y libro) y deja las demás en una cola en memoria del proceso. La petición que
+deja la cola con LOTE_VACIADO visitas, o con una de más de INTERVALO_VACIADO
+segundos, la vacía con un bulk_create; lo que quede al terminar el proceso se
+vacía con atexit. Si el proceso muere de golpe se pierden a lo sumo las
+visitas de su cola.
+
+bulk_create no pasa por los signals, así que vaciar() ajusta además el total
+de visitas de EstadisticasLibro y los contadores de tendencias.py. La lista de
+vistos recientemente (recientes.py) se actualiza en el momento, sin esperar al
+vaciado.
+
+La clave de deduplicación vive en la caché 'default', que en producción es
+compartida (ver biblioteca/cache.py): así una visita repetida en otro proceso
+tampoco se cuenta.
+"""
+import atexit
+import datetime
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import recientes, tendencias
+from .cache import PREFIJO
+from .models import EstadisticasLibro, Historial, Libro
+from usuarios.models import Usuario
+
+
+logger = logging.getLogger(__name__)
+
+# Una visita repetida al mismo libro dentro de esta ventana (segundos) no se registra
+VENTANA_VISITAS = getattr(settings, 'BIBLIOTECA_VENTANA_VISITAS', 30 * 60)
+
+# Visitas en cola o segundos de la más vieja que disparan el vaciado
+LOTE_VACIADO = 200
+INTERVALO_VACIADO = 60
+
+# Si la base de datos no acepta los vaciados, la cola no crece más que esto
+MAX_PENDIENTES = 20 * LOTE_VACIADO
+
+_lock = threading.Lock()
+_cola = deque()  # (usuario_id, libro_id, instante)
+
+
+def _clave_reciente(usuario_id, libro_id):
+    return f'{PREFIJO}:visitas:reciente:{usuario_id}:{libro_id}'
+
+
+def registrar(usuario_id, libro_id):
+    """
+    Anota la visita de un usuario a un libro. Devuelve False si era una
+    repetición dentro de VENTANA_VISITAS (igual pasa al frente de recientes)
+    o si no se pudo anotar.
+    """
+    recientes.agregar(usuario_id, libro_id)
+    clave = _clave_reciente(usuario_id, libro_id)
+    if not cache.add(clave, True, VENTANA_VISITAS):
+        return False
+
+    ahora = time.time()
+    with _lock:
+        if len(_cola) >= MAX_PENDIENTES:
+            # Sin la clave, la próxima visita vuelve a intentarlo
+            cache.delete(clave)
+            logger.warning("Buffer de visitas lleno: se descarta la visita de %s a %s", usuario_id, libro_id)
+            return False
+        _cola.append((usuario_id, libro_id, ahora))
+        vaciar_ya = len(_cola) >= LOTE_VACIADO or ahora - _cola[0][2] >= INTERVALO_VACIADO
+
+    if vaciar_ya:
+        try:
+            vaciar()
+        except Exception:
+            # La visita ya está en la cola; el próximo vaciado la reintenta
+            logger.exception("No se pudo vaciar el buffer de visitas")
+    return True
+
+
+def pendientes():
+    """Visitas de este proceso que todavía no están en Historial"""
+    return len(_cola)
+
+
+def vaciar():
+    """
+    Pasa a Historial las visitas en cola y devuelve cuántas se insertaron.
+    Si la inserción falla, las visitas vuelven a la cola y se relanza el error.
+    """
+    with _lock:
+        visitas = list(_cola)
+        _cola.clear()
+    if not visitas:
+        return 0
+    try:
+        return _insertar([
+            Historial(
+                usuario_id=usuario_id,
+                libro_id=libro_id,
+                fecha=datetime.datetime.fromtimestamp(instante, tz=datetime.timezone.utc),
+            )
+            for usuario_id, libro_id, instante in visitas
+        ])
+    except Exception:
+        with _lock:
+            _cola.extendleft(reversed(visitas))
+        raise
+
+
+def _insertar(filas):
+    # Usuarios o libros borrados mientras la visita esperaba
+    libros = set(Libro.objects.filter(id__in={fila.libro_id for fila in filas}).values_list('id', flat=True))
+    usuarios = set(Usuario.objects.filter(id__in={fila.usuario_id for fila in filas}).values_list('id', flat=True))
+    filas = [fila for fila in filas if fila.libro_id in libros and fila.usuario_id in usuarios]
+    if not filas:
+        return 0
+    with transaction.atomic():
+        Historial.objects.bulk_create(filas)
+        for libro_id, cantidad in Counter(fila.libro_id for fila in filas).items():
+            EstadisticasLibro.aplicar(libro_id, total_visitas=cantidad)
+    # Contadores por hora de tendencias.py (una fila por libro y hora)
+    for (libro_id, bloque), cantidad in Counter((fila.libro_id, tendencias.bloque_de(fila.fecha)) for fila in filas).items():
+        tendencias.registrar(libro_id, bloque, visitas=cantidad)
+    return len(filas)
+
+
+@atexit.register
+def _vaciar_al_salir():
+    try:
+        vaciar()
+    except Exception:
+        logger.exception("No se pudieron guardar las visitas pendientes al terminar el proceso")
@@ -28,8 +28,10 @@ from biblioteca.models import (
     Libro, Reseña, Favorito, Historial, Lista, Comentario, Categoria, 
     Seguimiento, ValoracionReseña, Notificacion
 )
+from biblioteca.listas import agregar_libros
 from usuarios.models import Usuario
 from moderacion.models import Reporte, AccionModeracion
+from django.core.management import call_command
 from django.db import connection
 from django.db.models import Avg, Count, Q
 from django.test.utils import CaptureQueriesContext
@@ -395,6 +397,8 @@ def crear_reseñas(cantidad=300):
         reseñas.append(reseña)
     
     Reseña.objects.bulk_create(reseñas, ignore_conflicts=True)
+    # bulk_create no pasa por los signals: promedio y total_reseñas de los libros
+    call_command('recalcular_valoraciones', verbosity=0)
     
     elapsed_time = (time.time() - start_time) * 1000
     print(f"   ✓ Reseñas creadas en {elapsed_time:.2f} ms")
@@ -510,7 +514,7 @@ def crear_listas(cantidad=50):
         
         # Agregar entre 3 y 10 libros a cada lista
         libros_seleccionados = random.sample(libros, min(random.randint(3, 10), len(libros)))
-        lista.libros.set(libros_seleccionados)
+        agregar_libros(lista, [libro.id for libro in libros_seleccionados])
     
     elapsed_time = (time.time() - start_time) * 1000
     print(f"   ✓ Listas creadas en {elapsed_time:.2f} ms")
@@ -566,6 +570,9 @@ def crear_comentarios(cantidad=200):
     
     Comentario.objects.bulk_create(respuestas, ignore_conflicts=True)
     
+    # bulk_create no pasa por save(): asignar las rutas de los hilos
+    Comentario.reconstruir_rutas()
+    
     elapsed_time = (time.time() - start_time) * 1000
     print(f"   ✓ Comentarios creados en {elapsed_time:.2f} ms (incluye respuestas)")
     return elapsed_time
@@ -597,6 +604,11 @@ def crear_valoraciones(cantidad=150):
     
     ValoracionReseña.objects.bulk_create(valoraciones, ignore_conflicts=True)
     
+    # bulk_create no pasa por los signals: contadores y utilidad de las reseñas,
+    # y estadísticas de los libros (reseñas, favoritos, historial y listas ya cargados)
+    call_command('recalcular_contadores', utilidad=True, verbosity=0)
+    call_command('recalcular_estadisticas', verbosity=0)
+    
     elapsed_time = (time.time() - start_time) * 1000
     print(f"   ✓ Valoraciones creadas en {elapsed_time:.2f} ms")
     return elapsed_time